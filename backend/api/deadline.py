@@ -16,6 +16,7 @@ from db.deadline import (
     delete_deadline,
     DEFAULT_DEADLINE_MINUTES
 )
+from services.vote_buffer import flush_pending_votes
 
 
 deadline_router = APIRouter(tags=["deadline"])
@@ -103,6 +104,9 @@ async def check_deadline(session_id: int):
     """
     try:
         is_expired = check_deadline_expired(session_id)
+        if is_expired:
+            # Voting is over: write any ballots still in the write-behind buffer
+            await flush_pending_votes(session_id)
         return {
             "session_id": session_id,
             "is_expired": is_expired,
@@ -2,16 +2,162 @@
 Hotpepper API client for restaurant search.
 """
 
+import asyncio
 import os
 import json
+import unicodedata
 import aiohttp
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
 from urllib.parse import urlencode
+
+from utils.cache import SingleFlight, TTLCache
+from utils.http import get_http_session
 
 
 HOTPEPPER_API_KEY = os.getenv("HOTPEPPER_API_KEY", "")
 HOTPEPPER_BASE_URL = "https://webservice.recruit.co.jp/hotpepper/gourmet/v1/"
 
+# Search response cache: fresh for SEARCH_CACHE_TTL, then served stale (and
+# refreshed in the background) for SEARCH_CACHE_STALE_TTL more seconds.
+SEARCH_CACHE_SIZE = int(os.getenv("HOTPEPPER_SEARCH_CACHE_SIZE", "256"))
+SEARCH_CACHE_TTL = float(os.getenv("HOTPEPPER_SEARCH_CACHE_TTL", "300"))
+SEARCH_CACHE_STALE_TTL = float(os.getenv("HOTPEPPER_SEARCH_CACHE_STALE_TTL", "1800"))
+
+_search_cache = TTLCache(
+    maxsize=SEARCH_CACHE_SIZE,
+    ttl=SEARCH_CACHE_TTL,
+    stale_ttl=SEARCH_CACHE_STALE_TTL,
+)
+_search_flight = SingleFlight()
+
+# Shop detail cache used by the batched ID lookups. Hotpepper accepts up to
+# 20 shop IDs per request.
+SHOP_CACHE_TTL = float(os.getenv("HOTPEPPER_SHOP_CACHE_TTL", "3600"))
+SHOP_BATCH_WINDOW = float(os.getenv("HOTPEPPER_SHOP_BATCH_WINDOW", "0.01"))
+SHOP_IDS_PER_REQUEST = 20
+
+_shop_cache = TTLCache(maxsize=1024, ttl=SHOP_CACHE_TTL)
+
+
+class ShopRecord:
+    """
+    Compact shop representation built once from a Hotpepper "shop" payload.
+
+    Only the fields used by the API responses, the LINE carousel and ranking
+    are kept. ``get`` mirrors dict access for callers that treat shops as dicts.
+    """
+
+    __slots__ = (
+        "id",
+        "name",
+        "address",
+        "station_name",
+        "access",
+        "url",
+        "photo",
+        "photo_s",
+        "genre",
+        "genre_code",
+        "sub_genre_code",
+        "budget",
+        "budget_code",
+        "budget_average",
+        "open",
+        "catch",
+        "capacity",
+        "private_room",
+        "non_smoking",
+        "lat",
+        "lng",
+    )
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
+
+    @classmethod
+    def from_api(cls, shop: Dict) -> "ShopRecord":
+        record = cls.__new__(cls)
+        genre = shop.get("genre") or {}
+        budget = shop.get("budget") or {}
+        photo_pc = (shop.get("photo") or {}).get("pc") or {}
+        record.id = shop.get("id")
+        record.name = shop.get("name")
+        record.address = shop.get("address")
+        record.station_name = shop.get("station_name")
+        record.access = shop.get("access")
+        record.url = (shop.get("urls") or {}).get("pc")
+        record.photo = photo_pc.get("l")
+        record.photo_s = photo_pc.get("s")
+        record.genre = genre.get("name")
+        record.genre_code = genre.get("code")
+        record.sub_genre_code = (shop.get("sub_genre") or {}).get("code")
+        record.budget = budget.get("name")
+        record.budget_code = budget.get("code")
+        record.budget_average = budget.get("average")
+        record.open = shop.get("open")
+        record.catch = shop.get("catch")
+        record.capacity = shop.get("capacity")
+        record.private_room = shop.get("private_room")
+        record.non_smoking = shop.get("non_smoking")
+        record.lat = shop.get("lat")
+        record.lng = shop.get("lng")
+        return record
+
+    def get(self, key: str, default=None):
+        value = getattr(self, key, None) if key in self.__slots__ else None
+        return default if value is None else value
+
+    def to_dict(self) -> Dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self) -> str:
+        return f"ShopRecord(id={self.id!r}, name={self.name!r})"
+
+
+def serialize_search_result(result: Dict) -> Dict:
+    """Convert ShopRecords in a search result into JSON-ready dicts."""
+    return {**result, "shops": [shop.to_dict() for shop in result.get("shops", [])]}
+
+
+def _normalize_text(value: Optional[str]) -> Optional[str]:
+    """Normalize free text so "渋谷 " and "渋谷" share a cache entry."""
+    if not value:
+        return None
+    normalized = " ".join(unicodedata.normalize("NFKC", value).split()).lower()
+    return normalized or None
+
+
+def _search_cache_key(
+    area: Optional[str],
+    genre_codes: Optional[List[str]],
+    budget_code: Optional[str],
+    keyword: Optional[str],
+    count: int,
+    start: int,
+) -> Tuple:
+    genre = genre_codes[0] if genre_codes else None
+    return (
+        _normalize_text(area),
+        genre,
+        budget_code or None,
+        _normalize_text(keyword),
+        min(count, 100),
+        start,
+    )
+
+
+def _copy_result(result: Dict) -> Dict:
+    return {**result, "shops": list(result.get("shops", []))}
+
+
+def get_search_cache_stats() -> Dict:
+    """Hit-rate and coalescing metrics for the search cache."""
+    return {
+        "cache": _search_cache.stats(),
+        "upstream": _search_flight.stats(),
+    }
+
 
 async def search_restaurants(
     area: Optional[str] = None,
@@ -23,6 +169,10 @@ async def search_restaurants(
 ) -> Dict:
     """
     Search restaurants using Hotpepper API.
+
+    Responses are cached by normalized parameters. Concurrent identical
+    searches share one upstream request, and expired entries are served
+    stale while they are refreshed in the background.
     
     Args:
         area: Free text area search (e.g., "渋谷")
@@ -42,7 +192,33 @@ async def search_restaurants(
             "results_returned": 0,
             "shops": []
         }
-    
+
+    key = _search_cache_key(area, genre_codes, budget_code, keyword, count, start)
+
+    async def load() -> Dict:
+        result = await _fetch_search_results(area, genre_codes, budget_code, keyword, count, start)
+        if "error" not in result:
+            _search_cache.set(key, result)
+        return result
+
+    entry = _search_cache.get_entry(key)
+    if entry is not None:
+        if not entry.is_fresh():
+            _search_flight.spawn(key, load)
+        return _copy_result(entry.value)
+
+    return _copy_result(await _search_flight.do(key, load))
+
+
+async def _fetch_search_results(
+    area: Optional[str],
+    genre_codes: Optional[List[str]],
+    budget_code: Optional[str],
+    keyword: Optional[str],
+    count: int,
+    start: int,
+) -> Dict:
+    """Perform the uncached Hotpepper search request."""
     params = {
         "key": HOTPEPPER_API_KEY,
         "format": "json",
@@ -70,69 +246,44 @@ async def search_restaurants(
     url = f"{HOTPEPPER_BASE_URL}?{urlencode(params)}"
     
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as response:
-                if response.status != 200:
+        session = get_http_session()
+        async with session.get(url) as response:
+            if response.status != 200:
+                return {
+                    "error": f"API request failed with status {response.status}",
+                    "results_available": 0,
+                    "results_returned": 0,
+                    "shops": []
+                }
+            
+            # Hotpepper returns text/javascript;charset=utf-8 even for JSON
+            try:
+                data = await response.json(content_type=None)
+            except Exception:
+                text = await response.text()
+                try:
+                    data = json.loads(text)
+                except json.JSONDecodeError:
                     return {
-                        "error": f"API request failed with status {response.status}",
+                        "error": "Failed to decode API response",
                         "results_available": 0,
                         "results_returned": 0,
                         "shops": []
                     }
-                
-                # Hotpepper returns text/javascript;charset=utf-8 even for JSON
-                try:
-                    data = await response.json(content_type=None)
-                except Exception:
-                    text = await response.text()
-                    try:
-                        data = json.loads(text)
-                    except json.JSONDecodeError:
-                        return {
-                            "error": "Failed to decode API response",
-                            "results_available": 0,
-                            "results_returned": 0,
-                            "shops": []
-                        }
-                results = data.get("results", {})
-                
-                shops = results.get("shop", [])
-                
-                # Format shop data for easier consumption
-                formatted_shops = []
-                for shop in shops:
-                    formatted_shops.append({
-                        "id": shop.get("id"),
-                        "name": shop.get("name"),
-                        "name_kana": shop.get("name_kana"),
-                        "address": shop.get("address"),
-                        "station_name": shop.get("station_name"),
-                        "access": shop.get("access"),
-                        "url": shop.get("urls", {}).get("pc"),
-                        "photo": shop.get("photo", {}).get("pc", {}).get("l"),
-                        "photo_s": shop.get("photo", {}).get("pc", {}).get("s"),
-                        "genre": shop.get("genre", {}).get("name"),
-                        "budget": shop.get("budget", {}).get("name"),
-                        "budget_average": shop.get("budget", {}).get("average"),
-                        "open": shop.get("open"),
-                        "close": shop.get("close"),
-                        "catch": shop.get("catch"),
-                        "capacity": shop.get("capacity"),
-                        "private_room": shop.get("private_room"),
-                        "card": shop.get("card"),
-                        "non_smoking": shop.get("non_smoking"),
-                        "parking": shop.get("parking"),
-                        "lat": shop.get("lat"),
-                        "lng": shop.get("lng"),
-                    })
-                
-                return {
-                    "results_available": int(results.get("results_available", 0)),
-                    "results_returned": int(results.get("results_returned", 0)),
-                    "results_start": int(results.get("results_start", 1)),
-                    "shops": formatted_shops
-                }
-                
+            results = data.get("results", {})
+            
+            shops = results.get("shop", [])
+            
+            # Build compact shop records once per shop
+            formatted_shops = [ShopRecord.from_api(shop) for shop in shops]
+
+            return {
+                "results_available": int(results.get("results_available", 0)),
+                "results_returned": int(results.get("results_returned", 0)),
+                "results_start": int(results.get("results_start", 1)),
+                "shops": formatted_shops
+            }
+            
     except aiohttp.ClientError as e:
         return {
             "error": f"Network error: {str(e)}",
@@ -149,9 +300,401 @@ async def search_restaurants(
         }
 
 
-async def fetch_restaurant_by_id(shop_id: str) -> Dict:
+async def search_restaurants_multi_genre(
+    area: Optional[str] = None,
+    genre_codes: Optional[List[str]] = None,
+    budget_code: Optional[str] = None,
+    keyword: Optional[str] = None,
+    count: int = 10,
+    start: int = 1,
+    genre_weights: Optional[Dict[str, int]] = None,
+) -> Dict:
     """
-    Fetch a single restaurant by Hotpepper shop ID.
+    Search restaurants for several genres at once.
+
+    One query per genre is issued concurrently, results are merged and
+    de-duplicated by shop ID, and shops are ranked by how many participants
+    chose a genre they satisfy.
+
+    Args:
+        genre_codes: Genre codes in preference order (e.g., most_common_genres)
+        genre_weights: Participant count per genre code (e.g., aggregated
+            "genre_codes"). Defaults to weighting by preference order.
+        (other arguments are the same as search_restaurants)
+
+    Returns:
+        Dictionary containing merged search results
+    """
+    codes = [code for code in dict.fromkeys(genre_codes or []) if code]
+    if len(codes) <= 1:
+        return await search_restaurants(
+            area=area,
+            genre_codes=codes or None,
+            budget_code=budget_code,
+            keyword=keyword,
+            count=count,
+            start=start,
+        )
+
+    genre_weights = _default_genre_weights(codes, genre_weights)
+
+    results = await asyncio.gather(*(
+        search_restaurants(
+            area=area,
+            genre_codes=[code],
+            budget_code=budget_code,
+            keyword=keyword,
+            count=count,
+            start=start,
+        )
+        for code in codes
+    ))
+
+    successful = [result for result in results if "error" not in result]
+    if not successful:
+        return results[0]
+
+    # shop ID -> (score, best position in any per-genre result, shop)
+    merged: Dict[str, Tuple[int, int, "ShopRecord"]] = {}
+    for result in successful:
+        for position, shop in enumerate(result.get("shops", [])):
+            shop_id = shop.id
+            if not shop_id:
+                continue
+            if shop_id in merged:
+                score, best_position, kept = merged[shop_id]
+                merged[shop_id] = (score, min(best_position, position), kept)
+                continue
+            merged[shop_id] = (_genre_score(shop, codes, genre_weights), position, shop)
+
+    ranked = sorted(merged.values(), key=lambda item: (-item[0], item[1]))
+    shops = [shop for _, _, shop in ranked[:count]]
+    return {
+        "results_available": max(int(result.get("results_available", 0)) for result in successful),
+        "results_returned": len(shops),
+        "results_start": start,
+        "genre_codes": codes,
+        "shops": shops
+    }
+
+
+def _default_genre_weights(codes: List[str], genre_weights: Optional[Dict[str, int]]) -> Dict[str, int]:
+    """Given weights, or weights by preference order of codes."""
+    return genre_weights or {code: len(codes) - index for index, code in enumerate(codes)}
+
+
+def _genre_score(shop: "ShopRecord", codes: List[str], genre_weights: Dict[str, int]) -> int:
+    """Weight of the searched genres a shop satisfies."""
+    matched = {shop.genre_code, shop.sub_genre_code} & set(codes)
+    return sum(genre_weights.get(code, 0) for code in matched)
+
+
+async def iter_multi_genre_pages(
+    genre_codes: List[str],
+    area: Optional[str] = None,
+    budget_code: Optional[str] = None,
+    keyword: Optional[str] = None,
+    page_size: int = 10,
+    genre_weights: Optional[Dict[str, int]] = None,
+) -> AsyncIterator[Dict]:
+    """
+    Page through the merged, ranked results of several genres.
+
+    Every genre is searched page_size shops at a time. Fetched shops go into
+    one de-duplicated pool ranked like search_restaurants_multi_genre, and
+    each page takes the best page_size shops still in the pool, so shops
+    fetched but not shown yet come on later pages instead of being dropped.
+    More shops are fetched only when the pool runs short, in the background
+    right after a page is handed out.
+
+    Yields:
+        Search result dictionaries with an extra "has_more" flag
+    """
+    codes = [code for code in dict.fromkeys(genre_codes) if code]
+    genre_weights = _default_genre_weights(codes, genre_weights)
+    starts = {code: 1 for code in codes}
+    # None until the genre's first response says how many results it has
+    available: Dict[str, Optional[int]] = {code: None for code in codes}
+    # shop ID -> (score, best absolute position in any genre, shop)
+    pool: Dict[str, Tuple[int, int, "ShopRecord"]] = {}
+    shown: set = set()
+    shown_count = 0
+
+    def remaining() -> List[str]:
+        return [code for code in codes if available[code] is None or starts[code] <= available[code]]
+
+    async def fetch_more() -> None:
+        active = remaining()
+        results = await asyncio.gather(*(
+            search_restaurants(
+                area=area,
+                genre_codes=[code],
+                budget_code=budget_code,
+                keyword=keyword,
+                count=page_size,
+                start=starts[code],
+            )
+            for code in active
+        ))
+        for code, result in zip(active, results):
+            shops = result.get("shops", [])
+            if "error" in result or not shops:
+                available[code] = 0
+                continue
+            available[code] = int(result.get("results_available", 0))
+            for offset, shop in enumerate(shops):
+                if not shop.id or shop.id in shown:
+                    continue
+                position = starts[code] + offset
+                if shop.id in pool:
+                    score, best_position, kept = pool[shop.id]
+                    pool[shop.id] = (score, min(best_position, position), kept)
+                else:
+                    pool[shop.id] = (_genre_score(shop, codes, genre_weights), position, shop)
+            starts[code] += page_size
+
+    pending: Optional[asyncio.Future] = asyncio.ensure_future(fetch_more())
+    try:
+        while True:
+            if pending is not None:
+                await pending
+                pending = None
+            while len(pool) < page_size and remaining():
+                await fetch_more()
+            if not pool:
+                return
+
+            ranked = sorted(pool.values(), key=lambda item: (-item[0], item[1]))
+            shops = [shop for _, _, shop in ranked[:page_size]]
+            for shop in shops:
+                del pool[shop.id]
+                shown.add(shop.id)
+            if len(pool) < page_size and remaining():
+                pending = asyncio.ensure_future(fetch_more())
+
+            page = {
+                "results_available": max(available[code] or 0 for code in codes),
+                "results_returned": len(shops),
+                "results_start": shown_count + 1,
+                "genre_codes": codes,
+                "shops": shops,
+                "has_more": bool(pool) or pending is not None,
+            }
+            shown_count += len(shops)
+            yield page
+    finally:
+        if pending is not None:
+            pending.cancel()
+
+
+async def iter_shop_pages(
+    fetch_page: Callable[[int, int], Awaitable[Dict]],
+    page_size: int = 10,
+    start: int = 1,
+) -> AsyncIterator[Dict]:
+    """
+    Lazily iterate over search result pages.
+
+    When a page is handed out, the following page (if any) is fetched in the
+    background so it is ready when the caller asks for it. Pages beyond that
+    are never requested. Shops already yielded on earlier pages are dropped.
+
+    Args:
+        fetch_page: Coroutine function taking (start, count) and returning a
+            search result dictionary (e.g., a wrapped search_restaurants)
+        page_size: Number of results per page
+        start: Starting position of the first page
+
+    Yields:
+        Search result dictionaries with an extra "has_more" flag
+    """
+    seen: set = set()
+    pending: Optional[asyncio.Future] = asyncio.ensure_future(fetch_page(start, page_size))
+    try:
+        while pending is not None:
+            result = await pending
+            shops = result.get("shops", [])
+            if not shops:
+                return
+
+            next_start = start + page_size
+            pending = None
+            if next_start <= int(result.get("results_available", 0)):
+                pending = asyncio.ensure_future(fetch_page(next_start, page_size))
+            start = next_start
+
+            fresh = [shop for shop in shops if shop.id not in seen]
+            seen.update(shop.id for shop in fresh)
+            if fresh:
+                yield {**result, "shops": fresh, "has_more": pending is not None}
+    finally:
+        # Closed early (e.g., the cursor was evicted): drop the prefetch
+        if pending is not None:
+            pending.cancel()
+
+
+def search_shop_pages(
+    area: Optional[str] = None,
+    genre_codes: Optional[List[str]] = None,
+    budget_code: Optional[str] = None,
+    keyword: Optional[str] = None,
+    page_size: int = 10,
+    genre_weights: Optional[Dict[str, int]] = None,
+    rank: Optional[Callable[[List["ShopRecord"]], Awaitable[List["ShopRecord"]]]] = None,
+) -> AsyncIterator[Dict]:
+    """
+    Page through search results: several genres with iter_multi_genre_pages,
+    otherwise with iter_shop_pages.
+
+    If rank is given (e.g., services.shop_ranking.rank_shops_for_session),
+    the shops on each page are reordered with it.
+    """
+    codes = [code for code in dict.fromkeys(genre_codes or []) if code]
+    if len(codes) > 1:
+        pages = iter_multi_genre_pages(
+            codes,
+            area=area,
+            budget_code=budget_code,
+            keyword=keyword,
+            page_size=page_size,
+            genre_weights=genre_weights,
+        )
+        return _ranked_pages(pages, rank) if rank else pages
+
+    async def fetch_page(start: int, count: int) -> Dict:
+        result = await search_restaurants_multi_genre(
+            area=area,
+            genre_codes=genre_codes,
+            budget_code=budget_code,
+            keyword=keyword,
+            count=count,
+            start=start,
+            genre_weights=genre_weights,
+        )
+        if rank and result.get("shops"):
+            result["shops"] = await rank(result["shops"])
+        return result
+
+    return iter_shop_pages(fetch_page, page_size=page_size)
+
+
+async def _ranked_pages(
+    pages: AsyncIterator[Dict],
+    rank: Callable[[List["ShopRecord"]], Awaitable[List["ShopRecord"]]],
+) -> AsyncIterator[Dict]:
+    """Reorder the shops of each page with rank."""
+    try:
+        async for page in pages:
+            yield {**page, "shops": await rank(page["shops"])}
+    finally:
+        await pages.aclose()
+
+
+async def _fetch_shops_by_ids(shop_ids: List[str]) -> Dict[str, "ShopRecord"]:
+    """
+    Fetch up to SHOP_IDS_PER_REQUEST shops in one Hotpepper request.
+
+    Returns:
+        Mapping of shop ID to ShopRecord (IDs that were not found are omitted)
+
+    Raises:
+        Exception: If the API request fails
+    """
+    params = [
+        ("key", HOTPEPPER_API_KEY),
+        ("format", "json"),
+        ("count", len(shop_ids)),
+    ]
+    params.extend(("id", shop_id) for shop_id in shop_ids)
+    url = f"{HOTPEPPER_BASE_URL}?{urlencode(params)}"
+
+    session = get_http_session()
+    async with session.get(url) as response:
+        if response.status != 200:
+            raise Exception(f"API request failed with status {response.status}")
+
+        try:
+            data = await response.json(content_type=None)
+        except Exception:
+            text = await response.text()
+            try:
+                data = json.loads(text)
+            except json.JSONDecodeError:
+                raise Exception("Failed to decode API response")
+
+    results = data.get("results", {})
+    formatted_shops = {}
+    for shop in results.get("shop", []):
+        record = ShopRecord.from_api(shop)
+        formatted_shops[record.id] = record
+    return formatted_shops
+
+
+class ShopBatchLoader:
+    """
+    Collect shop-ID lookups made within a short window and resolve them with
+    multi-ID Hotpepper requests (chunked to the API limit), backed by the
+    shop detail cache.
+    """
+
+    def __init__(self, window: float = SHOP_BATCH_WINDOW, max_ids: int = SHOP_IDS_PER_REQUEST):
+        self.window = window
+        self.max_ids = max_ids
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+
+    async def load(self, shop_id: str) -> Optional["ShopRecord"]:
+        """Return the ShopRecord for shop_id, or None if it does not exist."""
+        cached = _shop_cache.get(shop_id)
+        if cached is not None:
+            return cached
+
+        future = self._pending.get(shop_id)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._pending[shop_id] = future
+            if self._flush_handle is None:
+                self._flush_handle = loop.call_later(
+                    self.window, lambda: asyncio.ensure_future(self._dispatch())
+                )
+        return await asyncio.shield(future)
+
+    async def load_many(self, shop_ids: List[str]) -> List[Optional["ShopRecord"]]:
+        return await asyncio.gather(*(self.load(shop_id) for shop_id in shop_ids))
+
+    async def _dispatch(self) -> None:
+        pending, self._pending = self._pending, {}
+        self._flush_handle = None
+        shop_ids = list(pending)
+        chunks = [shop_ids[i:i + self.max_ids] for i in range(0, len(shop_ids), self.max_ids)]
+        results = await asyncio.gather(
+            *(_fetch_shops_by_ids(chunk) for chunk in chunks),
+            return_exceptions=True,
+        )
+        for chunk, result in zip(chunks, results):
+            for shop_id in chunk:
+                future = pending[shop_id]
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                    continue
+                shop = result.get(shop_id)
+                if shop is not None:
+                    _shop_cache.set(shop_id, shop)
+                future.set_result(shop)
+
+
+_shop_loader = ShopBatchLoader()
+
+
+async def fetch_restaurants_by_ids(shop_ids: List[str]) -> Dict:
+    """
+    Fetch several restaurants by Hotpepper shop ID.
+
+    Lookups are batched into as few upstream requests as possible and shops
+    are returned in the order of shop_ids (unknown IDs are skipped).
     """
     if not HOTPEPPER_API_KEY:
         return {
@@ -161,81 +704,9 @@ async def fetch_restaurant_by_id(shop_id: str) -> Dict:
             "shops": []
         }
 
-    params = {
-        "key": HOTPEPPER_API_KEY,
-        "format": "json",
-        "id": shop_id,
-        "count": 1,
-    }
-    url = f"{HOTPEPPER_BASE_URL}?{urlencode(params)}"
-
+    unique_ids = [shop_id for shop_id in dict.fromkeys(shop_ids) if shop_id]
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as response:
-                if response.status != 200:
-                    return {
-                        "error": f"API request failed with status {response.status}",
-                        "results_available": 0,
-                        "results_returned": 0,
-                        "shops": []
-                    }
-
-                try:
-                    data = await response.json(content_type=None)
-                except Exception:
-                    text = await response.text()
-                    try:
-                        data = json.loads(text)
-                    except json.JSONDecodeError:
-                        return {
-                            "error": "Failed to decode API response",
-                            "results_available": 0,
-                            "results_returned": 0,
-                            "shops": []
-                        }
-
-                results = data.get("results", {})
-                shops = results.get("shop", [])
-                if not shops:
-                    return {
-                        "results_available": 0,
-                        "results_returned": 0,
-                        "shops": []
-                    }
-
-                shop = shops[0]
-                formatted = {
-                    "id": shop.get("id"),
-                    "name": shop.get("name"),
-                    "name_kana": shop.get("name_kana"),
-                    "address": shop.get("address"),
-                    "station_name": shop.get("station_name"),
-                    "access": shop.get("access"),
-                    "url": shop.get("urls", {}).get("pc"),
-                    "photo": shop.get("photo", {}).get("pc", {}).get("l"),
-                    "photo_s": shop.get("photo", {}).get("pc", {}).get("s"),
-                    "genre": shop.get("genre", {}).get("name"),
-                    "budget": shop.get("budget", {}).get("name"),
-                    "budget_average": shop.get("budget", {}).get("average"),
-                    "open": shop.get("open"),
-                    "close": shop.get("close"),
-                    "catch": shop.get("catch"),
-                    "capacity": shop.get("capacity"),
-                    "private_room": shop.get("private_room"),
-                    "card": shop.get("card"),
-                    "non_smoking": shop.get("non_smoking"),
-                    "parking": shop.get("parking"),
-                    "lat": shop.get("lat"),
-                    "lng": shop.get("lng"),
-                }
-
-                return {
-                    "results_available": int(results.get("results_available", 0)),
-                    "results_returned": int(results.get("results_returned", 0)),
-                    "results_start": int(results.get("results_start", 1)),
-                    "shops": [formatted]
-                }
-
+        loaded = await _shop_loader.load_many(unique_ids)
     except aiohttp.ClientError as e:
         return {
             "error": f"Network error: {str(e)}",
@@ -251,9 +722,24 @@ async def fetch_restaurant_by_id(shop_id: str) -> Dict:
             "shops": []
         }
 
+    shops = [shop for shop in loaded if shop is not None]
+    return {
+        "results_available": len(shops),
+        "results_returned": len(shops),
+        "results_start": 1,
+        "shops": shops
+    }
+
+
+async def fetch_restaurant_by_id(shop_id: str) -> Dict:
+    """
+    Fetch a single restaurant by Hotpepper shop ID.
+    """
+    return await fetch_restaurants_by_ids([shop_id])
+
 
 def format_shops_for_line_carousel(
-    shops: List[Dict],
+    shops: List[ShopRecord],
     session_id: Optional[int] = None,
     max_items: int = 10,
     vote_label: str = "ここがいい！",
@@ -263,7 +749,7 @@ def format_shops_for_line_carousel(
     Format shop data for LINE Flex Message carousel.
     
     Args:
-        shops: List of shop dictionaries from search_restaurants
+        shops: List of ShopRecords from search_restaurants
         max_items: Maximum number of items (LINE carousel max is 10)
     
     Returns:
@@ -273,14 +759,15 @@ def format_shops_for_line_carousel(
     
     for shop in shops[:max_items]:
         # Truncate text to fit LINE limits
-        title = (shop.get("name", "お店")[:40]) if shop.get("name") else "お店"
-        text = shop.get("catch", "") or shop.get("access", "") or ""
+        title = shop.name[:40] if shop.name else "お店"
+        text = shop.catch or shop.access or ""
         text = text[:60] if text else "詳細はリンクをご確認ください"
+        shop_url = shop.url or "https://www.hotpepper.jp/"
         
         postback_data = {
             "action": "select_shop",
-            "shop_id": shop.get("id"),
-            "shop_name": shop.get("name", "")[:40],
+            "shop_id": shop.id,
+            "shop_name": (shop.name or "")[:40],
         }
         if session_id is not None:
             postback_data["session_id"] = session_id
@@ -289,7 +776,7 @@ def format_shops_for_line_carousel(
             {
                 "type": "uri",
                 "label": "🔗 お店の詳細",
-                "uri": shop.get("url") or "https://www.hotpepper.jp/"
+                "uri": shop_url
             }
         ]
         if include_vote_action:
@@ -303,14 +790,14 @@ def format_shops_for_line_carousel(
             )
 
         column = {
-            "thumbnailImageUrl": shop.get("photo") or shop.get("photo_s") or "https://via.placeholder.com/300x200",
+            "thumbnailImageUrl": shop.photo or shop.photo_s or "https://via.placeholder.com/300x200",
             "imageBackgroundColor": "#FFFFFF",
             "title": title,
             "text": text,
             "defaultAction": {
                 "type": "uri",
                 "label": "詳細を見る",
-                "uri": shop.get("url") or "https://www.hotpepper.jp/"
+                "uri": shop_url
             },
             "actions": actions,
         }
@@ -321,7 +808,7 @@ def format_shops_for_line_carousel(
 
 
 def create_line_carousel_message(
-    shops: List[Dict],
+    shops: List[ShopRecord],
     alt_text: str = "おすすめのお店",
     session_id: Optional[int] = None,
     vote_label: str = "ここがいい！",
@@ -331,7 +818,7 @@ def create_line_carousel_message(
     Create a LINE Flex Message carousel from shop data.
     
     Args:
-        shops: List of shop dictionaries
+        shops: List of ShopRecords
         alt_text: Alternative text for notifications
     
     Returns:
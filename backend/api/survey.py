@@ -13,7 +13,15 @@ from db.restaurant_conditions import (
     get_restaurant_conditions,
     get_aggregated_conditions,
 )
-from api.hotpepper import search_restaurants
+from api.hotpepper import (
+    get_search_cache_stats,
+    search_restaurants,
+    search_restaurants_multi_genre,
+    serialize_search_result,
+    ShopRecord,
+)
+from services.hp_services import search_restaurants as search_restaurants_nearby
+from services.shop_ranking import RANK_CANDIDATE_COUNT, rank_shops_for_session
 
 
 survey_router = APIRouter()
@@ -114,12 +122,53 @@ async def search_shops(
         
         return {
             "success": True,
-            **results
+            **serialize_search_result(results)
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@survey_router.get("/api/survey/search/nearby")
+async def search_shops_nearby(
+    location: str,
+    genre: str = "G001",
+    min_price: int = 2000,
+    max_price: int = 3000,
+    count: int = 10
+):
+    """
+    Search restaurants around a place name (geocoded to lat/lng).
+    Falls back to a keyword search when the place cannot be geocoded.
+    """
+    try:
+        shops = await search_restaurants_nearby(
+            genre_code=genre,
+            count=count,
+            min_price=min_price,
+            max_price=max_price,
+            location_name=location
+        )
+        
+        return {
+            "success": True,
+            "results_returned": len(shops),
+            "shops": [ShopRecord.from_api(shop).to_dict() for shop in shops]
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@survey_router.get("/api/survey/search/cache-stats")
+async def search_cache_stats():
+    """
+    Get Hotpepper search cache hit-rate and request coalescing metrics.
+    """
+    return {
+        "success": True,
+        **get_search_cache_stats()
+    }
+
+
 @survey_router.get("/api/survey/search/session/{session_id}")
 async def search_shops_for_session(session_id: int, count: int = 10):
     """
@@ -141,15 +190,8 @@ async def search_shops_for_session(session_id: int, count: int = 10):
         # Use the most popular area
         area = aggregated["areas"][0] if aggregated["areas"] else None
         
-        # Use the most popular genre
-        genre_codes = None
-        if aggregated["genre_codes"]:
-            sorted_genres = sorted(
-                aggregated["genre_codes"].items(),
-                key=lambda x: x[1],
-                reverse=True
-            )
-            genre_codes = [sorted_genres[0][0]] if sorted_genres else None
+        # Use the top 3 genres (searched concurrently and merged)
+        genre_codes = aggregated["most_common_genres"][:3] or None
         
         # Use the most popular budget
         budget_code = None
@@ -161,12 +203,15 @@ async def search_shops_for_session(session_id: int, count: int = 10):
             )
             budget_code = sorted_budgets[0][0] if sorted_budgets else None
         
-        results = await search_restaurants(
+        results = await search_restaurants_multi_genre(
             area=area,
             genre_codes=genre_codes,
             budget_code=budget_code,
-            count=count
+            count=max(count, RANK_CANDIDATE_COUNT),
+            genre_weights=aggregated["genre_codes"],
         )
+        shops = (await rank_shops_for_session(session_id, results.get("shops", [])))[:count]
+        results = {**results, "shops": shops, "results_returned": len(shops)}
         
         return {
             "success": True,
@@ -176,7 +221,7 @@ async def search_shops_for_session(session_id: int, count: int = 10):
                 "budget_code": budget_code
             },
             "aggregated_from": aggregated["total_respondents"],
-            **results
+            **serialize_search_result(results)
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
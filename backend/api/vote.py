@@ -12,9 +12,12 @@ from db.poll_responses import (
     save_poll_responses,
     get_poll_responses,
     get_response_summary,
-    delete_user_responses
+    delete_user_responses,
+    resolve_slot_ids
 )
 from db.deadline import check_deadline_expired
+from services.availability_matrix import get_availability_matrix
+from services.vote_buffer import VOTE_WRITE_BEHIND, flush_pending_votes, vote_buffer
 
 vote_router = APIRouter(tags=["votes"])
 
@@ -25,13 +28,22 @@ class VoteItem(BaseModel):
     start_time: Optional[str] = Field(None, description="Start time in ISO format")
     end_time: Optional[str] = Field(None, description="End time in ISO format")
     is_late: bool = Field(False, description="Whether the user might be late")
+    option_id: Optional[int] = Field(None, description="Poll option (slot) ID")
 
 
 class VoteRequest(BaseModel):
     """Vote submission request"""
     line_user_id: str = Field(..., min_length=1, description="LINE user ID")
     session_id: Optional[int] = Field(None, description="Poll session ID")
-    votes: List[VoteItem] = Field(..., description="List of selected dates")
+    votes: List[VoteItem] = Field(default_factory=list, description="List of selected dates")
+    slot_ids: List[int] = Field(
+        default_factory=list,
+        description="Selected poll option IDs (compact alternative to votes, requires session_id)"
+    )
+    late_slot_ids: List[int] = Field(
+        default_factory=list,
+        description="Subset of slot_ids the user might be late for"
+    )
 
 
 class VoteResponse(BaseModel):
@@ -50,10 +62,14 @@ async def submit_vote(request: VoteRequest):
     - Deletes all existing votes for the user (within the same session)
     - Inserts the new votes
     
+    With VOTE_WRITE_BEHIND enabled the ballot is acknowledged once buffered
+    and written to the database in the next batch flush.
+    
     Request body:
     - line_user_id: LINE user ID (required)
     - session_id: Optional poll session ID
     - votes: Array of vote objects with date, start_time, end_time, is_late
+    - slot_ids / late_slot_ids: Poll option IDs instead of (or in addition to) votes
     
     Returns:
     - success: Whether the operation succeeded
@@ -63,9 +79,12 @@ async def submit_vote(request: VoteRequest):
     if not request.line_user_id:
         raise HTTPException(status_code=400, detail="line_user_id is required")
     
-    if not request.votes:
+    if not request.votes and not request.slot_ids:
         raise HTTPException(status_code=400, detail="At least one vote is required")
     
+    if request.slot_ids and request.session_id is None:
+        raise HTTPException(status_code=400, detail="session_id is required with slot_ids")
+    
     # Check deadline if session_id is provided
     if request.session_id is not None:
         if check_deadline_expired(request.session_id):
@@ -81,11 +100,30 @@ async def submit_vote(request: VoteRequest):
                 'date': vote.date,
                 'start_time': vote.start_time,
                 'end_time': vote.end_time,
-                'is_late': vote.is_late
+                'is_late': vote.is_late,
+                'option_id': vote.option_id
             }
             for vote in request.votes
         ]
         
+        if request.slot_ids:
+            try:
+                votes_data += resolve_slot_ids(
+                    request.session_id,
+                    request.slot_ids,
+                    request.late_slot_ids
+                )
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+        
+        if VOTE_WRITE_BEHIND:
+            vote_buffer.add(request.line_user_id, votes_data, request.session_id)
+            return VoteResponse(
+                success=True,
+                message=f"Accepted {len(votes_data)} vote(s)",
+                saved_count=len(votes_data)
+            )
+        
         # Save votes (this replaces existing votes for the user)
         saved_count = save_poll_responses(
             line_user_id=request.line_user_id,
@@ -99,6 +137,8 @@ async def submit_vote(request: VoteRequest):
             saved_count=saved_count
         )
     
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error saving votes: {e}")
         raise HTTPException(
@@ -122,6 +162,7 @@ async def get_votes(
     Returns list of vote records.
     """
     try:
+        await flush_pending_votes(session_id)
         responses = get_poll_responses(
             line_user_id=line_user_id,
             session_id=session_id
@@ -169,6 +210,7 @@ async def get_votes_summary(session_id: Optional[int] = None):
     - voters_by_option: Dictionary mapping date labels to voter lists
     """
     try:
+        await flush_pending_votes(session_id)
         summary = get_response_summary(session_id=session_id)
         return {
             "success": True,
@@ -183,6 +225,54 @@ async def get_votes_summary(session_id: Optional[int] = None):
         )
 
 
+@vote_router.get("/api/events/votes/availability/{session_id}")
+async def get_votes_availability(
+    session_id: int,
+    min_count: int = 0,
+    must_attend: Optional[str] = None,
+    top_k: Optional[int] = None
+):
+    """
+    Find slots by attendance.
+    
+    Path parameters:
+    - session_id: Poll session ID
+    
+    Query parameters:
+    - min_count: Only slots at least this many people can attend
+    - must_attend: Comma-separated LINE user IDs who must all be able to attend
+    - top_k: Only the k slots with the most available people
+    
+    Returns:
+    - total_voters: Number of unique voters
+    - slots: Matching slots with vote_count, late_count and voters
+    """
+    try:
+        await flush_pending_votes(session_id)
+        matrix = get_availability_matrix(session_id)
+        required = [user_id for user_id in (must_attend or "").split(",") if user_id]
+        slots = matrix.query(min_count=min_count, must_attend=required, top_k=top_k)
+        
+        for slot in slots:
+            if slot.get('start_time'):
+                slot['start_time'] = slot['start_time'].isoformat()
+            if slot.get('end_time'):
+                slot['end_time'] = slot['end_time'].isoformat()
+        
+        return {
+            "success": True,
+            "total_voters": len(matrix.users),
+            "slots": slots
+        }
+    
+    except Exception as e:
+        print(f"Error fetching vote availability: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to fetch vote availability: {str(e)}"
+        )
+
+
 @vote_router.delete("/api/events/votes/{line_user_id}")
 async def delete_votes(line_user_id: str, session_id: Optional[int] = None):
     """
@@ -199,6 +289,8 @@ async def delete_votes(line_user_id: str, session_id: Optional[int] = None):
     - deleted_count: Number of deleted votes
     """
     try:
+        if VOTE_WRITE_BEHIND:
+            vote_buffer.discard(line_user_id, session_id)
         deleted_count = delete_user_responses(
             line_user_id=line_user_id,
             session_id=session_id
@@ -2,15 +2,26 @@
 Vote completion handler - triggers restaurant suggestions when all members have voted.
 """
 
+from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 
 from db import get_connection
+from db.poll_response_bitmaps import BITMAP_STORAGE
+from db.poll_responses import get_session_intervals, get_session_slot_responses, slot_key
 from db.restaurant_conditions import get_aggregated_conditions
-from api.hotpepper import search_restaurants, create_line_carousel_message
+from api.hotpepper import (
+    create_line_carousel_message,
+    search_restaurants_multi_genre,
+    serialize_search_result,
+)
 from line.reply import push_message, multicast_message
+from services.shop_ranking import RANK_CANDIDATE_COUNT, rank_shops_for_session
+from services.time_windows import DEFAULT_LATE_WEIGHT, find_best_windows
+from services.vote_buffer import flush_pending_votes
 from services.google_calendar_service import create_event_for_session
+from services.ics_feed import publish_session_feeds, session_feed_path
 
 
 vote_completion_router = APIRouter()
@@ -31,6 +42,15 @@ class VoteSummary(BaseModel):
 
 def get_session_voters(session_id: int) -> List[Dict]:
     """Get all users who have voted in this session."""
+    if BITMAP_STORAGE:
+        voters = {}
+        for row in get_session_slot_responses(session_id):
+            voters.setdefault(row["line_user_id"], {
+                "line_user_id": row["line_user_id"],
+                "display_name": row.get("display_name")
+            })
+        return list(voters.values())
+    
     query = """
         SELECT DISTINCT pr.line_user_id, lu.display_name
         FROM poll_responses pr
@@ -54,20 +74,55 @@ def get_session_linked_users(session_id: int) -> List[Dict]:
     return get_session_voters(session_id)
 
 
+def _vote_results_from_responses(session_id: int) -> List[Dict]:
+    """get_vote_results computed from expanded responses (bitmap storage)."""
+    groups: Dict[tuple, Dict] = {}
+    for row in get_session_slot_responses(session_id):
+        group = groups.setdefault(slot_key(row), {
+            "option_id": row.get("option_id"),
+            "date_label": row["selected_date"],
+            "start_time": row["start_time"],
+            "end_time": row["end_time"],
+            "vote_count": 0,
+            "voters": []
+        })
+        group["vote_count"] += 1
+        name = row.get("display_name")
+        if name and name not in group["voters"]:
+            group["voters"].append(name)
+    
+    results = sorted(
+        groups.values(),
+        key=lambda group: (-group["vote_count"], group["start_time"] is None, group["start_time"] or datetime.min)
+    )
+    for group in results:
+        group["start_time"] = str(group["start_time"]) if group["start_time"] else group["start_time"]
+        group["end_time"] = str(group["end_time"]) if group["end_time"] else group["end_time"]
+        group["voters"] = ", ".join(group["voters"]) or None
+    return results
+
+
 def get_vote_results(session_id: int) -> List[Dict]:
     """Get aggregated vote results for a session."""
+    if BITMAP_STORAGE:
+        return _vote_results_from_responses(session_id)
+    
     query = """
         SELECT 
-            pr.selected_date AS date_label,
-            pr.start_time,
-            pr.end_time,
+            pr.option_id,
+            ANY_VALUE(pr.selected_date) AS date_label,
+            ANY_VALUE(pr.start_time) AS start_time,
+            ANY_VALUE(pr.end_time) AS end_time,
             COUNT(*) AS vote_count,
             GROUP_CONCAT(DISTINCT lu.display_name SEPARATOR ', ') AS voters
         FROM poll_responses pr
         LEFT JOIN line_users lu ON pr.line_user_id = lu.line_user_id
         WHERE pr.session_id = %s
-        GROUP BY pr.selected_date, pr.start_time, pr.end_time
-        ORDER BY vote_count DESC, pr.start_time ASC
+        GROUP BY pr.option_id,
+            CASE WHEN pr.option_id IS NULL THEN pr.selected_date END,
+            CASE WHEN pr.option_id IS NULL THEN pr.start_time END,
+            CASE WHEN pr.option_id IS NULL THEN pr.end_time END
+        ORDER BY vote_count DESC, start_time ASC
     """
     with get_connection() as conn:
         cursor = conn.cursor(dictionary=True)
@@ -84,6 +139,45 @@ def get_vote_results(session_id: int) -> List[Dict]:
         return results
 
 
+def get_best_windows(
+    session_id: int,
+    duration_minutes: int,
+    late_weight: float = DEFAULT_LATE_WEIGHT,
+    limit: int = 5,
+) -> List[Dict]:
+    """
+    Get the windows of the given length that the most voters can fully attend,
+    combining overlapping (not only identical) availabilities.
+    Rows use the same keys as get_vote_results.
+    """
+    responses = get_session_intervals(session_id)
+    names = {
+        row["line_user_id"]: row.get("display_name") or f"ユーザー{row['line_user_id'][-4:]}"
+        for row in responses
+    }
+    windows = find_best_windows(
+        responses,
+        timedelta(minutes=duration_minutes),
+        late_weight=late_weight,
+        limit=limit,
+    )
+
+    results = []
+    for window in windows:
+        start = window["start_time"]
+        results.append({
+            "date_label": f"{start.month}月{start.day}日({'月火水木金土日'[start.weekday()]})",
+            "start_time": str(start),
+            "end_time": str(window["end_time"]),
+            "latest_start_time": str(window["latest_start"]),
+            "vote_count": window["attendee_count"],
+            "late_count": window["late_count"],
+            "score": window["score"],
+            "voters": ", ".join(names[user_id] for user_id in window["attendees"]),
+        })
+    return results
+
+
 def get_session_group_id(session_id: int) -> Optional[str]:
     """Get the group_id for a session to send messages to."""
     query = """
@@ -102,6 +196,7 @@ async def check_vote_completion(session_id: int, expected_voters: Optional[int]
     Check if all expected voters have completed voting.
     Returns vote summary and completion status.
     """
+    await flush_pending_votes(session_id)
     voters = get_session_voters(session_id)
     total_voters = len(voters)
     
@@ -141,15 +236,18 @@ async def trigger_completion(session_id: int, expected_voters: Optional[int] = N
     # 2. Get aggregated restaurant conditions
     conditions = get_aggregated_conditions(session_id)
     
-    # 3. Search restaurants based on aggregated conditions
-    search_result = await search_restaurants(
+    # 3. Search restaurants based on aggregated conditions, then rank the
+    #    candidates against every participant's own conditions
+    search_result = await search_restaurants_multi_genre(
         area=conditions.get("most_common_area"),
         genre_codes=conditions.get("most_common_genres", [])[:3],
         budget_code=conditions.get("most_common_budget"),
-        count=10
+        count=RANK_CANDIDATE_COUNT,
+        genre_weights=conditions.get("genre_codes"),
     )
     
-    shops = search_result.get("shops", [])
+    shops = (await rank_shops_for_session(session_id, search_result.get("shops", [])))[:10]
+    search_result = {**search_result, "shops": shops, "results_returned": len(shops)}
     
     if not shops:
         return {
@@ -157,7 +255,7 @@ async def trigger_completion(session_id: int, expected_voters: Optional[int] = N
             "message": "条件に合うお店が見つかりませんでした",
             "vote_summary": completion_status,
             "conditions_used": conditions,
-            "search_result": search_result
+            "search_result": serialize_search_result(search_result)
         }
     
     # 4. Create LINE carousel message
@@ -216,6 +314,7 @@ async def trigger_completion(session_id: int, expected_voters: Optional[int] = N
 @vote_completion_router.get("/api/votes/results/{session_id}")
 async def get_session_results(session_id: int):
     """Get detailed voting results for a session."""
+    await flush_pending_votes(session_id)
     voters = get_session_voters(session_id)
     vote_results = get_vote_results(session_id)
     conditions = get_aggregated_conditions(session_id)
@@ -229,11 +328,39 @@ async def get_session_results(session_id: int):
     }
 
 
+@vote_completion_router.get("/api/votes/best-windows/{session_id}")
+async def get_session_best_windows(
+    session_id: int,
+    duration_minutes: int = 120,
+    late_weight: float = DEFAULT_LATE_WEIGHT,
+    limit: int = 5,
+):
+    """
+    Find the time windows of the requested length with the highest attendance.
+    Overlapping availabilities are combined even if their slots differ.
+    """
+    if duration_minutes <= 0:
+        raise HTTPException(status_code=400, detail="duration_minutes must be positive")
+    if not 0 <= late_weight <= 1:
+        raise HTTPException(status_code=400, detail="late_weight must be between 0 and 1")
+
+    await flush_pending_votes(session_id)
+    windows = get_best_windows(session_id, duration_minutes, late_weight=late_weight, limit=max(1, limit))
+    return {
+        "session_id": session_id,
+        "duration_minutes": duration_minutes,
+        "late_weight": late_weight,
+        "windows": windows
+    }
+
+
 @vote_completion_router.post("/api/votes/finalize/{session_id}")
 async def finalize_and_register_event(
     session_id: int,
     event_title: str = "飲み会",
-    location: Optional[str] = None
+    location: Optional[str] = None,
+    duration_minutes: Optional[int] = None,
+    late_weight: float = DEFAULT_LATE_WEIGHT
 ):
     """
     Finalize voting and automatically register calendar events for all participants.
@@ -248,6 +375,9 @@ async def finalize_and_register_event(
         session_id: Poll session ID
         event_title: Title for the calendar event (default: "飲み会")
         location: Optional location/restaurant name
+        duration_minutes: If set, finalize the best window of this length
+            over overlapping availabilities instead of the most-voted slot
+        late_weight: Weight of voters who might be late (with duration_minutes)
     
     Returns:
         Dict with success status, created events, and messaging results
@@ -265,8 +395,12 @@ async def finalize_and_register_event(
                 detail="This session has already been finalized and events have been created"
             )
     
-    # 1. Get voting results
-    vote_results = get_vote_results(session_id)
+    # 1. Get voting results (including ballots still in the write-behind buffer)
+    await flush_pending_votes(session_id)
+    if duration_minutes:
+        vote_results = get_best_windows(session_id, duration_minutes, late_weight=late_weight, limit=1)
+    else:
+        vote_results = get_vote_results(session_id)
     
     if not vote_results or len(vote_results) == 0:
         raise HTTPException(status_code=400, detail="No votes found for this session")
@@ -296,6 +430,7 @@ async def finalize_and_register_event(
         cursor = conn.cursor()
         cursor.execute(update_query, (event_title, date_label, start_time, end_time, location, session_id))
         conn.commit()
+    publish_session_feeds(session_id)
     
     # 3. Prepare LINE notification message
     notification_text = f"🎉 日程が確定しました！\n\n"
@@ -334,5 +469,6 @@ async def finalize_and_register_event(
             "voters": voters_list
         },
         "notification_sent": send_success,
+        "ics_feed_url": session_feed_path(session_id),
         "message": f"日程を確定しました。次はお店選択です。"
     }
@@ -0,0 +1,60 @@
+"""
+Benchmark: availability matrix build and queries at 500 users x 200 slots.
+
+Run from backend/:
+    python -m benchmarks.bench_availability_matrix
+"""
+
+import random
+import timeit
+from datetime import datetime, timedelta
+
+from services.availability_matrix import AvailabilityMatrix
+
+USERS = 500
+SLOTS = 200
+AVAILABILITY = 0.3
+
+
+def _responses(rng: random.Random) -> list:
+    base = datetime(2026, 1, 5, 19)
+    slots = [
+        (index, f"スロット{index}", base + timedelta(hours=index), base + timedelta(hours=index + 2))
+        for index in range(SLOTS)
+    ]
+    return [
+        {
+            "line_user_id": f"U{user:032d}",
+            "display_name": f"ユーザー{user}",
+            "option_id": option_id,
+            "selected_date": label,
+            "start_time": start,
+            "end_time": end,
+            "is_late": rng.random() < 0.1,
+        }
+        for user in range(USERS)
+        for option_id, label, start, end in slots
+        if rng.random() < AVAILABILITY
+    ]
+
+
+def _best(statement, number: int = 50) -> float:
+    return min(timeit.repeat(statement, number=number, repeat=5)) / number * 1e3
+
+
+def main() -> None:
+    rng = random.Random(0)
+    responses = _responses(rng)
+    matrix = AvailabilityMatrix(responses)
+    must_attend = matrix.users[:2]
+
+    print(f"{USERS} users x {SLOTS} slots, {len(responses)} responses")
+    print(f"  build:        {_best(lambda: AvailabilityMatrix(responses), number=5):7.2f} ms")
+    print(f"  quorum 160:   {_best(lambda: matrix.query(min_count=160)):7.2f} ms")
+    print(f"  must-attend:  {_best(lambda: matrix.query(must_attend=must_attend)):7.2f} ms")
+    print(f"  top 5:        {_best(lambda: matrix.query(top_k=5)):7.2f} ms")
+    print(f"  packed size:  {matrix.available.nbytes / 1024:7.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
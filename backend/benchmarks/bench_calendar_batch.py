@@ -0,0 +1,124 @@
+"""
+Benchmark: per-user event inserts vs. multipart /batch requests against a
+local stand-in for the Google Calendar API (every request costs LATENCY).
+
+Run from backend/:
+    python -m benchmarks.bench_calendar_batch
+"""
+
+import asyncio
+import json
+import time
+import uuid
+
+from aiohttp import web
+
+from services.google_calendar_service import CALENDAR_BATCH_SIZE, GoogleCalendarService
+from utils.http import close_http_session
+
+USERS = (10, 40, 120)
+LATENCY = 0.05
+CONCURRENCY = 20
+
+
+class StandInCalendar:
+    """Minimal events.insert and /batch endpoints that count requests."""
+
+    def __init__(self):
+        self.requests = 0
+
+    def _event(self, token: str, body: dict) -> dict:
+        event_id = uuid.uuid4().hex
+        return {"id": event_id, "htmlLink": f"https://calendar.test/{token}/{event_id}", **body}
+
+    async def insert(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        await asyncio.sleep(LATENCY)
+        token = request.headers["Authorization"].split()[-1]
+        return web.json_response(self._event(token, await request.json()))
+
+    async def batch(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        await asyncio.sleep(LATENCY)
+        boundary = request.headers["Content-Type"].split("boundary=")[1]
+        text = (await request.text()).replace("\r\n", "\n")
+        out_boundary = f"response_{uuid.uuid4().hex}"
+        parts = []
+        for part in text.split(f"--{boundary}")[1:]:
+            if part.startswith("--"):
+                break
+            headers, _, http_request = part.strip("\n").partition("\n\n")
+            content_id = headers.split("Content-ID: <")[1].split(">")[0]
+            request_head, _, body = http_request.partition("\n\n")
+            token = request_head.split("Authorization: Bearer ")[1].split("\n")[0]
+            event = json.dumps(self._event(token, json.loads(body)))
+            parts.append(
+                f"--{out_boundary}\r\n"
+                "Content-Type: application/http\r\n"
+                f"Content-ID: <response-{content_id}>\r\n\r\n"
+                "HTTP/1.1 200 OK\r\n"
+                "Content-Type: application/json; charset=UTF-8\r\n\r\n"
+                f"{event}\r\n"
+            )
+        return web.Response(
+            body=("".join(parts) + f"--{out_boundary}--\r\n").encode("utf-8"),
+            headers={"Content-Type": f"multipart/mixed; boundary={out_boundary}"},
+        )
+
+
+async def _per_user(count: int, body: dict) -> None:
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def create(index: int) -> None:
+        async with semaphore:
+            await GoogleCalendarService.create_event(
+                access_token=f"token{index}",
+                summary=body["summary"],
+                start_datetime=body["start"]["dateTime"],
+                end_datetime=body["end"]["dateTime"],
+            )
+
+    await asyncio.gather(*(create(index) for index in range(count)))
+
+
+async def _batched(count: int, body: dict) -> None:
+    requests = [(f"token{index}", body) for index in range(count)]
+    results = await asyncio.gather(*(
+        GoogleCalendarService.create_events_batch(requests[i:i + CALENDAR_BATCH_SIZE])
+        for i in range(0, count, CALENDAR_BATCH_SIZE)
+    ))
+    assert all("event" in result for chunk in results for result in chunk)
+
+
+async def main() -> None:
+    stand_in = StandInCalendar()
+    app = web.Application()
+    app.router.add_post("/calendar/v3/calendars/{calendar_id}/events", stand_in.insert)
+    app.router.add_post("/batch/calendar/v3", stand_in.batch)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    GoogleCalendarService.CALENDAR_API_BASE = f"http://127.0.0.1:{port}/calendar/v3"
+    GoogleCalendarService.CALENDAR_BATCH_URL = f"http://127.0.0.1:{port}/batch/calendar/v3"
+
+    body = GoogleCalendarService._event_body(
+        "飲み会", "2026-01-15T19:00:00+09:00", "2026-01-15T21:00:00+09:00"
+    )
+    print(f"stand-in latency {LATENCY * 1e3:.0f} ms, concurrency {CONCURRENCY}, batch size {CALENDAR_BATCH_SIZE}")
+    try:
+        for count in USERS:
+            for label, run in (("per-user", _per_user), ("batch", _batched)):
+                stand_in.requests = 0
+                started = time.perf_counter()
+                await run(count, body)
+                elapsed = (time.perf_counter() - started) * 1e3
+                print(f"  {count:4d} users {label:9s} {elapsed:8.1f} ms  {stand_in.requests:4d} requests")
+    finally:
+        await close_http_session()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,60 @@
+"""
+Benchmark: ranking candidate shops against every participant's conditions.
+
+Run from backend/:
+    python -m benchmarks.bench_shop_ranking
+"""
+
+import random
+import timeit
+
+from api.hotpepper import ShopRecord
+from services.shop_ranking import rank_shops
+from utils.hotpepper_codes import BUDGET_CODES, GENRE_CODES
+
+SIZES = ((10, 100), (30, 300), (100, 1000))
+
+
+def _conditions(count: int, rng: random.Random) -> list:
+    return [
+        {
+            "genre_codes": rng.sample(list(GENRE_CODES), rng.randint(0, 3)),
+            "budget_code": rng.choice(list(BUDGET_CODES) + [None]),
+        }
+        for _ in range(count)
+    ]
+
+
+def _coords(count: int, rng: random.Random) -> list:
+    return [(35.65 + rng.uniform(-0.05, 0.05), 139.70 + rng.uniform(-0.05, 0.05)) for _ in range(count)]
+
+
+def _shops(count: int, rng: random.Random) -> list:
+    return [
+        ShopRecord.from_api({
+            "id": f"J{index:09d}",
+            "name": f"テスト店{index}",
+            "genre": {"code": rng.choice(list(GENRE_CODES))},
+            "sub_genre": {"code": rng.choice(list(GENRE_CODES))},
+            "budget": {"code": rng.choice(list(BUDGET_CODES))},
+            "private_room": rng.choice(["あり", "なし"]),
+            "non_smoking": rng.choice(["全面禁煙", "禁煙席なし"]),
+            "lat": 35.65 + rng.uniform(-0.05, 0.05),
+            "lng": 139.70 + rng.uniform(-0.05, 0.05),
+        })
+        for index in range(count)
+    ]
+
+
+def main() -> None:
+    rng = random.Random(0)
+    for participants, candidates in SIZES:
+        conditions = _conditions(participants, rng)
+        coords = _coords(participants, rng)
+        shops = _shops(candidates, rng)
+        seconds = min(timeit.repeat(lambda: rank_shops(conditions, shops, coords), number=20, repeat=5)) / 20
+        print(f"{participants:>4} participants x {candidates:>5} shops: {seconds * 1e3:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
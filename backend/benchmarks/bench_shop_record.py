@@ -0,0 +1,95 @@
+"""
+Benchmark: ShopRecord vs. the previous per-shop dict formatting.
+
+Run from backend/:
+    python -m benchmarks.bench_shop_record
+"""
+
+import timeit
+import tracemalloc
+
+from api.hotpepper import ShopRecord
+
+PAGE_SIZE = 100
+RETAINED_PAGES = 100
+
+
+def _raw_shop(index: int) -> dict:
+    return {
+        "id": f"J{index:09d}",
+        "name": f"居酒屋 テスト{index}",
+        "name_kana": "いざかやてすと",
+        "address": "東京都渋谷区道玄坂1-1-1",
+        "station_name": "渋谷",
+        "access": "渋谷駅ハチ公口より徒歩3分",
+        "urls": {"pc": f"https://www.hotpepper.jp/str{index}/"},
+        "photo": {
+            "pc": {"l": f"https://imgfp.hotp.jp/{index}_l.jpg", "m": "", "s": f"https://imgfp.hotp.jp/{index}_s.jpg"},
+            "mobile": {"l": "", "s": ""},
+        },
+        "genre": {"code": "G001", "name": "居酒屋", "catch": "海鮮居酒屋"},
+        "sub_genre": {"code": "G002", "name": "ダイニングバー・バル"},
+        "budget": {"code": "B003", "name": "3001～4000円", "average": "3500円"},
+        "open": "月～日: 17:00～翌0:00",
+        "close": "無休",
+        "catch": "飲み放題付きコース3000円～",
+        "capacity": 80,
+        "private_room": "あり",
+        "card": "利用可",
+        "non_smoking": "全面禁煙",
+        "parking": "なし",
+        "lat": 35.6585,
+        "lng": 139.6990,
+        "coupon_urls": {"pc": "", "sp": ""},
+    }
+
+
+def _legacy_format(shop: dict) -> dict:
+    return {
+        "id": shop.get("id"),
+        "name": shop.get("name"),
+        "name_kana": shop.get("name_kana"),
+        "address": shop.get("address"),
+        "station_name": shop.get("station_name"),
+        "access": shop.get("access"),
+        "url": shop.get("urls", {}).get("pc"),
+        "photo": shop.get("photo", {}).get("pc", {}).get("l"),
+        "photo_s": shop.get("photo", {}).get("pc", {}).get("s"),
+        "genre": shop.get("genre", {}).get("name"),
+        "budget": shop.get("budget", {}).get("name"),
+        "budget_average": shop.get("budget", {}).get("average"),
+        "open": shop.get("open"),
+        "close": shop.get("close"),
+        "catch": shop.get("catch"),
+        "capacity": shop.get("capacity"),
+        "private_room": shop.get("private_room"),
+        "card": shop.get("card"),
+        "non_smoking": shop.get("non_smoking"),
+        "parking": shop.get("parking"),
+        "lat": shop.get("lat"),
+        "lng": shop.get("lng"),
+    }
+
+
+def _retained_bytes(build, page) -> int:
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    retained = [[build(shop) for shop in page] for _ in range(RETAINED_PAGES)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    del retained
+    return size
+
+
+def main() -> None:
+    page = [_raw_shop(i) for i in range(PAGE_SIZE)]
+    for label, build in (("dict", _legacy_format), ("ShopRecord", ShopRecord.from_api)):
+        seconds = min(timeit.repeat(lambda: [build(shop) for shop in page], number=200, repeat=5))
+        per_shop_us = seconds / (200 * PAGE_SIZE) * 1e6
+        retained = _retained_bytes(build, page) / (RETAINED_PAGES * PAGE_SIZE)
+        print(f"{label:>10}: {per_shop_us:6.2f} us/shop build, {retained:7.1f} bytes/shop retained")
+
+
+if __name__ == "__main__":
+    main()
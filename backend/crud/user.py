@@ -19,6 +19,11 @@ def get_user_by_id(db: Session, user_id: int) -> User | None:
     return db.query(User).filter(User.id == user_id).first()
 
 
+def _has_changes(db_user: User, update_dict: dict) -> bool:
+    """Return True if applying update_dict would modify db_user"""
+    return any(getattr(db_user, key, None) != value for key, value in update_dict.items())
+
+
 def create_user(db: Session, user: UserCreate) -> User:
     """Create new user"""
     db_user = User(**user.model_dump(exclude_unset=True))
@@ -37,8 +42,10 @@ def create_or_update_user_by_line_id(
     existing_user = get_user_by_line_user_id(db, line_user_id=line_user_id)
 
     if existing_user:
-        # Update existing
+        # Update existing; skip the write entirely when nothing changed
         update_dict = user_data.model_dump(exclude_unset=True)
+        if not _has_changes(existing_user, update_dict):
+            return existing_user
         for key, value in update_dict.items():
             setattr(existing_user, key, value)
         db.add(existing_user)
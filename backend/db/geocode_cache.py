@@ -0,0 +1,41 @@
+"""
+Geocoding cache database operations.
+Stores coordinates per normalized place name so each place is geocoded once.
+"""
+
+from typing import Dict, Optional
+
+from db import get_connection
+
+
+def get_cached_location(place_key: str) -> Optional[Dict[str, float]]:
+    """
+    Get cached coordinates for a normalized place name.
+
+    Returns:
+        Dict with lat/lng or None if not cached
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(
+            "SELECT lat, lng FROM geocode_cache WHERE place_key = %s",
+            (place_key,),
+        )
+        row = cursor.fetchone()
+        if not row:
+            return None
+        return {"lat": float(row["lat"]), "lng": float(row["lng"])}
+
+
+def save_cached_location(place_key: str, lat: float, lng: float) -> None:
+    """Save or update coordinates for a normalized place name."""
+    query = """
+        INSERT INTO geocode_cache (place_key, lat, lng)
+        VALUES (%s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            lat = VALUES(lat),
+            lng = VALUES(lng)
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, (place_key, lat, lng))
@@ -0,0 +1,102 @@
+"""
+ICS feed database operations.
+Stores rendered .ics documents per feed key ("session:<id>" or "user:<line_user_id>").
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from db import get_connection
+
+FINALIZED_SESSION_COLUMNS = """
+    s.id, s.topic, s.state, s.finalized_date, s.finalized_start_time,
+    s.finalized_end_time, s.finalized_location, s.restaurant_name,
+    s.restaurant_url, s.reservation_confirmed, s.updated_at
+"""
+
+
+def get_finalized_session(session_id: int) -> Optional[Dict]:
+    """Get a session whose date has been finalized, or None."""
+    query = f"""
+        SELECT {FINALIZED_SESSION_COLUMNS}
+        FROM poll_sessions s
+        WHERE s.id = %s AND s.finalized_date IS NOT NULL
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(query, (session_id,))
+        return cursor.fetchone()
+
+
+def get_session_participant_ids(session_id: int) -> List[str]:
+    """LINE user IDs of everyone who voted in a session (any storage mode)."""
+    query = """
+        SELECT line_user_id FROM poll_responses WHERE session_id = %s
+        UNION
+        SELECT line_user_id FROM poll_response_bitmaps WHERE session_id = %s
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, (session_id, session_id))
+        return [row[0] for row in cursor.fetchall()]
+
+
+def get_finalized_sessions_by_user(line_user_ids: List[str]) -> Dict[str, List[Dict]]:
+    """
+    Finalized sessions each user voted in.
+
+    Returns:
+        Mapping of LINE user ID to session rows (users without any are
+        included with an empty list)
+    """
+    sessions: Dict[str, List[Dict]] = {line_user_id: [] for line_user_id in line_user_ids}
+    if not line_user_ids:
+        return sessions
+    placeholders = ", ".join(["%s"] * len(line_user_ids))
+    query = f"""
+        SELECT voters.line_user_id AS participant_id, {FINALIZED_SESSION_COLUMNS}
+        FROM (
+            SELECT session_id, line_user_id FROM poll_responses WHERE line_user_id IN ({placeholders})
+            UNION
+            SELECT session_id, line_user_id FROM poll_response_bitmaps WHERE line_user_id IN ({placeholders})
+        ) voters
+        JOIN poll_sessions s ON s.id = voters.session_id
+        WHERE s.finalized_date IS NOT NULL
+        ORDER BY s.id
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(query, [*line_user_ids, *line_user_ids])
+        for row in cursor.fetchall():
+            sessions[row.pop("participant_id")].append(row)
+    return sessions
+
+
+def save_feeds(feeds: List[Tuple[str, str, str, datetime]]) -> None:
+    """Upsert (feed_key, body, etag, last_modified) rows."""
+    if not feeds:
+        return
+    query = """
+        INSERT INTO ics_feeds (feed_key, body, etag, last_modified)
+        VALUES (%s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            last_modified = IF(etag = VALUES(etag), last_modified, VALUES(last_modified)),
+            body = VALUES(body),
+            etag = VALUES(etag)
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany(query, feeds)
+        conn.commit()
+
+
+def load_feed(feed_key: str) -> Optional[Tuple[str, str, datetime]]:
+    """Get (body, etag, last_modified) of a stored feed."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT body, etag, last_modified FROM ics_feeds WHERE feed_key = %s",
+            (feed_key,)
+        )
+        row = cursor.fetchone()
+        return tuple(row) if row else None
@@ -1,13 +1,37 @@
+import hashlib
 from typing import Optional
 
 from db import get_connection
+from utils.cache import TTLCache
+
+# line_user_id -> fingerprint of the last profile written/read for that user
+_profile_fingerprints = TTLCache(maxsize=8192, ttl=6 * 60 * 60)
+
+
+def profile_fingerprint(*values: Optional[str]) -> str:
+    """Stable digest of profile fields, used to detect unchanged profiles."""
+    joined = "\x1f".join("" if value is None else value for value in values)
+    return hashlib.sha1(joined.encode("utf-8")).hexdigest()
 
 
 def upsert_line_user(
     line_user_id: str,
     display_name: Optional[str] = None,
     picture_url: Optional[str] = None,
-) -> None:
+) -> bool:
+    """
+    Insert or update a LINE user profile.
+
+    The write is skipped when the profile matches the cached or stored one.
+
+    Returns:
+        True if a row was written, False if the profile was unchanged
+    """
+    fingerprint = profile_fingerprint(display_name, picture_url)
+    if _profile_fingerprints.get(line_user_id) == fingerprint:
+        return False
+
+    select_query = "SELECT display_name, picture_url FROM line_users WHERE line_user_id = %s"
     query = """
         INSERT INTO line_users (line_user_id, display_name, picture_url)
         VALUES (%s, %s, %s)
@@ -18,4 +42,11 @@ def upsert_line_user(
     """
     with get_connection() as conn:
         cursor = conn.cursor()
+        cursor.execute(select_query, (line_user_id,))
+        row = cursor.fetchone()
+        if row is not None and profile_fingerprint(row[0], row[1]) == fingerprint:
+            _profile_fingerprints.set(line_user_id, fingerprint)
+            return False
         cursor.execute(query, (line_user_id, display_name, picture_url))
+    _profile_fingerprints.set(line_user_id, fingerprint)
+    return True
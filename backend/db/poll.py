@@ -1,8 +1,9 @@
 import json
 from datetime import date, datetime, time, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 from db import get_connection
+from db.poll_response_bitmaps import clear_slot_bit
 
 
 DEFAULT_SETTINGS = {
@@ -11,6 +12,8 @@ DEFAULT_SETTINGS = {
     "weekday_end": "21:00",
     "weekend_start": "18:00",
     "weekend_end": "20:00",
+    # With members' Google calendars: share of them that must be free
+    "min_free_ratio": 0.5,
 }
 
 
@@ -93,6 +96,8 @@ def clear_options(session_id: int) -> None:
     with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute(query, (session_id,))
+        # Bitmap responses point at option bit positions, which restart at 0
+        cursor.execute("DELETE FROM poll_response_bitmaps WHERE session_id=%s", (session_id,))
 
 
 def add_option(
@@ -102,21 +107,53 @@ def add_option(
     label: str,
     created_by: str,
 ) -> int:
+    # slot_bit: stable bit position of the option in poll_response_bitmaps.
+    # The session row lock serializes concurrent adds to the same session,
+    # which would otherwise both take MAX(slot_bit) + 1.
     query = """
-        INSERT INTO poll_options (session_id, label, start_time, end_time, created_by_line_user_id)
-        VALUES (%s, %s, %s, %s, %s)
+        INSERT INTO poll_options (session_id, label, start_time, end_time, slot_bit, created_by_line_user_id)
+        SELECT %s, %s, %s, %s, COALESCE(MAX(slot_bit) + 1, 0), %s
+        FROM poll_options
+        WHERE session_id = %s
     """
     with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute(query, (session_id, label, start_time, end_time, created_by))
-        return cursor.lastrowid
+        conn.start_transaction()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id FROM poll_sessions WHERE id = %s FOR UPDATE", (session_id,))
+            cursor.fetchall()
+            cursor.execute(query, (session_id, label, start_time, end_time, created_by, session_id))
+            option_id = cursor.lastrowid
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return option_id
 
 
 def delete_option(session_id: int, option_id: int) -> None:
+    # The next add_option may reuse the deleted option's slot_bit, so the bit
+    # is cleared from the session's bitmap ballots in the same transaction
+    # (under the session row lock add_option takes)
     query = "DELETE FROM poll_options WHERE session_id=%s AND id=%s"
     with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute(query, (session_id, option_id))
+        conn.start_transaction()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id FROM poll_sessions WHERE id = %s FOR UPDATE", (session_id,))
+            cursor.fetchall()
+            cursor.execute(
+                "SELECT slot_bit FROM poll_options WHERE session_id=%s AND id=%s",
+                (session_id, option_id)
+            )
+            row = cursor.fetchone()
+            cursor.execute(query, (session_id, option_id))
+            if row and row[0] is not None:
+                clear_slot_bit(cursor, session_id, row[0])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
 
 
 def list_options(session_id: int) -> List[Dict]:
@@ -145,9 +182,8 @@ def record_vote(session_id: int, option_id: int, line_user_id: str) -> None:
         cursor.execute(query, (session_id, option_id, line_user_id))
 
 
-def generate_default_options(session_id: int, settings: Dict) -> None:
-    clear_options(session_id)
-    start_date = date.today()
+def candidate_windows(settings: Dict, start_date: Optional[date] = None) -> List[Tuple[datetime, datetime]]:
+    start_date = start_date or date.today()
     range_days = int(settings.get("range_days", DEFAULT_SETTINGS["range_days"]))
 
     weekday_start = _parse_time(settings["weekday_start"])
@@ -155,18 +191,58 @@ def generate_default_options(session_id: int, settings: Dict) -> None:
     weekend_start = _parse_time(settings["weekend_start"])
     weekend_end = _parse_time(settings["weekend_end"])
 
+    windows = []
     for offset in range(range_days):
         current_date = start_date + timedelta(days=offset)
         is_weekend = current_date.weekday() >= 5
         start_t = weekend_start if is_weekend else weekday_start
         end_t = weekend_end if is_weekend else weekday_end
+        windows.append((datetime.combine(current_date, start_t), datetime.combine(current_date, end_t)))
+    return windows
+
 
-        start_dt = datetime.combine(current_date, start_t)
-        end_dt = datetime.combine(current_date, end_t)
+def generate_default_options(
+    session_id: int,
+    settings: Dict,
+    windows: Optional[List[Tuple[datetime, datetime]]] = None,
+) -> None:
+    # windows: pre-filtered candidates (e.g., by members' free/busy)
+    clear_options(session_id)
+    for start_dt, end_dt in windows if windows is not None else candidate_windows(settings):
         label = start_dt.strftime("%m/%d %H:%M") + "-" + end_dt.strftime("%H:%M")
         add_option(session_id, start_dt, end_dt, label, created_by="system")
 
 
+def get_group_calendar_users(group_id: str) -> List[Dict]:
+    # Known members of a group (voters of its sessions and their creators)
+    # with Google Calendar connected
+    query = """
+        SELECT u.line_user_id, u.access_token, u.refresh_token, u.token_expiry
+        FROM users u
+        JOIN (
+            SELECT pr.line_user_id
+            FROM poll_sessions s
+            JOIN poll_responses pr ON pr.session_id = s.id
+            WHERE s.group_id = %s
+            UNION
+            SELECT pb.line_user_id
+            FROM poll_sessions s
+            JOIN poll_response_bitmaps pb ON pb.session_id = s.id
+            WHERE s.group_id = %s
+            UNION
+            SELECT created_by_line_user_id
+            FROM poll_sessions
+            WHERE group_id = %s
+        ) members ON members.line_user_id = u.line_user_id
+        WHERE u.calendar_connected = TRUE
+          AND u.access_token IS NOT NULL
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(query, (group_id, group_id, group_id))
+        return cursor.fetchall()
+
+
 def close_session(session_id: int) -> None:
     update_session_state(session_id, "closed")
 
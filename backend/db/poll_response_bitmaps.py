@@ -0,0 +1,232 @@
+"""
+Compact poll response storage.
+
+One row per (session, user) holds a packed bitmap of the poll options the
+user selected (bit i = the option with slot_bit i) and a second bitmap of the
+selections flagged is_late. Enabled with POLL_RESPONSE_STORAGE=bitmap; the
+read helpers expand bitmaps back into poll_responses-shaped rows so existing
+summaries keep working.
+"""
+
+import os
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from db import get_connection
+
+POLL_RESPONSE_STORAGE = os.getenv("POLL_RESPONSE_STORAGE", "rows").lower()
+BITMAP_STORAGE = POLL_RESPONSE_STORAGE == "bitmap"
+
+
+def encode_bits(bits: Iterable[int]) -> bytes:
+    """Pack bit positions into little-endian bytes (bit i -> byte i // 8)."""
+    value = 0
+    for bit in bits:
+        value |= 1 << bit
+    return value.to_bytes((value.bit_length() + 7) // 8, "little")
+
+
+def decode_bits(bitmap: Optional[bytes]) -> List[int]:
+    """Unpack bytes produced by encode_bits into sorted bit positions."""
+    value = int.from_bytes(bitmap or b"", "little")
+    bits = []
+    position = 0
+    while value:
+        if value & 1:
+            bits.append(position)
+        value >>= 1
+        position += 1
+    return bits
+
+
+def get_session_slots(session_id: int) -> List[Dict]:
+    """Get the poll options of a session with their bit positions."""
+    query = """
+        SELECT id, slot_bit, label, start_time, end_time
+        FROM poll_options
+        WHERE session_id = %s
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(query, (session_id,))
+        return cursor.fetchall()
+
+
+def match_votes_to_slots(
+    votes: List[Dict],
+    slots: List[Dict],
+) -> Tuple[List[int], List[int], List[Dict]]:
+    """
+    Map votes onto option bit positions by their option_id.
+
+    Args:
+        votes: Votes with option_id (None if they match no option) and is_late
+        slots: Options from get_session_slots
+
+    Returns:
+        (selected bits, late bits, votes that match no option)
+    """
+    by_id = {slot["id"]: slot["slot_bit"] for slot in slots}
+    selected: List[int] = []
+    late: List[int] = []
+    unmatched: List[Dict] = []
+    for vote in votes:
+        bit = by_id.get(vote.get("option_id"))
+        if bit is None:
+            unmatched.append(vote)
+            continue
+        selected.append(bit)
+        if vote.get("is_late"):
+            late.append(bit)
+    return selected, late, unmatched
+
+
+def save_bitmap(cursor, session_id: int, line_user_id: str, selected: List[int], late: List[int]) -> None:
+    """Replace a user's bitmap row (removed when nothing is selected)."""
+    if not selected:
+        cursor.execute(
+            "DELETE FROM poll_response_bitmaps WHERE session_id = %s AND line_user_id = %s",
+            (session_id, line_user_id)
+        )
+        return
+    cursor.execute(
+        """
+        INSERT INTO poll_response_bitmaps (session_id, line_user_id, slot_bitmap, late_bitmap)
+        VALUES (%s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            slot_bitmap = VALUES(slot_bitmap),
+            late_bitmap = VALUES(late_bitmap),
+            revision = revision + 1,
+            updated_at = CURRENT_TIMESTAMP
+        """,
+        (session_id, line_user_id, encode_bits(selected), encode_bits(late))
+    )
+
+
+def clear_slot_bit(cursor, session_id: int, bit: int) -> int:
+    """
+    Clear one option bit in every bitmap row of a session (the option was
+    deleted, and its bit may be handed to the next option added).
+
+    Returns:
+        Number of bitmap rows changed
+    """
+    cursor.execute(
+        """
+        SELECT line_user_id, slot_bitmap, late_bitmap
+        FROM poll_response_bitmaps
+        WHERE session_id = %s
+        FOR UPDATE
+        """,
+        (session_id,)
+    )
+    changed = 0
+    for line_user_id, slot_bitmap, late_bitmap in cursor.fetchall():
+        selected = decode_bits(slot_bitmap)
+        if bit not in selected:
+            continue
+        selected.remove(bit)
+        late = [late_bit for late_bit in decode_bits(late_bitmap) if late_bit != bit]
+        save_bitmap(cursor, session_id, line_user_id, selected, late)
+        changed += 1
+    return changed
+
+
+def get_bitmap_responses(
+    line_user_id: Optional[str] = None,
+    session_id: Optional[int] = None,
+) -> List[Dict]:
+    """
+    Expand stored bitmaps into poll_responses-shaped rows.
+
+    Returns:
+        List of dictionaries with line_user_id, display_name, session_id,
+        option_id, selected_date (option label), start_time, end_time,
+        is_late, created_at and updated_at
+    """
+    query = """
+        SELECT b.session_id, b.line_user_id, lu.display_name, b.slot_bitmap, b.late_bitmap,
+               b.created_at, b.updated_at
+        FROM poll_response_bitmaps b
+        LEFT JOIN line_users lu ON b.line_user_id = lu.line_user_id
+        WHERE 1=1
+    """
+    params = []
+    if line_user_id:
+        query += " AND b.line_user_id = %s"
+        params.append(line_user_id)
+    if session_id:
+        query += " AND b.session_id = %s"
+        params.append(session_id)
+
+    with get_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(query, params)
+        bitmaps = cursor.fetchall()
+        if not bitmaps:
+            return []
+
+        session_ids = sorted({row["session_id"] for row in bitmaps})
+        placeholders = ", ".join(["%s"] * len(session_ids))
+        cursor.execute(
+            f"""
+            SELECT id, session_id, slot_bit, label, start_time, end_time
+            FROM poll_options
+            WHERE session_id IN ({placeholders}) AND slot_bit IS NOT NULL
+            """,
+            session_ids
+        )
+        options = {(row["session_id"], row["slot_bit"]): row for row in cursor.fetchall()}
+
+    rows = []
+    for bitmap in bitmaps:
+        late = set(decode_bits(bitmap["late_bitmap"]))
+        for bit in decode_bits(bitmap["slot_bitmap"]):
+            option = options.get((bitmap["session_id"], bit))
+            if option is None:
+                # Option was deleted after the vote
+                continue
+            rows.append({
+                "line_user_id": bitmap["line_user_id"],
+                "display_name": bitmap.get("display_name"),
+                "session_id": bitmap["session_id"],
+                "option_id": option["id"],
+                "selected_date": option["label"],
+                "start_time": option["start_time"],
+                "end_time": option["end_time"],
+                "is_late": bit in late,
+                "created_at": bitmap["created_at"],
+                "updated_at": bitmap["updated_at"],
+            })
+    return rows
+
+
+def get_bitmap_version(session_id: int) -> Tuple[int, int, Optional[datetime]]:
+    """(row count, sum of revisions, max updated_at) of a session's bitmaps."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            SELECT COUNT(*), COALESCE(SUM(revision), 0), MAX(updated_at)
+            FROM poll_response_bitmaps
+            WHERE session_id = %s
+            """,
+            (session_id,)
+        )
+        count, revisions, max_updated_at = cursor.fetchone()
+        return int(count), int(revisions), max_updated_at
+
+
+def delete_bitmaps(cursor, line_user_id: str, session_id: Optional[int] = None) -> int:
+    """Delete a user's bitmap rows (for one session or all)."""
+    if session_id:
+        cursor.execute(
+            "DELETE FROM poll_response_bitmaps WHERE line_user_id = %s AND session_id = %s",
+            (line_user_id, session_id)
+        )
+    else:
+        cursor.execute(
+            "DELETE FROM poll_response_bitmaps WHERE line_user_id = %s",
+            (line_user_id,)
+        )
+    return cursor.rowcount
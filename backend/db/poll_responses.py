@@ -4,9 +4,33 @@ Handles storing and retrieving user vote responses.
 """
 
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 from db import get_connection
+from db.poll_response_bitmaps import (
+    BITMAP_STORAGE,
+    delete_bitmaps,
+    get_bitmap_responses,
+    get_bitmap_version,
+    get_session_slots,
+    match_votes_to_slots,
+    save_bitmap,
+)
+
+INSERT_RESPONSE_QUERY = """
+    INSERT INTO poll_responses 
+    (line_user_id, session_id, option_id, selected_date, start_time, end_time, is_late)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+"""
+
+# Group responses by slot: the integer option_id when the response references a
+# poll option, otherwise (legacy rows) the label and times
+SLOT_GROUP_BY = """
+    GROUP BY option_id,
+        CASE WHEN option_id IS NULL THEN selected_date END,
+        CASE WHEN option_id IS NULL THEN start_time END,
+        CASE WHEN option_id IS NULL THEN end_time END
+"""
 
 
 def save_poll_responses(
@@ -19,9 +43,14 @@ def save_poll_responses(
     Performs a "replace" operation: deletes existing responses for the user
     before inserting new ones.
     
+    Votes are linked to the session's poll options (option_id) by their
+    start/end time. With POLL_RESPONSE_STORAGE=bitmap, votes matching a poll
+    option are stored as one bitmap row; only the others get a row each.
+    
     Args:
         line_user_id: LINE user ID
-        votes: List of vote objects with 'date', 'start_time', 'end_time', 'is_late'
+        votes: List of vote objects with 'date', 'start_time', 'end_time',
+            'is_late' and optionally 'option_id' (see resolve_slot_ids)
         session_id: Optional session ID to associate votes with
     
     Returns:
@@ -44,44 +73,219 @@ def save_poll_responses(
             """
             cursor.execute(delete_query, (line_user_id,))
         
-        # Insert new responses
-        insert_query = """
-            INSERT INTO poll_responses 
-            (line_user_id, session_id, selected_date, start_time, end_time, is_late)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """
+        parsed_votes = _parse_votes(votes)
         
-        for vote in votes:
-            selected_date = vote.get('date', '')
-            start_time = vote.get('start_time')
-            end_time = vote.get('end_time')
-            is_late = vote.get('is_late', False)
-            
-            # Parse datetime strings if provided
-            if isinstance(start_time, str) and start_time:
-                try:
-                    start_time = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
-                except ValueError:
-                    start_time = None
-            
-            if isinstance(end_time, str) and end_time:
-                try:
-                    end_time = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
-                except ValueError:
-                    end_time = None
-            
-            cursor.execute(insert_query, (
+        row_votes = parsed_votes
+        if session_id:
+            slots = get_session_slots(session_id)
+            row_votes = _link_options(parsed_votes, slots)
+            if BITMAP_STORAGE:
+                selected, late, row_votes = match_votes_to_slots(row_votes, slots)
+                save_bitmap(cursor, session_id, line_user_id, selected, late)
+        else:
+            # Options belong to a session; votes without one are never linked
+            for vote in row_votes:
+                vote['option_id'] = None
+        
+        # Insert new responses
+        for vote in row_votes:
+            cursor.execute(INSERT_RESPONSE_QUERY, (
                 line_user_id,
                 session_id,
-                selected_date,
-                start_time,
-                end_time,
-                is_late
+                vote['option_id'],
+                vote['date'],
+                vote['start_time'],
+                vote['end_time'],
+                vote['is_late']
             ))
         
         return len(votes)
 
 
+def save_poll_responses_batch(session_id: int, ballots: Dict[str, List[Dict]]) -> int:
+    """
+    Save the ballots of many users of one session in a single transaction.
+    Same "replace" semantics as save_poll_responses, but with one DELETE and
+    one multi-row INSERT for the whole batch.
+    
+    Args:
+        session_id: Session ID the ballots belong to
+        ballots: Mapping of LINE user ID to that user's list of votes
+    
+    Returns:
+        Number of responses saved
+    """
+    if not ballots:
+        return 0
+    
+    user_ids = list(ballots)
+    rows = []
+    saved = 0
+    with get_connection() as conn:
+        conn.start_transaction()
+        try:
+            cursor = conn.cursor()
+            placeholders = ", ".join(["%s"] * len(user_ids))
+            cursor.execute(
+                f"""
+                DELETE FROM poll_responses
+                WHERE session_id = %s AND line_user_id IN ({placeholders})
+                """,
+                [session_id, *user_ids]
+            )
+            
+            slots = get_session_slots(session_id)
+            for line_user_id, votes in ballots.items():
+                row_votes = _link_options(_parse_votes(votes), slots)
+                if BITMAP_STORAGE:
+                    selected, late, row_votes = match_votes_to_slots(row_votes, slots)
+                    save_bitmap(cursor, session_id, line_user_id, selected, late)
+                rows.extend(
+                    (
+                        line_user_id,
+                        session_id,
+                        vote['option_id'],
+                        vote['date'],
+                        vote['start_time'],
+                        vote['end_time'],
+                        vote['is_late']
+                    )
+                    for vote in row_votes
+                )
+                saved += len(votes)
+            
+            if rows:
+                cursor.executemany(INSERT_RESPONSE_QUERY, rows)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    
+    return saved
+
+
+def _parse_votes(votes: List[Dict]) -> List[Dict]:
+    """Normalize vote objects, parsing ISO datetime strings."""
+    parsed_votes = []
+    for vote in votes:
+        start_time = vote.get('start_time')
+        end_time = vote.get('end_time')
+        
+        # Parse datetime strings if provided
+        if isinstance(start_time, str) and start_time:
+            try:
+                start_time = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
+            except ValueError:
+                start_time = None
+        
+        if isinstance(end_time, str) and end_time:
+            try:
+                end_time = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
+            except ValueError:
+                end_time = None
+        
+        parsed_votes.append({
+            'option_id': vote.get('option_id'),
+            'date': vote.get('date', ''),
+            'start_time': start_time,
+            'end_time': end_time,
+            'is_late': vote.get('is_late', False)
+        })
+    return parsed_votes
+
+
+def _naive(value):
+    """Drop tzinfo so parsed ISO times compare with DATETIME columns."""
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return value.replace(tzinfo=None)
+    return value
+
+
+def _link_options(votes: List[Dict], options: List[Dict]) -> List[Dict]:
+    """
+    Set option_id on votes from the session's poll options: a given ID is
+    kept if it belongs to the session, otherwise the option with the same
+    start/end time is used (None if there is none).
+    """
+    option_ids = {option['id'] for option in options}
+    by_time = {(option['start_time'], option['end_time']): option['id'] for option in options}
+    for vote in votes:
+        if vote.get('option_id') not in option_ids:
+            vote['option_id'] = by_time.get((_naive(vote['start_time']), _naive(vote['end_time'])))
+    return votes
+
+
+def resolve_slot_ids(
+    session_id: int,
+    slot_ids: List[int],
+    late_slot_ids: Optional[List[int]] = None
+) -> List[Dict]:
+    """
+    Turn compact slot-id votes into vote objects.
+    
+    Args:
+        session_id: Session the poll options belong to
+        slot_ids: Selected poll option IDs
+        late_slot_ids: Selected option IDs the user might be late for
+    
+    Returns:
+        Vote objects with option_id, date (option label), start_time,
+        end_time and is_late
+    
+    Raises:
+        ValueError: If an ID is not an option of the session
+    """
+    options = {option['id']: option for option in get_session_slots(session_id)}
+    unknown = [slot_id for slot_id in slot_ids if slot_id not in options]
+    if unknown:
+        raise ValueError(f"Unknown slot ids for session {session_id}: {unknown}")
+    
+    late = set(late_slot_ids or [])
+    return [
+        {
+            'option_id': slot_id,
+            'date': options[slot_id]['label'] or '',
+            'start_time': options[slot_id]['start_time'],
+            'end_time': options[slot_id]['end_time'],
+            'is_late': slot_id in late
+        }
+        for slot_id in dict.fromkeys(slot_ids)
+    ]
+
+
+def _session_rows(session_id: Optional[int]) -> List[Dict]:
+    """
+    All responses (row and bitmap storage) with voter display names.
+    Used by the summaries when POLL_RESPONSE_STORAGE=bitmap.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        query = """
+            SELECT pr.line_user_id, lu.display_name, pr.session_id, pr.option_id, pr.selected_date,
+                   pr.start_time, pr.end_time, pr.is_late, pr.created_at, pr.updated_at
+            FROM poll_responses pr
+            LEFT JOIN line_users lu ON pr.line_user_id = lu.line_user_id
+        """
+        params = []
+        if session_id:
+            query += " WHERE pr.session_id = %s"
+            params.append(session_id)
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+    return rows + get_bitmap_responses(session_id=session_id)
+
+
+def _voter_name(row: Dict) -> str:
+    return row.get('display_name') or f"ユーザー{row['line_user_id'][-4:]}"
+
+
+def slot_key(row: Dict) -> Tuple:
+    """Grouping key of a response: its option_id, or label and times for legacy rows."""
+    if row.get('option_id') is not None:
+        return (row['option_id'],)
+    return (None, row.get('selected_date'), row.get('start_time'), row.get('end_time'))
+
+
 def get_poll_responses(
     line_user_id: Optional[str] = None,
     session_id: Optional[int] = None
@@ -113,7 +317,15 @@ def get_poll_responses(
         query += " ORDER BY created_at DESC"
         
         cursor.execute(query, params)
-        return cursor.fetchall()
+        results = cursor.fetchall()
+    
+    if BITMAP_STORAGE:
+        bitmap_rows = get_bitmap_responses(line_user_id=line_user_id, session_id=session_id)
+        for row in bitmap_rows:
+            row.pop('display_name', None)
+        results = sorted(results + bitmap_rows, key=lambda row: row['created_at'], reverse=True)
+    
+    return results
 
 
 def get_response_summary(session_id: Optional[int] = None) -> Dict:
@@ -126,6 +338,24 @@ def get_response_summary(session_id: Optional[int] = None) -> Dict:
     Returns:
         Dictionary with total_voters and vote_counts
     """
+    if BITMAP_STORAGE:
+        rows = _session_rows(session_id)
+        vote_counts = {}
+        voters_by_option = {}
+        # Rows without a date (NULL labels) first, as ORDER BY does in SQL
+        for row in sorted(rows, key=lambda row: (row['selected_date'] is not None, row['selected_date'] or '')):
+            date_key = row['selected_date']
+            vote_counts[date_key] = vote_counts.get(date_key, 0) + 1
+            voters_by_option.setdefault(date_key, []).append({
+                'user_id': row['line_user_id'],
+                'display_name': _voter_name(row)
+            })
+        return {
+            'total_voters': len({row['line_user_id'] for row in rows}),
+            'vote_counts': vote_counts,
+            'voters_by_option': voters_by_option
+        }
+    
     with get_connection() as conn:
         cursor = conn.cursor(dictionary=True)
         
@@ -146,7 +376,7 @@ def get_response_summary(session_id: Optional[int] = None) -> Dict:
         
         # Count votes per date
         counts_query = """
-            SELECT selected_date, COUNT(*) as vote_count
+            SELECT ANY_VALUE(selected_date) AS selected_date, COUNT(*) as vote_count
             FROM poll_responses
         """
         counts_params = []
@@ -155,12 +385,15 @@ def get_response_summary(session_id: Optional[int] = None) -> Dict:
             counts_query += " WHERE session_id = %s"
             counts_params.append(session_id)
         
-        counts_query += " GROUP BY selected_date ORDER BY selected_date"
+        counts_query += SLOT_GROUP_BY + " ORDER BY selected_date"
         
         cursor.execute(counts_query, counts_params)
         rows = cursor.fetchall()
         
-        vote_counts = {row['selected_date']: row['vote_count'] for row in rows}
+        vote_counts = {}
+        for row in rows:
+            date_key = row['selected_date']
+            vote_counts[date_key] = vote_counts.get(date_key, 0) + row['vote_count']
         
         # Get voters by date
         voters_by_date_query = """
@@ -180,7 +413,7 @@ def get_response_summary(session_id: Optional[int] = None) -> Dict:
             if date_key not in voters_by_option:
                 voters_by_option[date_key] = []
             
-            voter_name = row.get('display_name') or f"ユーザー{row['line_user_id'][-4:]}"
+            voter_name = _voter_name(row)
             voters_by_option[date_key].append({
                 'user_id': row['line_user_id'],
                 'display_name': voter_name
@@ -197,13 +430,35 @@ def get_top_voted_slot(session_id: int) -> Optional[Dict]:
     """
     Get the most-voted slot for a session.
     """
+    if BITMAP_STORAGE:
+        slots = {}
+        for row in _session_rows(session_id):
+            slot = slots.setdefault(slot_key(row), {
+                'option_id': row.get('option_id'),
+                'selected_date': row['selected_date'],
+                'start_time': row['start_time'],
+                'end_time': row['end_time'],
+                'vote_count': 0
+            })
+            slot['vote_count'] += 1
+        if not slots:
+            return None
+        return min(
+            slots.values(),
+            key=lambda slot: (-slot['vote_count'], slot['start_time'] is None, slot['start_time'] or datetime.min)
+        )
+    
     with get_connection() as conn:
         cursor = conn.cursor(dictionary=True)
         query = """
-            SELECT selected_date, start_time, end_time, COUNT(*) AS vote_count
+            SELECT option_id,
+                   ANY_VALUE(selected_date) AS selected_date,
+                   ANY_VALUE(start_time) AS start_time,
+                   ANY_VALUE(end_time) AS end_time,
+                   COUNT(*) AS vote_count
             FROM poll_responses
             WHERE session_id = %s
-            GROUP BY selected_date, start_time, end_time
+        """ + SLOT_GROUP_BY + """
             ORDER BY vote_count DESC, start_time ASC
             LIMIT 1
         """
@@ -211,6 +466,88 @@ def get_top_voted_slot(session_id: int) -> Optional[Dict]:
         return cursor.fetchone()
 
 
+def get_session_intervals(session_id: int) -> List[Dict]:
+    """
+    Get every timed response of a session as an interval.
+    
+    Args:
+        session_id: Session ID
+    
+    Returns:
+        List of dictionaries with line_user_id, display_name, start_time,
+        end_time and is_late (responses without times are skipped)
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        query = """
+            SELECT pr.line_user_id, lu.display_name, pr.start_time, pr.end_time, pr.is_late
+            FROM poll_responses pr
+            LEFT JOIN line_users lu ON pr.line_user_id = lu.line_user_id
+            WHERE pr.session_id = %s
+              AND pr.start_time IS NOT NULL
+              AND pr.end_time IS NOT NULL
+        """
+        cursor.execute(query, (session_id,))
+        rows = cursor.fetchall()
+    
+    if BITMAP_STORAGE:
+        rows += get_bitmap_responses(session_id=session_id)
+    return rows
+
+
+def get_responses_version(session_id: int) -> Tuple:
+    """
+    Get a cheap version stamp of a session's responses.
+    
+    Any insert raises MAX(id), any delete lowers COUNT(*), and updates move
+    MAX(updated_at), so the stamp changes whenever the responses do.
+    With bitmap storage the bitmap table's stamp is appended.
+    
+    Returns:
+        (row count, max id, max updated_at[, bitmap count, revisions, max updated_at])
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            SELECT COUNT(*), COALESCE(MAX(id), 0), MAX(updated_at)
+            FROM poll_responses
+            WHERE session_id = %s
+            """,
+            (session_id,)
+        )
+        count, max_id, max_updated_at = cursor.fetchone()
+    
+    if BITMAP_STORAGE:
+        return (int(count), int(max_id), max_updated_at) + get_bitmap_version(session_id)
+    return int(count), int(max_id), max_updated_at
+
+
+def get_session_slot_responses(session_id: int) -> List[Dict]:
+    """
+    Get the (user, slot) pairs of a session for building availability matrices.
+    
+    Returns:
+        List of dictionaries with line_user_id, display_name, option_id,
+        selected_date, start_time, end_time and is_late
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        query = """
+            SELECT pr.line_user_id, lu.display_name, pr.option_id, pr.selected_date,
+                   pr.start_time, pr.end_time, pr.is_late
+            FROM poll_responses pr
+            LEFT JOIN line_users lu ON pr.line_user_id = lu.line_user_id
+            WHERE pr.session_id = %s
+        """
+        cursor.execute(query, (session_id,))
+        rows = cursor.fetchall()
+    
+    if BITMAP_STORAGE:
+        rows += get_bitmap_responses(session_id=session_id)
+    return rows
+
+
 def delete_user_responses(line_user_id: str, session_id: Optional[int] = None) -> int:
     """
     Delete all responses for a user.
@@ -231,5 +568,9 @@ def delete_user_responses(line_user_id: str, session_id: Optional[int] = None) -
         else:
             query = "DELETE FROM poll_responses WHERE line_user_id = %s"
             cursor.execute(query, (line_user_id,))
+        deleted = cursor.rowcount
+        
+        if BITMAP_STORAGE:
+            deleted += delete_bitmaps(cursor, line_user_id, session_id)
         
-        return cursor.rowcount
+        return deleted
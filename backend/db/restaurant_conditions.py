@@ -19,6 +19,7 @@ def save_restaurant_conditions(
     """
     Save or update restaurant search conditions for a user.
     Uses UPSERT (INSERT ... ON DUPLICATE KEY UPDATE) pattern.
+    Genre codes are also written to restaurant_condition_genres.
     
     Args:
         line_user_id: LINE user ID
@@ -56,16 +57,37 @@ def save_restaurant_conditions(
         ))
         
         # Get the ID (either new insert or existing)
-        if cursor.lastrowid:
-            return cursor.lastrowid
-        else:
+        condition_id = cursor.lastrowid
+        if not condition_id:
             # If updated, get the existing ID
             cursor.execute(
                 "SELECT id FROM restaurant_conditions WHERE line_user_id = %s AND session_id <=> %s",
                 (line_user_id, session_id)
             )
             result = cursor.fetchone()
-            return result[0] if result else 0
+            condition_id = result[0] if result else 0
+
+        if condition_id:
+            _replace_condition_genres(cursor, condition_id, session_id, genre_codes or [])
+
+        return condition_id
+
+
+def _replace_condition_genres(cursor, condition_id: int, session_id: Optional[int], genre_codes: List[str]) -> None:
+    """Replace the normalized genre rows of a condition."""
+    cursor.execute(
+        "DELETE FROM restaurant_condition_genres WHERE condition_id = %s",
+        (condition_id,)
+    )
+    codes = [code for code in dict.fromkeys(genre_codes) if code]
+    if codes:
+        cursor.executemany(
+            """
+            INSERT INTO restaurant_condition_genres (condition_id, session_id, genre_code)
+            VALUES (%s, %s, %s)
+            """,
+            [(condition_id, session_id, code) for code in codes]
+        )
 
 
 def get_restaurant_conditions(
@@ -130,54 +152,54 @@ def get_aggregated_conditions(session_id: int) -> Dict:
         - most_common_budget: Most common budget code
         - total_respondents: Number of users who submitted conditions
     """
-    conditions = get_restaurant_conditions(session_id=session_id)
-    
-    if not conditions:
-        return {
-            "areas": [],
-            "genre_codes": {},
-            "budget_codes": {},
-            "most_common_area": None,
-            "most_common_genres": [],
-            "most_common_budget": None,
-            "total_respondents": 0
-        }
-    
-    areas = []
-    area_counts = {}
-    genre_counts = {}
-    budget_counts = {}
-    
-    for cond in conditions:
-        # Collect and count areas
-        if cond.get('area'):
-            areas.append(cond['area'])
-            area_counts[cond['area']] = area_counts.get(cond['area'], 0) + 1
-        
-        # Count genre codes
-        genres = cond.get('genre_codes', [])
-        if isinstance(genres, list):
-            for genre in genres:
-                genre_counts[genre] = genre_counts.get(genre, 0) + 1
-        
-        # Count budget codes
-        budget = cond.get('budget_code')
-        if budget:
-            budget_counts[budget] = budget_counts.get(budget, 0) + 1
-    
-    # Find most common values
-    most_common_area = max(area_counts, key=area_counts.get) if area_counts else None
-    most_common_genres = sorted(genre_counts, key=genre_counts.get, reverse=True)[:3] if genre_counts else []
-    most_common_budget = max(budget_counts, key=budget_counts.get) if budget_counts else None
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        # Each count is a GROUP BY over a (session_id, ...) index; one round trip
+        cursor.execute(
+            """
+            SELECT 'total' AS kind, NULL AS value, COUNT(*) AS cnt
+            FROM restaurant_conditions WHERE session_id = %s
+            UNION ALL
+            SELECT 'area', area, COUNT(*)
+            FROM restaurant_conditions
+            WHERE session_id = %s AND area IS NOT NULL AND area <> ''
+            GROUP BY area
+            UNION ALL
+            SELECT 'genre', genre_code, COUNT(*)
+            FROM restaurant_condition_genres WHERE session_id = %s
+            GROUP BY genre_code
+            UNION ALL
+            SELECT 'budget', budget_code, COUNT(*)
+            FROM restaurant_conditions
+            WHERE session_id = %s AND budget_code IS NOT NULL AND budget_code <> ''
+            GROUP BY budget_code
+            ORDER BY kind, cnt DESC, value
+            """,
+            (session_id, session_id, session_id, session_id)
+        )
+        rows = cursor.fetchall()
+
+    total_respondents = 0
+    counts: Dict[str, Dict[str, int]] = {"area": {}, "genre": {}, "budget": {}}
+    for kind, value, count in rows:
+        if kind == "total":
+            total_respondents = int(count)
+        else:
+            counts[kind][value] = int(count)
+
+    # Rows are ordered by count, so the first key of each dict is the most common
+    area_counts = counts["area"]
+    genre_counts = counts["genre"]
+    budget_counts = counts["budget"]
     
     return {
-        "areas": list(set(areas)),
+        "areas": list(area_counts),
         "genre_codes": genre_counts,
         "budget_codes": budget_counts,
-        "most_common_area": most_common_area,
-        "most_common_genres": most_common_genres,
-        "most_common_budget": most_common_budget,
-        "total_respondents": len(conditions)
+        "most_common_area": next(iter(area_counts), None),
+        "most_common_genres": list(genre_counts)[:3],
+        "most_common_budget": next(iter(budget_counts), None),
+        "total_respondents": total_respondents
     }
 
 
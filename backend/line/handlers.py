@@ -1,3 +1,4 @@
+import asyncio
 import re
 from urllib.parse import parse_qs
 from datetime import datetime
@@ -5,10 +6,19 @@ from typing import Any, Dict, List, Optional, Tuple
 
 from line.config import BOT_MENTION, FRONTEND_BASE_URL, LIFF_ID
 from line.reply import reply_messages, reply_text
-from api.hotpepper import create_line_carousel_message, fetch_restaurant_by_id, search_restaurants
+from api.hotpepper import (
+    create_line_carousel_message,
+    fetch_restaurants_by_ids,
+    search_shop_pages,
+)
 from db.poll_responses import get_top_voted_slot
 from db.restaurant_conditions import get_aggregated_conditions
-from db.restaurant_votes import get_top_restaurant, save_restaurant_vote
+from db.restaurant_votes import get_restaurant_votes, save_restaurant_vote
+from services.availability_matrix import get_availability_matrix
+from services.freebusy import select_candidate_windows
+from services.shop_ranking import rank_shops_for_session
+from services.vote_buffer import flush_pending_votes
+from utils.cache import TTLCache
 from utils.hotpepper_codes import get_genre_name, get_budget_name
 from db.poll import (
     close_session,
@@ -29,6 +39,34 @@ DEFAULT_PROMPT = (
     "OKなら「OK」、変更するなら「期間 10日」「時間帯 19:00-21:00」を送ってください。"
 )
 
+POPULAR_SHOP_LIMIT = 5
+QUORUM_SLOT_LIMIT = 5
+SHOP_PAGE_SIZE = 10  # LINE carousel max columns
+
+# Closes of evicted shop cursors still in progress
+_closing_cursors: set = set()
+
+
+def _close_shop_cursor(session_id: int, cursor: Dict[str, Any]) -> None:
+    """Close an evicted cursor's generator so its page prefetch is cancelled."""
+
+    async def close() -> None:
+        # Wait for a page request still using the generator
+        async with cursor["lock"]:
+            try:
+                await cursor["pages"].aclose()
+            except Exception as e:
+                print(f"[LINE] closing shop cursor session_id={session_id} failed: {e}")
+
+    task = asyncio.ensure_future(close())
+    _closing_cursors.add(task)
+    task.add_done_callback(_closing_cursors.discard)
+
+
+# session_id -> {"pages": async generator of shop pages, "lock": asyncio.Lock}
+# 「もっと見る」で続きのページを返すためのカーソル
+_shop_cursors = TTLCache(maxsize=256, ttl=30 * 60, on_evict=_close_shop_cursor)
+
 HELP_TEXT = (
     "使い方:\n"
     "開始 飲み会  -> セッション開始\n"
@@ -36,6 +74,7 @@ HELP_TEXT = (
     "候補 8/5 19:00-21:00 -> 候補追加\n"
     "1            -> 投票\n"
     "集計         -> 現在の票数\n"
+    "集計 3       -> 3人以上参加できる日程\n"
     "確定 1       -> 確定\n"
     "削除 3       -> 候補削除\n"
     "予約条件確認 -> 店検索の確認"
@@ -136,6 +175,24 @@ def _format_options(options: List[Dict[str, Any]]) -> str:
     return "\n".join(lines)
 
 
+async def _format_quorum_slots(session_id: int, min_count: int) -> str:
+    await flush_pending_votes(session_id)
+    slots = get_availability_matrix(session_id).query(min_count=min_count, top_k=QUORUM_SLOT_LIMIT)
+    if not slots:
+        return f"{min_count}人以上が参加できる日程はまだありません。"
+    lines = [f"{min_count}人以上が参加できる日程:"]
+    for slot in slots:
+        start_time = slot.get("start_time")
+        end_time = slot.get("end_time")
+        if start_time and end_time:
+            label = f"{start_time.strftime('%m/%d %H:%M')}-{end_time.strftime('%H:%M')}"
+        else:
+            label = slot.get("date_label") or "日程"
+        late = f" うち遅刻{slot['late_count']}人" if slot["late_count"] else ""
+        lines.append(f"・{label} ({slot['vote_count']}人{late})")
+    return "\n".join(lines)
+
+
 def _poll_link(session_id: int) -> str:
     if LIFF_ID:
         return f"https://liff.line.me/{LIFF_ID}?sessionId={session_id}"
@@ -224,6 +281,50 @@ def _build_shop_confirm_message(session_id: int, top_shop: Dict[str, Any]) -> Li
     ]
 
 
+def _build_more_shops_message(session_id: int) -> Dict[str, Any]:
+    return {
+        "type": "template",
+        "altText": "もっと見る",
+        "template": {
+            "type": "buttons",
+            "text": "ほかのお店も見ますか？",
+            "actions": [
+                {
+                    "type": "postback",
+                    "label": "もっと見る",
+                    "displayText": "もっと見る",
+                    "data": f"action=more_restaurants&session_id={session_id}",
+                }
+            ],
+        },
+    }
+
+
+def _build_shop_page_messages(session_id: int, page: Dict[str, Any], alt_text: str) -> List[Dict[str, Any]]:
+    messages = [
+        create_line_carousel_message(
+            page.get("shops", []),
+            alt_text,
+            session_id=session_id,
+        )
+    ]
+    if page.get("has_more"):
+        messages.append(_build_more_shops_message(session_id))
+    return messages
+
+
+async def _next_shop_page(session_id: int) -> Optional[Dict[str, Any]]:
+    """Advance the session's shop cursor; None when expired or exhausted."""
+    cursor = _shop_cursors.get(session_id)
+    if not cursor:
+        return None
+    async with cursor["lock"]:
+        page = await anext(cursor["pages"], None)
+    if page is None or not page.get("has_more"):
+        _shop_cursors.delete(session_id)
+    return page
+
+
 def _build_reservation_done_message(session_id: int) -> List[Dict[str, Any]]:
     return [
         {"type": "text", "text": "予約が完了したら、下のボタンを押してください。"},
@@ -297,12 +398,16 @@ async def _route_message(event: Dict[str, Any], message: str) -> Optional[str]:
     if message in {"人気の店", "人気のお店"}:
         if not session:
             return "進行中の投票がありません。"
-        top_shop = get_top_restaurant(session["id"])
-        if not top_shop:
+        voted_shops = get_restaurant_votes(session["id"])
+        if not voted_shops:
             return "まだお店の投票が集まっていません。"
+        top_shop = voted_shops[0]
         reply_token = event.get("replyToken")
         if reply_token:
-            shop_result = await fetch_restaurant_by_id(top_shop.get("shop_id", ""))
+            # 投票上位のお店をまとめて1リクエストで取得
+            shop_result = await fetch_restaurants_by_ids(
+                [shop.get("shop_id", "") for shop in voted_shops[:POPULAR_SHOP_LIMIT]]
+            )
             shops = shop_result.get("shops", [])
             messages = [{"type": "text", "text": "人気のお店はこちらです。"}]
             if shops:
@@ -319,7 +424,9 @@ async def _route_message(event: Dict[str, Any], message: str) -> Optional[str]:
 
     if session and session["state"] == "pending_defaults":
         if message in {"OK", "ok", "はい", "開始", "デフォルト"}:
-            generate_default_options(session["id"], session["settings"])
+            # 連携済みメンバーのカレンダーで空いている人が多い枠だけを候補にする
+            windows = await select_candidate_windows(session["group_id"], session["settings"])
+            generate_default_options(session["id"], session["settings"], windows=windows)
             update_session_state(session["id"], "voting")
             link = _poll_link(session["id"])
             return f"投票ページ: {link}"
@@ -379,6 +486,12 @@ async def _route_message(event: Dict[str, Any], message: str) -> Optional[str]:
         options = list_options(session["id"])
         return "候補を削除しました。\n" + _format_options(options)
 
+    quorum_match = re.fullmatch(r"集計\s*(\d+)", message)
+    if quorum_match:
+        if not session:
+            return "進行中の投票がありません。"
+        return await _format_quorum_slots(session["id"], int(quorum_match.group(1)))
+
     if message in {"候補一覧", "一覧", "リスト", "集計"}:
         if not session:
             return "進行中の投票がありません。"
@@ -436,33 +549,42 @@ async def _route_postback(event: Dict[str, Any]) -> Optional[object]:
             f"genres={conditions.get('most_common_genres')} "
             f"budget={conditions.get('most_common_budget')}"
         )
-        search_result = await search_restaurants(
+        pages = search_shop_pages(
             area=conditions.get("most_common_area"),
             genre_codes=conditions.get("most_common_genres", [])[:3],
             budget_code=conditions.get("most_common_budget"),
-            count=10,
+            page_size=SHOP_PAGE_SIZE,
+            genre_weights=conditions.get("genre_codes"),
+            rank=lambda shops: rank_shops_for_session(session_id_int, shops),
         )
+        # Expired cursors nobody asks for again are closed here
+        _shop_cursors.purge_expired()
+        _shop_cursors.set(session_id_int, {"pages": pages, "lock": asyncio.Lock()})
+        search_result = await _next_shop_page(session_id_int) or {}
         print(
             "[LINE] hotpepper results_available="
             f"{search_result.get('results_available')} "
             f"results_returned={search_result.get('results_returned')} "
             f"error={search_result.get('error')}"
         )
-        shops = search_result.get("shops", [])
-        if not shops:
+        if not search_result.get("shops"):
             return "条件に合うお店が見つかりませんでした。条件を変えて再度お試しください。"
 
         summary = _format_condition_summary(conditions)
-        carousel_message = create_line_carousel_message(
-            shops,
-            "🍻 おすすめのお店",
-            session_id=session_id_int,
-        )
         return [
             {"type": "text", "text": f"お店を検索しました。\n{summary}"},
-            carousel_message,
+            *_build_shop_page_messages(session_id_int, search_result, "🍻 おすすめのお店"),
         ]
 
+    if action == "more_restaurants":
+        if not session_id or not session_id.isdigit():
+            return "セッションIDが取得できませんでした。"
+        session_id_int = int(session_id)
+        page = await _next_shop_page(session_id_int)
+        if not page:
+            return "これ以上のお店はありません。もう一度「この条件で検索」からお試しください。"
+        return _build_shop_page_messages(session_id_int, page, "🍻 ほかのお店")
+
     if action == "select_shop":
         if not session_id or not session_id.isdigit():
             return "セッションIDが取得できませんでした。"
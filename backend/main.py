@@ -17,6 +17,12 @@ from api.vote import vote_router
 from api.survey import survey_router
 from api.vote_completion import vote_completion_router
 from api.deadline import deadline_router
+from services.calendar_sync import CALENDAR_SYNC_ENABLED, calendar_sync_job
+from services.ics_feed import ICS_FEEDS_ENABLED
+from services.oauth_state import OAUTH_STATE_IN_DATABASE, state_sweeper
+from services.token_manager import TOKEN_REFRESH_ENABLED, token_manager
+from services.vote_buffer import VOTE_WRITE_BEHIND, vote_buffer
+from utils.http import close_http_session
 
 # Load environment variables
 load_dotenv()
@@ -50,6 +56,32 @@ app.add_middleware(
 )
 
 
+@app.on_event("startup")
+async def startup() -> None:
+    """Start background workers"""
+    if not ICS_FEEDS_ENABLED:
+        print("[ICSFeed] ERROR: ICS_FEED_SECRET (or LINE_CHANNEL_SECRET) is not set; ICS feeds are disabled")
+    if VOTE_WRITE_BEHIND:
+        vote_buffer.start()
+    if TOKEN_REFRESH_ENABLED:
+        token_manager.start()
+    if CALENDAR_SYNC_ENABLED:
+        calendar_sync_job.start()
+    if OAUTH_STATE_IN_DATABASE:
+        state_sweeper.start()
+
+
+@app.on_event("shutdown")
+async def shutdown() -> None:
+    """Release shared resources"""
+    if VOTE_WRITE_BEHIND:
+        await vote_buffer.stop()
+    await calendar_sync_job.stop()
+    await state_sweeper.stop()
+    await token_manager.stop()
+    await close_http_session()
+
+
 @app.get("/")
 async def root():
     """Root endpoint"""
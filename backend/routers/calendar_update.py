@@ -1,12 +1,25 @@
 """
 Calendar event update endpoints
 """
-from fastapi import APIRouter, HTTPException
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response
 from pydantic import BaseModel
 from typing import Optional
 
 from db import get_connection
+from services.calendar_sync import sync_calendars
 from services.google_calendar_service import create_event_for_session
+from services.ics_feed import (
+    get_feed,
+    publish_session_feeds,
+    session_feed_key,
+    session_feed_path,
+    user_feed_key,
+    verify_feed_token,
+)
 
 router = APIRouter(prefix="/api/calendar", tags=["calendar"])
 
@@ -16,6 +29,10 @@ class CreateEventWithRestaurantRequest(BaseModel):
     restaurant_name: str
     restaurant_url: Optional[str] = None
     reservation_notes: Optional[str] = None
+    # One event on the organizer's calendar with attendees instead of a copy
+    # per participant (default: GOOGLE_CALENDAR_ORGANIZER_MODE)
+    organizer_mode: Optional[bool] = None
+    organizer_line_user_id: Optional[str] = None
 
 
 @router.get("/sessions/{session_id}/events")
@@ -57,6 +74,72 @@ async def get_session_events(session_id: int):
         cursor.close()
         connection.close()
 
+
+def _feed_response(request: Request, feed_key: str, token: Optional[str]) -> Response:
+    if not verify_feed_token(feed_key, token):
+        raise HTTPException(status_code=404, detail="Feed not found")
+    feed = get_feed(feed_key)
+    if feed is None:
+        raise HTTPException(status_code=404, detail="Feed not found")
+    body, etag, last_modified = feed
+
+    headers = {
+        "ETag": f'"{etag}"',
+        "Last-Modified": format_datetime(last_modified.replace(tzinfo=timezone.utc), usegmt=True),
+        "Cache-Control": "private, max-age=300",
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        if headers["ETag"] in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+            return Response(status_code=304, headers=headers)
+    elif request.headers.get("if-modified-since"):
+        try:
+            since = parsedate_to_datetime(request.headers["if-modified-since"])
+            if since >= last_modified.replace(tzinfo=timezone.utc):
+                return Response(status_code=304, headers=headers)
+        except (TypeError, ValueError):
+            pass
+    return Response(content=body, media_type="text/calendar; charset=utf-8", headers=headers)
+
+
+@router.get("/sessions/{session_id}/feed.ics")
+async def get_session_feed(session_id: int, request: Request, token: Optional[str] = None):
+    """
+    iCalendar feed of a finalized session (subscribable from any calendar app)
+    
+    Args:
+        session_id: Poll session ID
+        token: Feed token from the link handed out on finalization
+    """
+    return _feed_response(request, session_feed_key(session_id), token)
+
+
+@router.get("/users/{line_user_id}/feed.ics")
+async def get_user_feed(line_user_id: str, request: Request, token: Optional[str] = None):
+    """
+    iCalendar feed of every finalized session a user voted in
+    
+    Args:
+        line_user_id: LINE user ID
+        token: Feed token (see services.ics_feed.user_feed_path)
+    """
+    return _feed_response(request, user_feed_key(line_user_id), token)
+
+
+@router.post("/sync")
+async def sync_calendar_events(line_user_id: Optional[str] = None):
+    """
+    Pull changes made in Google Calendar into calendar_events now
+    
+    Args:
+        line_user_id: Sync only this user (default: every user with events)
+        
+    Returns:
+        Per-user sync results and totals
+    """
+    return await sync_calendars(line_user_id)
+
+
 @router.post("/sessions/{session_id}/create-with-restaurant")
 async def create_event_with_restaurant(
     session_id: int,
@@ -117,7 +200,9 @@ async def create_event_with_restaurant(
             start_time=start_time,
             end_time=end_time,
             location=location,
-            description_extra=request.reservation_notes or ""
+            description_extra=request.reservation_notes or "",
+            organizer_mode=request.organizer_mode,
+            organizer_line_user_id=request.organizer_line_user_id
         )
         
         # Update session with restaurant info
@@ -135,6 +220,7 @@ async def create_event_with_restaurant(
             session_id
         ))
         connection.commit()
+        publish_session_feeds(session_id)
         
         return {
             "success": True,
@@ -142,6 +228,7 @@ async def create_event_with_restaurant(
             "restaurant_name": request.restaurant_name,
             "restaurant_url": request.restaurant_url,
             "calendar_creation": calendar_result,
+            "ics_feed_url": session_feed_path(session_id),
             "message": f"{request.restaurant_name}で予約確定！カレンダーに自動登録しました。"
         }
         
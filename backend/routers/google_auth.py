@@ -10,13 +10,11 @@ from crud import user as crud_user
 from schemas import user as schemas_user
 from dependencies import get_db
 from services.google_service import get_google_client
+from services.oauth_state import state_store
+from services.token_manager import token_manager
 
 router = APIRouter()
 
-# Simple in-memory state store for CSRF protection
-# In production, use Redis or database
-_state_store: dict[str, dict] = {}
-
 
 def _normalize_redirect_url(raw_url: str | None) -> str:
     frontend_base = os.getenv("FRONTEND_BASE_URL", "http://localhost:3000")
@@ -55,10 +53,10 @@ async def google_login(line_user_id: str, redirect_url: str | None = None, db: S
 
     # Generate state token for CSRF protection
     state = secrets.token_urlsafe(32)
-    _state_store[state] = {
+    state_store.save(state, {
         "line_user_id": line_user_id,
         "redirect_url": _normalize_redirect_url(redirect_url),
-    }
+    })
 
     # Get Google OAuth client
     google_client = get_google_client()
@@ -88,10 +86,10 @@ async def google_callback(
         JSON response with success message and redirect URL
     """
     # Validate state parameter (CSRF protection)
-    if state not in _state_store:
+    state_payload = state_store.pop(state)
+    if state_payload is None:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid state parameter")
 
-    state_payload = _state_store.pop(state)
     line_user_id = state_payload.get("line_user_id")
     redirect_url = state_payload.get("redirect_url") or os.getenv("FRONTEND_BASE_URL", "http://localhost:3000")
 
@@ -114,7 +112,8 @@ async def google_callback(
         token_expiry = google_client.calculate_expiry_time(expires_in)
 
         # Update user with Google auth data
-        user_info = await google_client.fetch_user_info(access_token)
+        # Profile from the verified id_token (userinfo call only as fallback)
+        user_info = await google_client.get_user_info(token_response)
         google_auth_data = schemas_user.UserGoogleAuth(
             access_token=access_token,
             refresh_token=refresh_token,
@@ -124,6 +123,7 @@ async def google_callback(
             email=user_info.get("email"),
         )
         crud_user.update_user_google_auth(db=db, db_user=db_user, google_auth_data=google_auth_data)
+        token_manager.remember(line_user_id, access_token, token_expiry, refresh_token)
 
         # Redirect to frontend with success message
         frontend_url = redirect_url
@@ -159,32 +159,19 @@ async def refresh_google_token(line_user_id: str, db: Session = Depends(get_db))
     if not db_user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
-    if not db_user.google_refresh_token:
+    if not db_user.refresh_token:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="No refresh token available",
         )
 
     try:
-        google_client = get_google_client()
-        token_response = await google_client.refresh_access_token(db_user.google_refresh_token)
-
-        access_token = token_response.get("access_token")
-        expires_in = token_response.get("expires_in", 3600)
-        token_type = token_response.get("token_type", "Bearer")
-        new_refresh_token = token_response.get("refresh_token", db_user.google_refresh_token)
-
-        # Calculate new expiry
-        token_expiry = google_client.calculate_expiry_time(expires_in)
-
-        # Update user
-        google_auth_data = schemas_user.UserGoogleAuth(
-            access_token=access_token,
-            refresh_token=new_refresh_token,
-            token_expiry=token_expiry,
-            calendar_connected=True,
-        )
-        crud_user.update_user_google_auth(db=db, db_user=db_user, google_auth_data=google_auth_data)
+        # Shares the token request with any refresh already in flight and
+        # stores the new token (and rotated refresh token) in users
+        token = await token_manager.refresh_with_expiry(line_user_id, db_user.refresh_token)
+        if token is None:
+            raise Exception("Token refresh failed")
+        _, token_expiry = token
 
         return {
             "success": True,
@@ -222,13 +209,14 @@ async def disconnect_google(line_user_id: str, db: Session = Depends(get_db)):
             google_connected=False,
         )
         # Manually clear tokens
-        db_user.google_access_token = None
-        db_user.google_refresh_token = None
-        db_user.google_token_expiry = None
+        db_user.access_token = None
+        db_user.refresh_token = None
+        db_user.token_expiry = None
         db_user.google_token_type = None
-        db_user.google_connected = False
+        db_user.calendar_connected = False
         db.add(db_user)
         db.commit()
+        token_manager.forget(line_user_id)
 
         return {"success": True, "message": "Google Calendar disconnected"}
 
@@ -8,7 +8,7 @@ from sqlalchemy.orm import Session
 from crud import user as crud_user
 from schemas import user as schemas_user
 from database import SessionLocal
-from services.line_service import get_line_profile
+from services.line_service import get_line_profile, is_known_user, mark_known_user
 from utils.security import verify_line_signature
 from line.handlers import _route_message, _strip_mention
 from line.reply import reply_text
@@ -100,6 +100,7 @@ async def handle_follow_event(event: dict[str, Any]) -> None:
         )
 
         crud_user.create_or_update_user_by_line_id(db, line_user_id=user_id, user_data=user_data)
+        mark_known_user(user_id)
         print(f"Processed follow event for user {user_id}")
 
     except Exception as e:
@@ -123,19 +124,21 @@ async def handle_message_event(event: dict[str, Any]) -> None:
         if not user_id or not raw_message:
             return
 
-        # Auto-register user if not exists
-        existing_user = crud_user.get_user_by_line_user_id(db, line_user_id=user_id)
-        if not existing_user:
-            # Fetch profile and register
-            profile = await get_line_profile(user_id)
-            user_data = schemas_user.UserCreate(
-                line_user_id=user_id,
-                display_name=profile.get("display_name") if profile else None,
-                picture_url=profile.get("picture_url") if profile else None,
-                status_message=profile.get("status_message") if profile else None,
-            )
-            crud_user.create_user(db=db, user=user_data)
-            print(f"Auto-registered user {user_id} from message event")
+        # Auto-register user if not exists (known users skip the users lookup)
+        if not is_known_user(user_id):
+            existing_user = crud_user.get_user_by_line_user_id(db, line_user_id=user_id)
+            if not existing_user:
+                # Fetch profile and register
+                profile = await get_line_profile(user_id)
+                user_data = schemas_user.UserCreate(
+                    line_user_id=user_id,
+                    display_name=profile.get("display_name") if profile else None,
+                    picture_url=profile.get("picture_url") if profile else None,
+                    status_message=profile.get("status_message") if profile else None,
+                )
+                crud_user.create_user(db=db, user=user_data)
+                print(f"Auto-registered user {user_id} from message event")
+            mark_known_user(user_id)
 
         # Process message with handlers
         message = _strip_mention(event, raw_message, BOT_MENTION)
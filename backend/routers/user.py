@@ -4,6 +4,7 @@ from sqlalchemy.orm import Session
 from crud import user as crud_user
 from schemas import user as schemas_user
 from dependencies import get_db
+from services.line_service import forget_user
 
 router = APIRouter()
 
@@ -59,6 +60,7 @@ def delete_user(line_user_id: str, db: Session = Depends(get_db)):
     if db_user is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     crud_user.delete_user(db=db, db_user=db_user)
+    forget_user(line_user_id)
     return None
 
 
@@ -0,0 +1,166 @@
+"""
+Per-session users x slots availability matrix.
+
+Each slot's availability is stored as a packed bitset over users, built once
+per session version from poll_responses. Quorum ("at least N people"),
+must-attend ("A and B can both come") and top-k queries are answered with
+vectorized bit operations and popcounts instead of repeated SQL queries.
+"""
+
+import os
+from datetime import datetime
+from typing import Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from db.poll_responses import get_responses_version, get_session_slot_responses, slot_key
+from utils.cache import TTLCache
+
+AVAILABILITY_CACHE_SIZE = int(os.getenv("AVAILABILITY_CACHE_SIZE", "256"))
+AVAILABILITY_CACHE_TTL = float(os.getenv("AVAILABILITY_CACHE_TTL", "3600"))
+
+# Number of set bits in every byte value
+_POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+# session_id -> (version, AvailabilityMatrix)
+_matrices = TTLCache(maxsize=AVAILABILITY_CACHE_SIZE, ttl=AVAILABILITY_CACHE_TTL)
+
+
+def _pack(rows: np.ndarray) -> np.ndarray:
+    """Pack a (slots, users) bool array into (slots, ceil(users / 8)) bytes."""
+    return np.packbits(rows, axis=1)
+
+
+def _popcount(packed: np.ndarray) -> np.ndarray:
+    """Count set bits per row of a packed bitset array."""
+    return _POPCOUNT[packed].sum(axis=1, dtype=np.int64)
+
+
+class AvailabilityMatrix:
+    """
+    Availability of every user for every slot of a session.
+
+    Attributes:
+        users: User IDs in bit order
+        names: Display name per user ID
+        slots: Slot dictionaries (option_id, date_label, start_time, end_time)
+        available: (slots, users/8) packed bitsets of users who can attend
+        late: (slots, users/8) packed bitsets of users who might be late
+        counts: Number of available users per slot
+    """
+
+    def __init__(self, responses: Iterable[Dict]):
+        user_index: Dict[str, int] = {}
+        slot_index: Dict[Hashable, int] = {}
+        self.names: Dict[str, str] = {}
+        self.slots: List[Dict] = []
+        cells: List[Tuple[int, int, bool]] = []
+
+        for row in responses:
+            user_id = row["line_user_id"]
+            if user_id not in user_index:
+                user_index[user_id] = len(user_index)
+                self.names[user_id] = row.get("display_name") or f"ユーザー{user_id[-4:]}"
+            key = slot_key(row)
+            if key not in slot_index:
+                slot_index[key] = len(slot_index)
+                self.slots.append({
+                    "option_id": row.get("option_id"),
+                    "date_label": row.get("selected_date"),
+                    "start_time": row.get("start_time"),
+                    "end_time": row.get("end_time"),
+                })
+            cells.append((slot_index[key], user_index[user_id], bool(row.get("is_late"))))
+
+        self.users = list(user_index)
+        available = np.zeros((len(self.slots), len(self.users)), dtype=bool)
+        late = np.zeros_like(available)
+        if cells:
+            slots, users, is_late = (np.array(column) for column in zip(*cells))
+            available[slots, users] = True
+            late[slots[is_late], users[is_late]] = True
+
+        self.available = _pack(available)
+        self.late = _pack(late)
+        self.counts = _popcount(self.available)
+        self._user_index = user_index
+        # Position of each slot in start time order (tie-breaker for queries)
+        chronological = sorted(range(len(self.slots)), key=lambda index: _slot_sort_key(self.slots[index]))
+        self._slot_rank = np.empty(len(self.slots), dtype=np.int64)
+        self._slot_rank[chronological] = np.arange(len(self.slots))
+
+    def mask(self, user_ids: Sequence[str]) -> Optional[np.ndarray]:
+        """Packed bitset of the given users, or None if any of them never voted."""
+        bits = np.zeros(len(self.users), dtype=bool)
+        for user_id in user_ids:
+            index = self._user_index.get(user_id)
+            if index is None:
+                return None
+            bits[index] = True
+        return np.packbits(bits)
+
+    def query(
+        self,
+        min_count: int = 0,
+        must_attend: Optional[Sequence[str]] = None,
+        top_k: Optional[int] = None,
+    ) -> List[Dict]:
+        """
+        Find slots matching a quorum and/or must-attend condition.
+
+        Args:
+            min_count: Minimum number of available users
+            must_attend: User IDs who must all be available
+            top_k: Return only the k slots with the most available users
+
+        Returns:
+            Slots sorted by available count (desc) then start time, each with
+            vote_count, late_count and voters
+        """
+        selected = self.counts >= min_count
+        if must_attend:
+            required = self.mask(must_attend)
+            if required is None:
+                return []
+            selected &= ((self.available & required) == required).all(axis=1)
+
+        indices = np.flatnonzero(selected)
+        order = indices[np.lexsort((self._slot_rank[indices], -self.counts[indices]))]
+        if top_k is not None:
+            order = order[:max(top_k, 0)]
+
+        late_counts = _popcount(self.late[order])
+        return [
+            {
+                **self.slots[index],
+                "vote_count": int(self.counts[index]),
+                "late_count": int(late_count),
+                "voters": [self.names[user_id] for user_id in self.users_at(index)],
+            }
+            for index, late_count in zip(order, late_counts)
+        ]
+
+    def users_at(self, slot: int) -> List[str]:
+        """User IDs available for the slot at the given index."""
+        bits = np.unpackbits(self.available[slot], count=len(self.users)).astype(bool)
+        return [self.users[index] for index in np.flatnonzero(bits)]
+
+
+def _slot_sort_key(slot: Dict) -> Tuple[bool, datetime, str]:
+    start = slot.get("start_time")
+    return (start is None, start or datetime.min, slot.get("date_label") or "")
+
+
+def get_availability_matrix(session_id: int) -> AvailabilityMatrix:
+    """
+    Get the availability matrix of a session, rebuilding it only when the
+    session's responses changed since it was last built.
+    """
+    version = get_responses_version(session_id)
+    cached = _matrices.get(session_id)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    matrix = AvailabilityMatrix(get_session_slot_responses(session_id))
+    _matrices.set(session_id, (version, matrix))
+    return matrix
+
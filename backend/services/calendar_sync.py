@@ -0,0 +1,229 @@
+"""
+Incremental sync of created calendar events with Google.
+
+For every user with rows in calendar_events, the Calendar API is asked only
+for the events changed since that user's last nextSyncToken (kept in
+calendar_sync_state). Changes to tracked events are applied in bulk: edited
+events update title, time and location; deleted (cancelled) events remove
+the row. The first run, or a run after Google expired the token (410), lists
+the calendar once to obtain a new token. Every user's run is recorded in
+sync_logs.
+"""
+
+import asyncio
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from db import get_connection
+from services.google_calendar_service import GoogleCalendarService, SyncTokenExpired
+from services.token_manager import token_manager
+
+CALENDAR_SYNC_INTERVAL = float(os.getenv("CALENDAR_SYNC_INTERVAL", "900"))
+CALENDAR_SYNC_CONCURRENCY = int(os.getenv("CALENDAR_SYNC_CONCURRENCY", "4"))
+CALENDAR_SYNC_ENABLED = os.getenv("CALENDAR_SYNC_ENABLED", "true").lower() in {"1", "true", "yes"}
+
+# Rows per bulk UPDATE / DELETE statement
+_CHUNK_SIZE = 500
+
+
+def get_sync_targets(line_user_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Connected users with created events, with their last sync token."""
+    query = """
+        SELECT u.id AS user_id, u.line_user_id, u.access_token, u.refresh_token,
+               u.token_expiry, st.sync_token
+        FROM users u
+        JOIN (SELECT DISTINCT user_id FROM calendar_events) tracked ON tracked.user_id = u.id
+        LEFT JOIN calendar_sync_state st ON st.user_id = u.id
+        WHERE u.calendar_connected = TRUE
+          AND u.access_token IS NOT NULL
+    """
+    params: List[Any] = []
+    if line_user_id:
+        query += " AND u.line_user_id = %s"
+        params.append(line_user_id)
+    with get_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(query, params)
+        return cursor.fetchall()
+
+
+def apply_event_changes(user_id: int, items: List[Dict[str, Any]]) -> Tuple[int, int]:
+    """
+    Apply changed Google events to a user's calendar_events rows.
+
+    Events that are not ours are ignored by the join. The description is left
+    untouched because it carries the session_id marker used to find a
+    session's events.
+
+    Returns:
+        (updated rows, deleted rows)
+    """
+    cancelled = [item["id"] for item in items if item.get("status") == "cancelled"]
+    changed = []
+    for item in items:
+        if item.get("status") == "cancelled":
+            continue
+        start = GoogleCalendarService.parse_event_time(item.get("start"))
+        end = GoogleCalendarService.parse_event_time(item.get("end"))
+        if start is None or end is None:
+            continue
+        changed.append((item["id"], item.get("summary"), item.get("location"), start, end))
+
+    updated = deleted = 0
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        for offset in range(0, len(cancelled), _CHUNK_SIZE):
+            chunk = cancelled[offset:offset + _CHUNK_SIZE]
+            cursor.execute(
+                f"""
+                DELETE FROM calendar_events
+                WHERE user_id = %s AND google_event_id IN ({", ".join(["%s"] * len(chunk))})
+                """,
+                [user_id, *chunk]
+            )
+            deleted += cursor.rowcount
+
+        for offset in range(0, len(changed), _CHUNK_SIZE):
+            chunk = changed[offset:offset + _CHUNK_SIZE]
+            rows = " UNION ALL ".join(
+                ["SELECT %s AS google_event_id, %s AS title, %s AS location, %s AS start_time, %s AS end_time"]
+                * len(chunk)
+            )
+            cursor.execute(
+                f"""
+                UPDATE calendar_events ce
+                JOIN ({rows}) ch ON ch.google_event_id = ce.google_event_id
+                SET ce.title = COALESCE(ch.title, ce.title),
+                    ce.location = COALESCE(ch.location, ''),
+                    ce.start_time = ch.start_time,
+                    ce.end_time = ch.end_time,
+                    ce.synced = TRUE,
+                    ce.last_sync = NOW()
+                WHERE ce.user_id = %s
+                """,
+                [value for row in chunk for value in row] + [user_id]
+            )
+            updated += cursor.rowcount
+        conn.commit()
+    return updated, deleted
+
+
+def save_sync_state(user_id: int, sync_token: Optional[str], full: bool) -> None:
+    query = """
+        INSERT INTO calendar_sync_state (user_id, sync_token, last_full_sync, last_sync)
+        VALUES (%s, %s, IF(%s, NOW(), NULL), NOW())
+        ON DUPLICATE KEY UPDATE
+            sync_token = VALUES(sync_token),
+            last_full_sync = IF(%s, NOW(), last_full_sync),
+            last_sync = NOW()
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, (user_id, sync_token, full, full))
+        conn.commit()
+
+
+def save_sync_logs(results: List[Dict[str, Any]]) -> None:
+    if not results:
+        return
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany(
+            "INSERT INTO sync_logs (user_id, sync_type, status, message) VALUES (%s, %s, %s, %s)",
+            [(r["user_id"], r["sync_type"], r["status"], r["message"]) for r in results]
+        )
+        conn.commit()
+
+
+async def sync_user(target: Dict[str, Any]) -> Dict[str, Any]:
+    """Sync one user (a row from get_sync_targets)."""
+    sync_token = target.get("sync_token")
+    result = {
+        "user_id": target["user_id"],
+        "line_user_id": target["line_user_id"],
+        "sync_type": "incremental" if sync_token else "full",
+        "changes": 0,
+        "updated": 0,
+        "deleted": 0,
+    }
+    try:
+        access_token = await token_manager.get_access_token(target)
+        try:
+            items, next_token = await GoogleCalendarService.list_event_changes(access_token, sync_token)
+        except SyncTokenExpired:
+            result["sync_type"] = "full"
+            items, next_token = await GoogleCalendarService.list_event_changes(access_token)
+
+        updated, deleted = apply_event_changes(target["user_id"], items)
+        save_sync_state(target["user_id"], next_token, result["sync_type"] == "full")
+        result.update({
+            "status": "success",
+            "changes": len(items),
+            "updated": updated,
+            "deleted": deleted,
+            "message": f"{len(items)} changes, {updated} updated, {deleted} deleted",
+        })
+    except Exception as e:
+        result.update({"status": "error", "message": str(e)})
+    return result
+
+
+async def sync_calendars(line_user_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Sync every tracked user (or one), CALENDAR_SYNC_CONCURRENCY at a time.
+
+    Returns:
+        Dict with per-user results and totals
+    """
+    targets = get_sync_targets(line_user_id)
+    semaphore = asyncio.Semaphore(max(CALENDAR_SYNC_CONCURRENCY, 1))
+
+    async def run(target: Dict[str, Any]) -> Dict[str, Any]:
+        async with semaphore:
+            return await sync_user(target)
+
+    results = list(await asyncio.gather(*(run(target) for target in targets)))
+    save_sync_logs(results)
+    return {
+        "users": len(results),
+        "failed": sum(1 for r in results if r["status"] != "success"),
+        "updated": sum(r["updated"] for r in results),
+        "deleted": sum(r["deleted"] for r in results),
+        "results": results,
+    }
+
+
+class CalendarSyncJob:
+    """Runs sync_calendars periodically in the background."""
+
+    def __init__(self, interval: float = CALENDAR_SYNC_INTERVAL):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                summary = await sync_calendars()
+                print(
+                    f"[CalendarSync] users={summary['users']} failed={summary['failed']} "
+                    f"updated={summary['updated']} deleted={summary['deleted']}"
+                )
+            except Exception as e:
+                print(f"[CalendarSync] sync failed: {e}")
+
+
+calendar_sync_job = CalendarSyncJob()
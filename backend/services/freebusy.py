@@ -0,0 +1,174 @@
+"""
+Free/busy-aware candidate slots.
+
+Before a poll's default options are generated, the primary calendars of the
+group's members who connected Google are queried with FreeBusy (packed into
+/batch requests, one sub-request per user token). Each user's busy periods
+are merged into disjoint intervals and cached for FREEBUSY_CACHE_TTL, so
+changing 期間/時間帯 and regenerating does not query Google again. Only the
+windows where at least min_free_ratio of those members are free are kept.
+"""
+
+import asyncio
+import math
+import os
+from bisect import bisect_left
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from db.poll import DEFAULT_SETTINGS, candidate_windows, get_group_calendar_users
+from services.google_calendar_service import CALENDAR_BATCH_SIZE, GoogleCalendarService
+from services.token_manager import token_manager
+from utils.cache import TTLCache
+
+FREEBUSY_ENABLED = os.getenv("FREEBUSY_ENABLED", "true").lower() in {"1", "true", "yes"}
+FREEBUSY_CACHE_SIZE = int(os.getenv("FREEBUSY_CACHE_SIZE", "1024"))
+FREEBUSY_CACHE_TTL = float(os.getenv("FREEBUSY_CACHE_TTL", "300"))
+
+# Poll options are naive Japan time (see GoogleCalendarService._parse_datetime)
+_JST = timezone(timedelta(hours=9))
+
+Interval = Tuple[datetime, datetime]
+
+# line_user_id -> (range start, range end, merged busy intervals)
+_busy_cache = TTLCache(maxsize=FREEBUSY_CACHE_SIZE, ttl=FREEBUSY_CACHE_TTL)
+
+
+def merge_intervals(intervals: List[Interval]) -> List[Interval]:
+    """Merge overlapping or touching intervals into sorted disjoint ones."""
+    merged: List[Interval] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def is_free(busy: List[Interval], start: datetime, end: datetime) -> bool:
+    """Whether [start, end) overlaps none of the merged busy intervals."""
+    # First busy interval ending after start is the only one that can overlap
+    index = bisect_left(busy, (start, start))
+    if index > 0 and busy[index - 1][1] > start:
+        return False
+    return index == len(busy) or busy[index][0] >= end
+
+
+def _to_local(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        return parsed
+    return parsed.astimezone(_JST).replace(tzinfo=None)
+
+
+async def get_busy_intervals(
+    users: List[Dict],
+    time_min: datetime,
+    time_max: datetime,
+) -> Dict[str, List[Interval]]:
+    """
+    Get merged busy intervals of users between time_min and time_max.
+
+    Args:
+        users: Rows with line_user_id, access_token, refresh_token, token_expiry
+        time_min: Range start (naive Japan time)
+        time_max: Range end (naive Japan time)
+
+    Returns:
+        Mapping of user ID to merged busy intervals, for every user whose
+        calendar could be read (others are left out)
+    """
+    busy: Dict[str, List[Interval]] = {}
+    missing = []
+    for user in users:
+        cached = _busy_cache.get(user["line_user_id"])
+        if cached is not None and cached[0] <= time_min and time_max <= cached[1]:
+            busy[user["line_user_id"]] = cached[2]
+        else:
+            missing.append(user)
+    if not missing:
+        return busy
+
+    tokens = await asyncio.gather(
+        *(token_manager.get_access_token(user) for user in missing),
+        return_exceptions=True
+    )
+    queried = [(user, token) for user, token in zip(missing, tokens) if not isinstance(token, Exception)]
+    chunks = [queried[i:i + CALENDAR_BATCH_SIZE] for i in range(0, len(queried), CALENDAR_BATCH_SIZE)]
+    time_min_str = time_min.replace(tzinfo=_JST).isoformat()
+    time_max_str = time_max.replace(tzinfo=_JST).isoformat()
+
+    async def query(chunk: List[Tuple[Dict, str]]) -> None:
+        try:
+            results = await GoogleCalendarService.query_freebusy_batch(
+                [token for _, token in chunk], time_min_str, time_max_str
+            )
+        except Exception as e:
+            print(f"[FreeBusy] batch query failed for {len(chunk)} users: {e}")
+            return
+        for (user, _), result in zip(chunk, results):
+            if "busy" not in result:
+                print(f"[FreeBusy] {user['line_user_id']}: {result['error']}")
+                continue
+            intervals = merge_intervals([
+                (_to_local(period["start"]), _to_local(period["end"])) for period in result["busy"]
+            ])
+            _busy_cache.set(user["line_user_id"], (time_min, time_max, intervals))
+            busy[user["line_user_id"]] = intervals
+
+    await asyncio.gather(*(query(chunk) for chunk in chunks))
+    return busy
+
+
+def filter_windows(
+    windows: List[Interval],
+    busy: Dict[str, List[Interval]],
+    min_free_ratio: float,
+) -> List[Interval]:
+    """
+    Keep the windows where at least min_free_ratio of the users are free.
+
+    Falls back to all windows when none qualifies, so a poll is never empty.
+    """
+    if not busy:
+        return windows
+    required = max(1, math.ceil(len(busy) * min_free_ratio))
+    selected = [
+        (start, end) for start, end in windows
+        if sum(is_free(intervals, start, end) for intervals in busy.values()) >= required
+    ]
+    return selected or windows
+
+
+async def select_candidate_windows(
+    group_id: str,
+    settings: Dict,
+    start_date: Optional[date] = None,
+) -> Optional[List[Interval]]:
+    """
+    Candidate windows for a new poll, filtered by members' free/busy.
+
+    Returns:
+        The windows to propose, or None to use the unfiltered defaults
+        (disabled, or no member has Google Calendar connected)
+    """
+    if not FREEBUSY_ENABLED:
+        return None
+    users = get_group_calendar_users(group_id)
+    if not users:
+        return None
+
+    windows = candidate_windows(settings, start_date)
+    if not windows:
+        return windows
+    time_min = min(start for start, _ in windows)
+    time_max = max(end for _, end in windows)
+    try:
+        busy = await get_busy_intervals(users, time_min, time_max)
+    except Exception as e:
+        print(f"[FreeBusy] lookup failed for group {group_id}: {e}")
+        return None
+
+    ratio = float(settings.get("min_free_ratio", DEFAULT_SETTINGS["min_free_ratio"]))
+    return filter_windows(windows, busy, ratio)
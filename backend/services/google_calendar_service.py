@@ -2,18 +2,61 @@
 Google Calendar API service for creating and managing calendar events.
 """
 
-from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional
-
-import aiohttp
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import re
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
 
 from db import get_connection
+from services.token_manager import seconds_left, token_manager
+from utils.http import get_http_session
+
+# Maximum number of users whose events are created in parallel
+CALENDAR_CREATE_CONCURRENCY = int(os.getenv("CALENDAR_CREATE_CONCURRENCY", "20"))
+
+# Batch mode packs the event inserts of many users into multipart /batch
+# requests (Google accepts up to 50 sub-requests per batch)
+CALENDAR_BATCH_MODE = os.getenv("GOOGLE_CALENDAR_BATCH_MODE", "false").lower() in {"1", "true", "yes"}
+CALENDAR_BATCH_SIZE = min(int(os.getenv("GOOGLE_CALENDAR_BATCH_SIZE", "50")), 50)
+
+# Organizer mode creates one event on the organizer's calendar and invites the
+# other participants instead of inserting a copy into every calendar
+CALENDAR_ORGANIZER_MODE = os.getenv("GOOGLE_CALENDAR_ORGANIZER_MODE", "false").lower() in {"1", "true", "yes"}
+
+
+def event_id_for(session_id: int, line_user_id: str, mode: str = "user") -> str:
+    """
+    Deterministic Google event ID of a session's event in a user's calendar.
+    
+    Google event IDs use base32hex characters (a-v, 0-9), so creating the same
+    (session, user) event twice fails with 409 instead of duplicating it.
+    mode ("user" or "organizer") keeps the organizer's shared event apart from
+    the event the same user gets in per-user mode.
+    """
+    # Per-user IDs keep their original input so already created events match
+    key = f"schedule-bot:{session_id}:{line_user_id}"
+    if mode != "user":
+        key += f":{mode}"
+    digest = hashlib.sha256(key.encode("utf-8")).digest()
+    return base64.b32hexencode(digest).decode("ascii").rstrip("=").lower()
+
+
+class SyncTokenExpired(Exception):
+    """The Calendar API rejected a syncToken (410 Gone); a full sync is needed."""
 
 
 class GoogleCalendarService:
     """Service for interacting with Google Calendar API"""
 
-    CALENDAR_API_BASE = "https://www.googleapis.com/calendar/v3"
+    CALENDAR_API_BASE = os.getenv("GOOGLE_CALENDAR_API_BASE", "https://www.googleapis.com/calendar/v3")
+    CALENDAR_BATCH_URL = os.getenv("GOOGLE_CALENDAR_BATCH_URL", "https://www.googleapis.com/batch/calendar/v3")
+    # Path of the events endpoint inside a batch sub-request
+    CALENDAR_BATCH_PATH = "/calendar/v3"
 
     @staticmethod
     def _parse_datetime(date_str: str, time_str: str) -> str:
@@ -22,11 +65,22 @@ class GoogleCalendarService:
         
         Args:
             date_str: Date string (e.g., "2026-01-15" or "1月15日(水)")
-            time_str: Time string (e.g., "18:00:00" or "18:00")
+            time_str: Time string (e.g., "18:00:00" or "18:00"), or a full
+                datetime / "YYYY-MM-DD HH:MM:SS" string, in which case the
+                date label is not parsed at all
             
         Returns:
             RFC3339 formatted datetime string
         """
+        # Slots referenced by poll option ID carry real datetimes
+        if isinstance(time_str, datetime):
+            return time_str.strftime("%Y-%m-%dT%H:%M:%S+09:00")
+        if isinstance(time_str, str) and len(time_str) > 10 and time_str[4] == "-":
+            try:
+                return datetime.fromisoformat(time_str).strftime("%Y-%m-%dT%H:%M:%S+09:00")
+            except ValueError:
+                pass
+
         try:
             # Handle time format
             if isinstance(time_str, str):
@@ -70,7 +124,9 @@ class GoogleCalendarService:
         description: Optional[str] = None,
         location: Optional[str] = None,
         attendees: Optional[List[str]] = None,
-        calendar_id: str = "primary"
+        calendar_id: str = "primary",
+        send_updates: Optional[str] = None,
+        event_id: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Create a new calendar event in Google Calendar.
@@ -84,9 +140,16 @@ class GoogleCalendarService:
             location: Optional event location
             attendees: Optional list of attendee email addresses
             calendar_id: Calendar ID (default: "primary")
+            send_updates: Who Google emails invitations to ("all",
+                "externalOnly" or "none"; API default when omitted)
+            event_id: Client-chosen event ID (see event_id_for)
             
         Returns:
-            Created event object from Google Calendar API
+            Created event object from Google Calendar API. If an event with
+            event_id already exists (409), that event with "duplicate": True
+            is returned instead of creating another one. If the user had
+            deleted it (status "cancelled"), it is restored with event_body
+            and returned as a new event.
             
         Raises:
             Exception: If event creation fails
@@ -98,6 +161,121 @@ class GoogleCalendarService:
             "Content-Type": "application/json"
         }
         
+        event_body = GoogleCalendarService._event_body(
+            summary, start_datetime, end_datetime, description, location, attendees, event_id
+        )
+        
+        params = {"sendUpdates": send_updates} if send_updates else None
+        
+        try:
+            session = get_http_session()
+            async with session.post(url, headers=headers, json=event_body, params=params) as resp:
+                conflict = resp.status == 409 and event_id
+                if not conflict and resp.status not in [200, 201]:
+                    error_text = await resp.text()
+                    raise Exception(
+                        f"Calendar event creation failed: {resp.status} {error_text}"
+                    )
+                
+                if not conflict:
+                    event_data = await resp.json()
+                    return event_data
+            
+            # Created by an earlier attempt, or deleted by the user since
+            event_url = f"{url}/{event_id}"
+            async with session.get(event_url, headers=headers) as resp:
+                if resp.status != 200:
+                    error_text = await resp.text()
+                    raise Exception(f"Calendar event lookup failed: {resp.status} {error_text}")
+                existing = await resp.json()
+            if existing.get("status") != "cancelled":
+                return {**existing, "id": event_id, "duplicate": True}
+            
+            async with session.put(
+                event_url, headers=headers, json={**event_body, "status": "confirmed"}, params=params
+            ) as resp:
+                if resp.status != 200:
+                    error_text = await resp.text()
+                    raise Exception(f"Calendar event restore failed: {resp.status} {error_text}")
+                return await resp.json()
+        
+        except Exception as e:
+            raise Exception(f"Failed to create calendar event: {str(e)}")
+
+    @staticmethod
+    async def list_event_changes(
+        access_token: str,
+        sync_token: Optional[str] = None,
+        calendar_id: str = "primary"
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        List the events changed since sync_token (all events without one).
+        
+        Follows nextPageToken until the last page, which carries the
+        nextSyncToken for the next incremental call. Deleted events are
+        included with status "cancelled".
+        
+        Args:
+            access_token: Google OAuth access token
+            sync_token: nextSyncToken from the previous call
+            calendar_id: Calendar ID (default: "primary")
+            
+        Returns:
+            (changed events, nextSyncToken)
+            
+        Raises:
+            SyncTokenExpired: If Google invalidated sync_token
+            Exception: If listing fails
+        """
+        url = f"{GoogleCalendarService.CALENDAR_API_BASE}/calendars/{calendar_id}/events"
+        headers = {"Authorization": f"Bearer {access_token}"}
+        params = {"maxResults": "2500", "showDeleted": "true"}
+        if sync_token:
+            params["syncToken"] = sync_token
+
+        items: List[Dict[str, Any]] = []
+        session = get_http_session()
+        while True:
+            async with session.get(url, headers=headers, params=params) as resp:
+                if resp.status == 410:
+                    raise SyncTokenExpired(await resp.text())
+                if resp.status != 200:
+                    error_text = await resp.text()
+                    raise Exception(f"Calendar event listing failed: {resp.status} {error_text}")
+                page = await resp.json()
+            items.extend(page.get("items", []))
+            if not page.get("nextPageToken"):
+                return items, page.get("nextSyncToken")
+            params["pageToken"] = page["nextPageToken"]
+
+    @staticmethod
+    def parse_event_time(value: Optional[Dict[str, Any]]) -> Optional[datetime]:
+        """
+        Convert an event start/end object ({"dateTime"} or all-day {"date"})
+        into a naive Japan time datetime, as stored in calendar_events.
+        """
+        if not value:
+            return None
+        if value.get("dateTime"):
+            parsed = datetime.fromisoformat(value["dateTime"].replace("Z", "+00:00"))
+            if parsed.tzinfo is not None:
+                parsed = parsed.astimezone(timezone(timedelta(hours=9))).replace(tzinfo=None)
+            return parsed
+        if value.get("date"):
+            return datetime.fromisoformat(value["date"])
+        return None
+
+    @staticmethod
+    def _event_body(
+        summary: str,
+        start_datetime: str,
+        end_datetime: str,
+        description: Optional[str] = None,
+        location: Optional[str] = None,
+        attendees: Optional[List[str]] = None,
+        event_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Build the JSON body of an events.insert request."""
         event_body = {
             "summary": summary,
             "start": {
@@ -121,20 +299,235 @@ class GoogleCalendarService:
             event_body["guestsCanSeeOtherGuests"] = True
             event_body["guestsCanInviteOthers"] = False
         
+        if event_id:
+            event_body["id"] = event_id
+        
+        return event_body
+
+    @staticmethod
+    async def create_events_batch(
+        requests: List[Tuple[str, Dict[str, Any]]],
+        calendar_id: str = "primary"
+    ) -> List[Dict[str, Any]]:
+        """
+        Create events for several users with one multipart /batch request.
+        
+        Each sub-request carries its own Authorization header, so events are
+        inserted into each user's own calendar.
+        
+        Args:
+            requests: (access_token, event body from _event_body) pairs,
+                at most CALENDAR_BATCH_SIZE
+            calendar_id: Calendar ID (default: "primary")
+            
+        Returns:
+            One result per request, in order: {"status": int, "event": dict}
+            on success or {"status": int, "error": str} on failure. A 409 on
+            a body with an "id" is resolved like in create_event: the
+            existing event is returned with "duplicate": True, or restored if
+            the user had deleted it.
+            
+        Raises:
+            Exception: If the batch request itself fails
+        """
+        path = f"{GoogleCalendarService.CALENDAR_BATCH_PATH}/calendars/{calendar_id}/events"
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, headers=headers, json=event_body) as resp:
-                    if resp.status not in [200, 201]:
-                        error_text = await resp.text()
-                        raise Exception(
-                            f"Calendar event creation failed: {resp.status} {error_text}"
-                        )
-                    
-                    event_data = await resp.json()
-                    return event_data
+            responses = await GoogleCalendarService.send_batch(
+                [("POST", path, access_token, event_body) for access_token, event_body in requests]
+            )
+        except Exception as e:
+            raise Exception(f"Failed to create calendar events in batch: {str(e)}")
+
+        def failed(status: int, data: Any, action: str = "creation") -> Dict[str, Any]:
+            error = data if data is not None else "missing response"
+            return {"status": status, "error": f"Calendar event {action} failed: {status} {error}"}
+
+        results: List[Dict[str, Any]] = []
+        conflicts = []
+        for index, ((_, event_body), (status, data)) in enumerate(zip(requests, responses)):
+            if status in (200, 201) and isinstance(data, dict):
+                results.append({"status": status, "event": data})
+            elif status == 409 and event_body.get("id"):
+                results.append(failed(status, data))
+                conflicts.append(index)
+            else:
+                results.append(failed(status, data))
+        if not conflicts:
+            return results
+
+        # Created by an earlier attempt, or deleted by the user since: look
+        # the conflicting events up, then restore the cancelled ones
+        def event_path(index: int) -> str:
+            return f"{path}/{requests[index][1]['id']}"
+
+        try:
+            lookups = await GoogleCalendarService.send_batch(
+                [("GET", event_path(index), requests[index][0], None) for index in conflicts]
+            )
+            cancelled = []
+            for index, (status, data) in zip(conflicts, lookups):
+                if status != 200 or not isinstance(data, dict):
+                    results[index] = failed(status, data, "lookup")
+                elif data.get("status") == "cancelled":
+                    cancelled.append(index)
+                else:
+                    event_id = requests[index][1]["id"]
+                    results[index] = {"status": 409, "event": {**data, "id": event_id, "duplicate": True}}
+            if cancelled:
+                restores = await GoogleCalendarService.send_batch([
+                    ("PUT", event_path(index), requests[index][0], {**requests[index][1], "status": "confirmed"})
+                    for index in cancelled
+                ])
+                for index, (status, data) in zip(cancelled, restores):
+                    if status == 200 and isinstance(data, dict):
+                        results[index] = {"status": status, "event": data}
+                    else:
+                        results[index] = failed(status, data, "restore")
+        except Exception as e:
+            for index in conflicts:
+                if "event" not in results[index]:
+                    results[index] = {"status": 409, "error": f"Calendar event lookup failed: {str(e)}"}
+        return results
+
+    @staticmethod
+    async def query_freebusy_batch(
+        access_tokens: List[str],
+        time_min: str,
+        time_max: str,
+        time_zone: str = "Asia/Tokyo"
+    ) -> List[Dict[str, Any]]:
+        """
+        Query the primary calendars of several users with one /batch request.
         
+        Args:
+            access_tokens: One access token per user, at most CALENDAR_BATCH_SIZE
+            time_min: Range start in RFC3339 format
+            time_max: Range end in RFC3339 format
+            time_zone: Time zone of the returned busy periods
+            
+        Returns:
+            One result per token, in order: {"status": int, "busy": [{"start",
+            "end"}, ...]} on success or {"status": int, "error": str}
+            
+        Raises:
+            Exception: If the batch request itself fails
+        """
+        body = {
+            "timeMin": time_min,
+            "timeMax": time_max,
+            "timeZone": time_zone,
+            "items": [{"id": "primary"}],
+        }
+        path = f"{GoogleCalendarService.CALENDAR_BATCH_PATH}/freeBusy"
+        try:
+            responses = await GoogleCalendarService.send_batch(
+                [("POST", path, access_token, body) for access_token in access_tokens]
+            )
         except Exception as e:
-            raise Exception(f"Failed to create calendar event: {str(e)}")
+            raise Exception(f"Failed to query free/busy in batch: {str(e)}")
+
+        results = []
+        for status, data in responses:
+            calendar = data.get("calendars", {}).get("primary", {}) if isinstance(data, dict) else {}
+            if status == 200 and not calendar.get("errors"):
+                results.append({"status": status, "busy": calendar.get("busy", [])})
+            else:
+                error = calendar.get("errors") or data
+                results.append({"status": status, "error": f"FreeBusy query failed: {status} {error}"})
+        return results
+
+    @staticmethod
+    async def send_batch(
+        requests: List[Tuple[str, str, str, Optional[Dict[str, Any]]]]
+    ) -> List[Tuple[int, Any]]:
+        """
+        Send Calendar API calls of (possibly) different users as one
+        multipart /batch request.
+        
+        Args:
+            requests: (method, path, access_token, JSON body or None) per call
+            
+        Returns:
+            (HTTP status, parsed body) per request, in order (status 0 when
+            the response has no part for a request)
+            
+        Raises:
+            Exception: If the batch request itself fails
+        """
+        boundary = f"batch_{uuid.uuid4().hex}"
+        parts = []
+        for index, (method, path, access_token, payload) in enumerate(requests):
+            part = (
+                f"--{boundary}\r\n"
+                "Content-Type: application/http\r\n"
+                f"Content-ID: <item-{index}>\r\n"
+                "\r\n"
+                f"{method} {path}\r\n"
+                f"Authorization: Bearer {access_token}\r\n"
+            )
+            if payload is not None:
+                part += (
+                    "Content-Type: application/json; charset=UTF-8\r\n"
+                    "\r\n"
+                    f"{json.dumps(payload, ensure_ascii=False)}\r\n"
+                )
+            else:
+                part += "\r\n"
+            parts.append(part)
+        body = "".join(parts) + f"--{boundary}--\r\n"
+
+        session = get_http_session()
+        async with session.post(
+            GoogleCalendarService.CALENDAR_BATCH_URL,
+            data=body.encode("utf-8"),
+            headers={"Content-Type": f"multipart/mixed; boundary={boundary}"}
+        ) as resp:
+            content = await resp.read()
+            if resp.status != 200:
+                raise Exception(
+                    f"Calendar batch request failed: {resp.status} {content.decode('utf-8', 'replace')}"
+                )
+            responses = GoogleCalendarService._parse_batch_response(
+                resp.headers.get("Content-Type", ""), content
+            )
+        return [responses.get(index, (0, None)) for index in range(len(requests))]
+
+    @staticmethod
+    def _parse_batch_response(content_type: str, payload: bytes) -> Dict[int, Tuple[int, Any]]:
+        """
+        Split a multipart/mixed batch response into sub-responses.
+        
+        Args:
+            content_type: Content-Type header of the batch response
+            payload: Raw response body
+            
+        Returns:
+            Mapping of request index (from Content-ID "response-item-N") to
+            (HTTP status, parsed JSON body or raw text)
+        """
+        match = re.search(r'boundary="?([^";]+)"?', content_type)
+        if not match:
+            raise ValueError(f"No boundary in batch response: {content_type}")
+        delimiter = f"--{match.group(1)}"
+
+        responses = {}
+        text = payload.decode("utf-8").replace("\r\n", "\n")
+        for part in text.split(delimiter)[1:]:
+            if part.startswith("--"):
+                break
+            part_headers, _, http_response = part.strip("\n").partition("\n\n")
+            content_id = re.search(r"Content-ID:\s*<response-item-(\d+)>", part_headers, re.IGNORECASE)
+            if not content_id:
+                continue
+            head, _, body = http_response.partition("\n\n")
+            status = int(head.split("\n", 1)[0].split()[1])
+            body = body.strip()
+            try:
+                data = json.loads(body) if body else {}
+            except ValueError:
+                data = body
+            responses[int(content_id.group(1))] = (status, data)
+        return responses
 
     @staticmethod
     async def get_user_tokens(line_user_id: str) -> Optional[Dict[str, Any]]:
@@ -176,26 +569,101 @@ class GoogleCalendarService:
             List of dicts with line_user_id, email, access_token, display_name
         """
         query = """
-            SELECT DISTINCT 
+            SELECT
                 u.line_user_id,
                 u.email,
                 u.access_token,
                 u.refresh_token,
                 u.token_expiry,
                 lu.display_name
-            FROM poll_responses pr
-            JOIN users u ON pr.line_user_id = u.line_user_id
-            LEFT JOIN line_users lu ON pr.line_user_id = lu.line_user_id
-            WHERE pr.session_id = %s 
-              AND u.calendar_connected = TRUE
+            FROM (
+                SELECT line_user_id FROM poll_responses WHERE session_id = %s
+                UNION
+                SELECT line_user_id FROM poll_response_bitmaps WHERE session_id = %s
+            ) voters
+            JOIN users u ON voters.line_user_id = u.line_user_id
+            LEFT JOIN line_users lu ON voters.line_user_id = lu.line_user_id
+            WHERE u.calendar_connected = TRUE
               AND u.access_token IS NOT NULL
         """
         
         with get_connection() as conn:
             cursor = conn.cursor(dictionary=True)
-            cursor.execute(query, (session_id,))
+            cursor.execute(query, (session_id, session_id))
+            return cursor.fetchall()
+
+    @staticmethod
+    def get_session_participants(session_id: int) -> List[Dict[str, Any]]:
+        """
+        Get everyone who voted in a session, with their Google account if any.
+        
+        Args:
+            session_id: Poll session ID
+            
+        Returns:
+            List of dicts with line_user_id, display_name, email,
+            calendar_connected, access_token, refresh_token, token_expiry
+            (Google fields are None for users who never connected)
+        """
+        query = """
+            SELECT
+                voters.line_user_id,
+                lu.display_name,
+                u.email,
+                u.calendar_connected,
+                u.access_token,
+                u.refresh_token,
+                u.token_expiry
+            FROM (
+                SELECT line_user_id FROM poll_responses WHERE session_id = %s
+                UNION
+                SELECT line_user_id FROM poll_response_bitmaps WHERE session_id = %s
+            ) voters
+            LEFT JOIN users u ON voters.line_user_id = u.line_user_id
+            LEFT JOIN line_users lu ON voters.line_user_id = lu.line_user_id
+        """
+        
+        with get_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(query, (session_id, session_id))
             return cursor.fetchall()
 
+    @staticmethod
+    def get_session_creator(session_id: int) -> Optional[str]:
+        """Get the LINE user ID of the user who started a poll session."""
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT created_by_line_user_id FROM poll_sessions WHERE id = %s",
+                (session_id,)
+            )
+            row = cursor.fetchone()
+            return row[0] if row else None
+
+    @staticmethod
+    def save_event_attendees(event_id: int, attendees: List[Dict[str, Any]]) -> None:
+        """
+        Link an organizer event to its attendees.
+        
+        Args:
+            event_id: calendar_events ID of the organizer's event
+            attendees: Dicts with line_user_id and email (None if not invited)
+        """
+        if not attendees:
+            return
+        
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(
+                """
+                INSERT INTO calendar_event_attendees (event_id, line_user_id, email)
+                VALUES (%s, %s, %s)
+                ON DUPLICATE KEY UPDATE email = VALUES(email)
+                """,
+                [(event_id, attendee["line_user_id"], attendee.get("email")) for attendee in attendees]
+            )
+            conn.commit()
+
     @staticmethod
     def save_event_to_db(
         line_user_id: str,
@@ -224,10 +692,21 @@ class GoogleCalendarService:
         # First get user's internal ID
         get_user_query = "SELECT id FROM users WHERE line_user_id = %s"
         
+        # Upsert on (user_id, google_event_id); LAST_INSERT_ID(id) makes
+        # lastrowid the existing row's ID on a retry
         insert_query = """
             INSERT INTO calendar_events 
             (user_id, google_event_id, title, description, start_time, end_time, location, synced, last_sync)
             VALUES (%s, %s, %s, %s, %s, %s, %s, TRUE, NOW())
+            ON DUPLICATE KEY UPDATE
+                id = LAST_INSERT_ID(id),
+                title = VALUES(title),
+                description = VALUES(description),
+                start_time = VALUES(start_time),
+                end_time = VALUES(end_time),
+                location = VALUES(location),
+                synced = TRUE,
+                last_sync = NOW()
         """
         
         with get_connection() as conn:
@@ -257,11 +736,99 @@ class GoogleCalendarService:
             
             return cursor.lastrowid
 
+    @staticmethod
+    def save_events_to_db(
+        events: List[Dict[str, Any]],
+        title: str,
+        start_time: str,
+        end_time: str,
+        description: Optional[str] = None,
+        location: Optional[str] = None
+    ) -> Dict[str, int]:
+        """
+        Save events created for several users of the same session at once.
+        
+        Rows are upserted on (user_id, google_event_id), so saving the
+        events of a retried creation again does not duplicate them.
+        
+        Args:
+            events: Dicts with line_user_id and google_event_id
+            title: Event title
+            start_time: Start datetime string
+            end_time: End datetime string
+            description: Optional description
+            location: Optional location
+            
+        Returns:
+            Mapping of LINE user ID to created event ID in database
+            (users missing from the users table are left out)
+        """
+        if not events:
+            return {}
+
+        start_dt = datetime.fromisoformat(start_time.replace('+09:00', ''))
+        end_dt = datetime.fromisoformat(end_time.replace('+09:00', ''))
+        location_value = location if location is not None else ""
+        line_user_ids = [event["line_user_id"] for event in events]
+        placeholders = ", ".join(["%s"] * len(line_user_ids))
+
+        with get_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(
+                f"SELECT id, line_user_id FROM users WHERE line_user_id IN ({placeholders})",
+                line_user_ids
+            )
+            user_ids = {row["line_user_id"]: row["id"] for row in cursor.fetchall()}
+
+            rows = [
+                (user_ids[event["line_user_id"]], event["google_event_id"], title, description,
+                 start_dt, end_dt, location_value)
+                for event in events
+                if event["line_user_id"] in user_ids
+            ]
+            if not rows:
+                return {}
+            cursor.executemany(
+                """
+                INSERT INTO calendar_events 
+                (user_id, google_event_id, title, description, start_time, end_time, location, synced, last_sync)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, TRUE, NOW())
+                ON DUPLICATE KEY UPDATE
+                    title = VALUES(title),
+                    description = VALUES(description),
+                    start_time = VALUES(start_time),
+                    end_time = VALUES(end_time),
+                    location = VALUES(location),
+                    synced = TRUE,
+                    last_sync = NOW()
+                """,
+                rows
+            )
+
+            # Auto-increment IDs of a multi-row insert are not guaranteed to
+            # be consecutive, so read them back by Google event ID
+            google_event_ids = [row[1] for row in rows]
+            cursor.execute(
+                f"""
+                SELECT ce.id, u.line_user_id
+                FROM calendar_events ce
+                JOIN users u ON ce.user_id = u.id
+                WHERE ce.google_event_id IN ({", ".join(["%s"] * len(google_event_ids))})
+                """,
+                google_event_ids
+            )
+            saved = {row["line_user_id"]: row["id"] for row in cursor.fetchall()}
+            conn.commit()
+            return saved
+
     @staticmethod
     async def refresh_user_token(line_user_id: str, refresh_token: str) -> Optional[str]:
         """
         Refresh expired access token using refresh_token.
         
+        Concurrent refreshes of the same user share one token request
+        (see services.token_manager).
+        
         Args:
             line_user_id: LINE user ID
             refresh_token: Refresh token
@@ -269,37 +836,23 @@ class GoogleCalendarService:
         Returns:
             New access_token if successful, None if failed
         """
-        try:
-            from services.google_service import get_google_client
-            
-            client = get_google_client()
-            token_response = await client.refresh_access_token(refresh_token)
-            new_access_token = token_response.get("access_token")
-            expires_in = token_response.get("expires_in", 3600)
-            
-            if not new_access_token:
-                raise ValueError("No access_token in refresh response")
-            
-            # Calculate new expiry time
-            new_expiry = client.calculate_expiry_time(expires_in)
-            
-            # Update database
-            update_query = """
-                UPDATE users
-                SET access_token = %s, token_expiry = %s
-                WHERE line_user_id = %s
-            """
-            
-            with get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute(update_query, (new_access_token, new_expiry, line_user_id))
-                conn.commit()
-            
-            return new_access_token
+        return await token_manager.refresh(line_user_id, refresh_token)
+
+    @staticmethod
+    async def get_valid_access_token(user: Dict[str, Any]) -> str:
+        """
+        Get a user's access token, refreshing it first if it has expired.
         
-        except Exception as e:
-            print(f"Token refresh failed for {line_user_id}: {str(e)}")
-            return None
+        Tokens close to expiry are returned as-is and refreshed in the
+        background, so this only waits when the token is already expired.
+        
+        Args:
+            user: Row with line_user_id, access_token, refresh_token, token_expiry
+            
+        Raises:
+            Exception: If the token had to be refreshed and refreshing failed
+        """
+        return await token_manager.get_access_token(user)
 
     @staticmethod
     def is_token_expired(token_expiry) -> bool:
@@ -307,30 +860,21 @@ class GoogleCalendarService:
         Check if token has expired.
         
         Args:
-            token_expiry: Token expiry datetime from DB
+            token_expiry: Token expiry datetime from DB (naive UTC)
             
         Returns:
             True if token is expired or expiring within 5 minutes
         """
-        if not token_expiry:
-            return True
-        
-        # Convert to datetime if it's a string
-        if isinstance(token_expiry, str):
-            token_expiry = datetime.fromisoformat(token_expiry)
-        
         # Consider token expired if within 5 minutes
-        buffer = 5 * 60  # 5 minutes in seconds
-        expiry_with_buffer = token_expiry + timedelta(seconds=buffer)
-        
-        return datetime.now() >= expiry_with_buffer
-
+        return seconds_left(token_expiry) <= 5 * 60
 
     @staticmethod
     def check_event_exists(line_user_id: str, session_id: int) -> bool:
         """
         Check if an event has already been created for this user and session.
-        Prevents duplicate event creation.
+        
+        Creation itself is idempotent (see event_id_for); this only reports
+        whether it happened.
         
         Args:
             line_user_id: LINE user ID
@@ -344,13 +888,12 @@ class GoogleCalendarService:
             FROM calendar_events ce
             JOIN users u ON ce.user_id = u.id
             WHERE u.line_user_id = %s
-              AND ce.description LIKE %s
+              AND ce.google_event_id = %s
         """
 
         with get_connection() as conn:
             cursor = conn.cursor(dictionary=True)
-            pattern = f"%session_id:{session_id}%"
-            cursor.execute(query, (line_user_id, pattern))
+            cursor.execute(query, (line_user_id, event_id_for(session_id, line_user_id)))
             result = cursor.fetchone()
             return result["count"] > 0 if result else False
 
@@ -363,11 +906,18 @@ async def create_event_for_session(
     start_time: str,
     end_time: str,
     location: Optional[str] = None,
-    description_extra: Optional[str] = None
+    description_extra: Optional[str] = None,
+    organizer_mode: Optional[bool] = None,
+    organizer_line_user_id: Optional[str] = None
 ) -> Dict[str, Any]:
     """
     Create calendar events for all connected users in a session.
     
+    Users are handled in parallel; with GOOGLE_CALENDAR_BATCH_MODE the
+    inserts are packed into multipart /batch requests instead. In organizer
+    mode a single event is created and the participants are invited (see
+    create_organizer_event_for_session).
+    
     Args:
         session_id: Poll session ID
         event_title: Title for the calendar event
@@ -376,10 +926,25 @@ async def create_event_for_session(
         end_time: End time string
         location: Optional location (e.g., restaurant name)
         description_extra: Optional additional description
+        organizer_mode: Create one event with attendees instead of a copy
+            per user (default: GOOGLE_CALENDAR_ORGANIZER_MODE)
+        organizer_line_user_id: Organizer for organizer mode
         
     Returns:
         Dict with success status and results per user
     """
+    if CALENDAR_ORGANIZER_MODE if organizer_mode is None else organizer_mode:
+        return await create_organizer_event_for_session(
+            session_id=session_id,
+            event_title=event_title,
+            date_label=date_label,
+            start_time=start_time,
+            end_time=end_time,
+            location=location,
+            description_extra=description_extra,
+            organizer_line_user_id=organizer_line_user_id
+        )
+
     service = GoogleCalendarService()
     
     # Get all connected users
@@ -391,70 +956,140 @@ async def create_event_for_session(
             "message": "No users with Google Calendar connected",
             "created_events": []
         }
-    
-    results = []
-    
-    for user in connected_users:
+
+    # Create description with session ID for tracking
+    description = f"session_id:{session_id}\n\n"
+    if description_extra:
+        description += description_extra
+
+    parse_error = None
+    try:
+        start_dt = service._parse_datetime(date_label, start_time)
+        end_dt = service._parse_datetime(date_label, end_time)
+    except ValueError as e:
+        start_dt = end_dt = None
+        parse_error = str(e)
+
+    semaphore = asyncio.Semaphore(max(CALENDAR_CREATE_CONCURRENCY, 1))
+
+    def base_result(user: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "line_user_id": user["line_user_id"],
+            "display_name": user.get("display_name", "Unknown"),
+        }
+
+    def failure(result: Dict[str, Any], e: Exception) -> Dict[str, Any]:
+        import traceback
+        result.update({
+            "success": False,
+            # Also called outside an except block, so format e itself
+            "error": f"{str(e)}\n{''.join(traceback.format_exception(e))}"
+        })
+        return result
+
+    async def create_for_user(user: Dict[str, Any]) -> Dict[str, Any]:
+        result = base_result(user)
         try:
-            # Check and refresh token if expired
-            access_token = user["access_token"]
-            if service.is_token_expired(user["token_expiry"]):
-                print(f"Token expired for {user['line_user_id']}, refreshing...")
-                new_token = await service.refresh_user_token(user["line_user_id"], user["refresh_token"])
-                if new_token:
-                    access_token = new_token
-                else:
-                    raise Exception("Failed to refresh token")
-            
-            # Duplicate check skipped for now
-            # Parse datetime
-            start_dt = service._parse_datetime(date_label, start_time)
-            end_dt = service._parse_datetime(date_label, end_time)
-            
-            # Create description with session ID for tracking
-            description = f"session_id:{session_id}\n\n"
-            if description_extra:
-                description += description_extra
-            
-            # Create event
-            event = await service.create_event(
-                access_token=access_token,
-                summary=event_title,
-                start_datetime=start_dt,
-                end_datetime=end_dt,
-                description=description,
-                location=location
-            )
-            
-            # Save to database
-            db_event_id = service.save_event_to_db(
-                line_user_id=user["line_user_id"],
-                google_event_id=event["id"],
-                title=event_title,
-                start_time=start_dt,
-                end_time=end_dt,
-                description=description,
-                location=location
-            )
-            
-            results.append({
-                "line_user_id": user["line_user_id"],
-                "display_name": user.get("display_name", "Unknown"),
+            if start_dt is None:
+                raise ValueError(parse_error)
+            async with semaphore:
+                access_token = await service.get_valid_access_token(user)
+
+                # Deterministic ID: a retry gets 409 instead of a duplicate
+                event = await service.create_event(
+                    access_token=access_token,
+                    summary=event_title,
+                    start_datetime=start_dt,
+                    end_datetime=end_dt,
+                    description=description,
+                    location=location,
+                    event_id=event_id_for(session_id, user["line_user_id"])
+                )
+            result.update({
                 "success": True,
                 "google_event_id": event["id"],
-                "db_event_id": db_event_id,
-                "event_link": event.get("htmlLink")
+                "event_link": event.get("htmlLink"),
+                "already_existed": bool(event.get("duplicate"))
             })
-        
         except Exception as e:
-            import traceback
-            error_detail = f"{str(e)}\n{traceback.format_exc()}"
-            results.append({
-                "line_user_id": user["line_user_id"],
-                "display_name": user.get("display_name", "Unknown"),
-                "success": False,
-                "error": error_detail
-            })
+            failure(result, e)
+        return result
+
+    async def create_batched() -> List[Dict[str, Any]]:
+        results = [base_result(user) for user in connected_users]
+        if start_dt is None:
+            return [failure(result, ValueError(parse_error)) for result in results]
+
+        async def token_for(user: Dict[str, Any]) -> str:
+            async with semaphore:
+                return await service.get_valid_access_token(user)
+
+        tokens = await asyncio.gather(*(token_for(user) for user in connected_users), return_exceptions=True)
+        pending = []
+        for result, token in zip(results, tokens):
+            if isinstance(token, Exception):
+                failure(result, token)
+            else:
+                pending.append((result, token))
+
+        event_body = service._event_body(event_title, start_dt, end_dt, description, location)
+        chunks = [pending[i:i + CALENDAR_BATCH_SIZE] for i in range(0, len(pending), CALENDAR_BATCH_SIZE)]
+
+        async def send(chunk: List[Tuple[Dict[str, Any], str]]) -> None:
+            try:
+                async with semaphore:
+                    responses = await service.create_events_batch([
+                        (token, {**event_body, "id": event_id_for(session_id, result["line_user_id"])})
+                        for result, token in chunk
+                    ])
+            except Exception as e:
+                for result, _ in chunk:
+                    failure(result, e)
+                return
+            for (result, _), response in zip(chunk, responses):
+                if "event" in response:
+                    result.update({
+                        "success": True,
+                        "google_event_id": response["event"]["id"],
+                        "event_link": response["event"].get("htmlLink"),
+                        "already_existed": bool(response["event"].get("duplicate"))
+                    })
+                else:
+                    result.update({"success": False, "error": response["error"]})
+
+        await asyncio.gather(*(send(chunk) for chunk in chunks))
+        return results
+
+    if CALENDAR_BATCH_MODE:
+        results = await create_batched()
+    else:
+        # Google round trips run in parallel (bounded)
+        results = list(await asyncio.gather(*(create_for_user(user) for user in connected_users)))
+
+    # Everything that was created is saved with one user lookup and one
+    # multi-row insert
+    created = [r for r in results if r["success"]]
+    try:
+        db_event_ids = service.save_events_to_db(
+            created,
+            title=event_title,
+            start_time=start_dt,
+            end_time=end_dt,
+            description=description,
+            location=location
+        )
+        save_error = None
+    except Exception as e:
+        db_event_ids = {}
+        save_error = f"Failed to save calendar events: {str(e)}"
+        print(f"[Calendar] {save_error} (session_id={session_id})")
+
+    for result in created:
+        db_event_id = db_event_ids.get(result["line_user_id"])
+        if db_event_id is None:
+            result["success"] = False
+            result["error"] = save_error or f"User not found: {result['line_user_id']}"
+        result["db_event_id"] = db_event_id
     
     successful = [r for r in results if r["success"]]
     
@@ -466,3 +1101,123 @@ async def create_event_for_session(
         "successful_count": len(successful)
     }
 
+
+async def create_organizer_event_for_session(
+    session_id: int,
+    event_title: str,
+    date_label: str,
+    start_time: str,
+    end_time: str,
+    location: Optional[str] = None,
+    description_extra: Optional[str] = None,
+    organizer_line_user_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Create one event on the organizer's calendar and invite the participants.
+    
+    Only the organizer needs a connected Google Calendar (one token refresh,
+    one API call); everyone else who voted and has a known email address is
+    added as an attendee. One calendar_events row is stored for the organizer
+    and linked to every participant via calendar_event_attendees.
+    
+    The organizer is organizer_line_user_id if given, otherwise the user who
+    started the session, otherwise the first participant with a connected
+    calendar.
+    
+    Returns:
+        Dict with success status, the organizer's result in created_events
+        and the invited participants in attendees
+    """
+    service = GoogleCalendarService()
+    participants = service.get_session_participants(session_id)
+    connected = {
+        p["line_user_id"]: p for p in participants
+        if p.get("calendar_connected") and p.get("access_token")
+    }
+
+    organizer = None
+    for candidate in (organizer_line_user_id, service.get_session_creator(session_id)):
+        if candidate and candidate in connected:
+            organizer = connected[candidate]
+            break
+    if organizer is None and connected:
+        organizer = next(iter(connected.values()))
+    if organizer is None:
+        return {
+            "success": False,
+            "mode": "organizer",
+            "message": "No users with Google Calendar connected",
+            "created_events": []
+        }
+
+    attendees = [
+        {
+            "line_user_id": p["line_user_id"],
+            "display_name": p.get("display_name", "Unknown"),
+            "email": p.get("email"),
+            "invited": bool(p.get("email")),
+        }
+        for p in participants
+        if p["line_user_id"] != organizer["line_user_id"]
+    ]
+
+    description = f"session_id:{session_id}\n\n"
+    if description_extra:
+        description += description_extra
+
+    result = {
+        "line_user_id": organizer["line_user_id"],
+        "display_name": organizer.get("display_name", "Unknown"),
+    }
+    try:
+        start_dt = service._parse_datetime(date_label, start_time)
+        end_dt = service._parse_datetime(date_label, end_time)
+        access_token = await service.get_valid_access_token(organizer)
+        event = await service.create_event(
+            access_token=access_token,
+            summary=event_title,
+            start_datetime=start_dt,
+            end_datetime=end_dt,
+            description=description,
+            location=location,
+            attendees=[a["email"] for a in attendees if a["invited"]],
+            send_updates="all",
+            event_id=event_id_for(session_id, organizer["line_user_id"], mode="organizer")
+        )
+        db_event_id = service.save_event_to_db(
+            line_user_id=organizer["line_user_id"],
+            google_event_id=event["id"],
+            title=event_title,
+            start_time=start_dt,
+            end_time=end_dt,
+            description=description,
+            location=location
+        )
+        service.save_event_attendees(db_event_id, attendees)
+        result.update({
+            "success": True,
+            "google_event_id": event["id"],
+            "db_event_id": db_event_id,
+            "event_link": event.get("htmlLink"),
+            "already_existed": bool(event.get("duplicate"))
+        })
+    except Exception as e:
+        import traceback
+        result.update({
+            "success": False,
+            "error": f"{str(e)}\n{traceback.format_exc()}"
+        })
+
+    invited = sum(1 for a in attendees if a["invited"])
+    return {
+        "success": result["success"],
+        "mode": "organizer",
+        "message": (
+            f"Created 1 calendar event with {invited} invited attendees"
+            if result["success"] else "Failed to create organizer calendar event"
+        ),
+        "created_events": [result],
+        "attendees": attendees,
+        "total_users": len(participants),
+        "successful_count": 1 if result["success"] else 0
+    }
@@ -1,8 +1,24 @@
+import asyncio
 import os
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Any, Optional
 
 import aiohttp
+import jwt
+
+GOOGLE_JWKS_URL = "https://www.googleapis.com/oauth2/v3/certs"
+GOOGLE_ISSUERS = {"https://accounts.google.com", "accounts.google.com"}
+# Google rotates its signing keys every few days; unknown key IDs trigger a refetch
+GOOGLE_JWKS_CACHE_TTL = float(os.getenv("GOOGLE_JWKS_CACHE_TTL", "3600"))
+
+_jwks_client: Optional[jwt.PyJWKClient] = None
+
+
+def _get_jwks_client() -> jwt.PyJWKClient:
+    global _jwks_client
+    if _jwks_client is None:
+        _jwks_client = jwt.PyJWKClient(GOOGLE_JWKS_URL, cache_keys=True, lifespan=GOOGLE_JWKS_CACHE_TTL)
+    return _jwks_client
 
 
 class GoogleOAuthClient:
@@ -97,6 +113,58 @@ class GoogleOAuthClient:
         except Exception as e:
             raise Exception(f"Userinfo fetch error: {str(e)}")
 
+    async def verify_id_token(self, id_token: str) -> dict[str, Any]:
+        """
+        Verify a Google id_token locally against Google's cached JWKS.
+
+        Args:
+            id_token: id_token from the token endpoint response
+
+        Returns:
+            Verified claims (sub, email, email_verified, name, picture, ...)
+
+        Raises:
+            jwt.PyJWTError: If the signature, audience, issuer or expiry is invalid
+        """
+        # PyJWKClient fetches the key set with blocking I/O on a cache miss
+        signing_key = await asyncio.to_thread(_get_jwks_client().get_signing_key_from_jwt, id_token)
+        claims = jwt.decode(
+            id_token,
+            signing_key.key,
+            algorithms=["RS256"],
+            audience=self.client_id,
+            options={"require": ["exp", "iat", "iss", "sub", "aud"]},
+        )
+        if claims.get("iss") not in GOOGLE_ISSUERS:
+            raise jwt.InvalidIssuerError(f"Unexpected issuer: {claims.get('iss')}")
+        return claims
+
+    async def get_user_info(self, token_response: dict[str, Any]) -> dict[str, Any]:
+        """
+        Get the Google profile of the user a token response was issued for.
+
+        Uses the id_token claims when the token verifies and carries an email,
+        avoiding the userinfo round trip; otherwise calls fetch_user_info.
+
+        Returns:
+            Dict in the userinfo format (id, email, verified_email, name, picture)
+        """
+        id_token = token_response.get("id_token")
+        if id_token:
+            try:
+                claims = await self.verify_id_token(id_token)
+                if claims.get("email"):
+                    return {
+                        "id": claims["sub"],
+                        "email": claims["email"],
+                        "verified_email": claims.get("email_verified", False),
+                        "name": claims.get("name"),
+                        "picture": claims.get("picture"),
+                    }
+            except Exception as e:
+                print(f"[GoogleOAuth] id_token verification failed, using userinfo: {e}")
+        return await self.fetch_user_info(token_response["access_token"])
+
     async def refresh_access_token(self, refresh_token: str) -> dict[str, Any]:
         """
         Refresh access token using refresh token.
@@ -137,9 +205,9 @@ class GoogleOAuthClient:
             expires_in: Token lifetime in seconds
 
         Returns:
-            Expiry datetime
+            Expiry datetime (naive UTC)
         """
-        return datetime.utcnow() + timedelta(seconds=expires_in)
+        return datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(seconds=expires_in)
 
 
 # Global instance
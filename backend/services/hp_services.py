@@ -1,11 +1,19 @@
-import requests
+import asyncio
 import os
+import unicodedata
 from typing import Optional, Dict, Any, List
 
+import aiohttp
+
+from db.geocode_cache import get_cached_location, save_cached_location
+from utils.cache import TTLCache
+from utils.http import get_http_session
+
 HOTPEPPER_API_KEY = os.getenv("HOTPEPPER_API_KEY")
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 
-url = "http://webservice.recruit.co.jp/hotpepper/gourmet/v1/"
+url = "https://webservice.recruit.co.jp/hotpepper/gourmet/v1/"
+geocode_url = "https://maps.googleapis.com/maps/api/geocode/json"
 
 BUDGET_LIST=[
         {"code" : "B009", "min" : 0, "max" : 500},
@@ -23,9 +31,19 @@ BUDGET_LIST=[
         {"code" : "B014", "min" : 30001, "max" : 100000},
         ]
 
-def get_location(location_name: str)->Optional[Dict[str,float]]:
-    geocode_url = "https://maps.googleapis.com/maps/api/geocode/json"
+# In-memory front cache for geocode results (backed by the geocode_cache table).
+# Failed lookups are remembered briefly so a bad place name is not retried per request.
+_NOT_FOUND = object()
+GEOCODE_NEGATIVE_TTL = 10 * 60
+_geocode_cache = TTLCache(maxsize=1024, ttl=24 * 60 * 60)
+
 
+def normalize_place_name(location_name: str) -> str:
+    """Normalize a place name into the geocode cache key."""
+    return " ".join(unicodedata.normalize("NFKC", location_name).split()).lower()
+
+
+async def _geocode(location_name: str) -> Optional[Dict[str, float]]:
     if not GOOGLE_API_KEY:
         print("Error:GOOGLE API KEY does not exist")
         return None
@@ -38,9 +56,10 @@ def get_location(location_name: str)->Optional[Dict[str,float]]:
             }
 
     try:
-        response = requests.get(geocode_url, params = params)
-        response.raise_for_status()
-        data = response.json()
+        session = get_http_session()
+        async with session.get(geocode_url, params = params) as response:
+            response.raise_for_status()
+            data = await response.json()
 
         if data['status'] == 'OK' and data['results']:
             location = data['results'][0]['geometry']['location']
@@ -50,9 +69,48 @@ def get_location(location_name: str)->Optional[Dict[str,float]]:
             print(f"Geocoding failed for '{location_name}'. Status: {data.get('status')}")
             return None
 
-    except requests.exceptions.RequestException as e:
-        print(f"Google geocoding API request error: {e}")
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        # Timeouts of the shared session are not ClientErrors
+        print(f"Google geocoding API request error: {e!r}")
+        return None
+
+
+async def get_location(location_name: str)->Optional[Dict[str,float]]:
+    """
+    Resolve a place name to coordinates.
+
+    Lookup order: in-memory cache -> geocode_cache table -> Google Geocoding API.
+    """
+    if not location_name or not location_name.strip():
+        return None
+
+    place_key = normalize_place_name(location_name)
+    cached = _geocode_cache.get(place_key)
+    if cached is _NOT_FOUND:
         return None
+    if cached is not None:
+        return cached
+
+    try:
+        stored = get_cached_location(place_key)
+    except Exception as e:
+        print(f"Geocode cache read error: {e}")
+        stored = None
+    if stored:
+        _geocode_cache.set(place_key, stored)
+        return stored
+
+    coords = await _geocode(location_name)
+    if coords is None:
+        _geocode_cache.set(place_key, _NOT_FOUND, ttl=GEOCODE_NEGATIVE_TTL)
+        return None
+
+    _geocode_cache.set(place_key, coords)
+    try:
+        save_cached_location(place_key, coords["lat"], coords["lng"])
+    except Exception as e:
+        print(f"Geocode cache write error: {e}")
+    return coords
 
             
 def get_budget_code(min_price: int,max_price: int) -> Optional[str]:
@@ -80,7 +138,7 @@ def get_budget_code(min_price: int,max_price: int) -> Optional[str]:
         return None
 
 
-def search_restaurants(
+async def search_restaurants(
         area_code: str = "Z011",
         genre_code: str = "G001",
         count: int = 10,
@@ -93,32 +151,41 @@ def search_restaurants(
         print("HOTPEPPER_API_KEY does not exist")
         return []
     
-    coords = get_location(location_name)
-
     params = {
             "key": HOTPEPPER_API_KEY,
             "format": "json",
             "genre": genre_code,
             "count": count,
-            "order": 4,
-            "budget": get_budget_code(min_price, max_price),
             "party_capacity": 4,
-            "lat": coords['lat'],
-            "lng": coords['lng'],
             }
 
-    try:
-        response = requests.get(url,params = params)
-        response.raise_for_status()
+    budget_code = get_budget_code(min_price, max_price)
+    if budget_code:
+        params["budget"] = budget_code
+
+    coords = await get_location(location_name)
+    if coords:
+        params["lat"] = coords['lat']
+        params["lng"] = coords['lng']
+        params["order"] = 4
+    elif location_name:
+        # Geocoding unavailable: fall back to a keyword search on the place name
+        params["keyword"] = location_name
+    else:
+        params["large_area"] = area_code
 
-        data = response.json()
+    try:
+        session = get_http_session()
+        async with session.get(url, params = params) as response:
+            response.raise_for_status()
+            # Hotpepper returns text/javascript;charset=utf-8 even for JSON
+            data = await response.json(content_type=None)
         
         if "results" in data and "shop" in data['results']:
             return data['results']['shop']
 
         return []
 
-    except requests.exceptions.RequestException as e:
+    except (aiohttp.ClientError, ValueError) as e:
         print(f"HOT PEPPER API request error: {e}")
         return []
-
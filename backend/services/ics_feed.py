@@ -0,0 +1,237 @@
+"""
+Subscribable iCalendar (.ics) feeds.
+
+A feed is rendered once when a session is finalized or its restaurant is
+confirmed (one per session, and one per participant listing all of their
+finalized sessions) and stored in ics_feeds. Requests are answered from an
+in-process cache with ETag/Last-Modified, so calendar apps polling the feed
+mostly get 304s and another subscriber costs nothing extra.
+
+Feed URLs carry an HMAC token (ICS_FEED_SECRET) so they cannot be guessed
+from a session or user ID. Without a secret, no feed URL is handed out and
+every feed request is refused.
+"""
+
+import hashlib
+import hmac
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from db.ics_feeds import (
+    get_finalized_session,
+    get_finalized_sessions_by_user,
+    get_session_participant_ids,
+    load_feed,
+    save_feeds,
+)
+from services.google_calendar_service import GoogleCalendarService
+from utils.cache import TTLCache
+
+ICS_FEED_SECRET = os.getenv("ICS_FEED_SECRET") or os.getenv("LINE_CHANNEL_SECRET", "")
+# Tokens under an empty key could be computed by anyone
+ICS_FEEDS_ENABLED = bool(ICS_FEED_SECRET)
+ICS_FEED_CACHE_SIZE = int(os.getenv("ICS_FEED_CACHE_SIZE", "2048"))
+# Other workers pick up a regenerated feed after at most this long
+ICS_FEED_CACHE_TTL = float(os.getenv("ICS_FEED_CACHE_TTL", "300"))
+
+PRODID = "-//schedule-coordinator-bot//ics feed//JA"
+# Naive database times (poll times, updated_at) are Japan time
+_JST = timezone(timedelta(hours=9))
+DEFAULT_EVENT_HOURS = 2
+
+# feed_key -> (body, etag, last_modified)
+_feeds = TTLCache(maxsize=ICS_FEED_CACHE_SIZE, ttl=ICS_FEED_CACHE_TTL)
+
+
+def session_feed_key(session_id: int) -> str:
+    return f"session:{session_id}"
+
+
+def user_feed_key(line_user_id: str) -> str:
+    return f"user:{line_user_id}"
+
+
+def feed_token(feed_key: str) -> str:
+    """URL token proving the feed link was handed out by us."""
+    digest = hmac.new(ICS_FEED_SECRET.encode("utf-8"), feed_key.encode("utf-8"), hashlib.sha256)
+    return digest.hexdigest()[:32]
+
+
+def verify_feed_token(feed_key: str, token: Optional[str]) -> bool:
+    if not ICS_FEEDS_ENABLED:
+        return False
+    return bool(token) and hmac.compare_digest(feed_token(feed_key), token)
+
+
+def session_feed_path(session_id: int) -> Optional[str]:
+    """Feed URL path of a session, or None when feeds are disabled."""
+    if not ICS_FEEDS_ENABLED:
+        return None
+    key = session_feed_key(session_id)
+    return f"/api/calendar/sessions/{session_id}/feed.ics?token={feed_token(key)}"
+
+
+def user_feed_path(line_user_id: str) -> Optional[str]:
+    """Feed URL path of a user, or None when feeds are disabled."""
+    if not ICS_FEEDS_ENABLED:
+        return None
+    key = user_feed_key(line_user_id)
+    return f"/api/calendar/users/{line_user_id}/feed.ics?token={feed_token(key)}"
+
+
+def _escape(value: str) -> str:
+    return (
+        value.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def _fold(line: str) -> str:
+    """Fold a content line at 75 octets without splitting UTF-8 characters."""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line
+    parts = []
+    current = b""
+    limit = 75
+    for char in line:
+        char_bytes = char.encode("utf-8")
+        if len(current) + len(char_bytes) > limit:
+            parts.append(current.decode("utf-8"))
+            current = b""
+            limit = 74  # continuation lines start with a space
+        current += char_bytes
+    parts.append(current.decode("utf-8"))
+    return "\r\n ".join(parts)
+
+
+def _utc_stamp(value: datetime) -> str:
+    return value.strftime("%Y%m%dT%H%M%SZ")
+
+
+def _session_times(session: Dict) -> Optional[Tuple[datetime, datetime]]:
+    """Finalized start/end of a session as UTC datetimes."""
+    start_time = session.get("finalized_start_time")
+    if start_time is None:
+        return None
+    try:
+        start = datetime.fromisoformat(
+            GoogleCalendarService._parse_datetime(session["finalized_date"], str(start_time))
+        )
+        if session.get("finalized_end_time") is not None:
+            end = datetime.fromisoformat(
+                GoogleCalendarService._parse_datetime(session["finalized_date"], str(session["finalized_end_time"]))
+            )
+        else:
+            end = start + timedelta(hours=DEFAULT_EVENT_HOURS)
+    except ValueError:
+        return None
+    if end <= start:
+        end += timedelta(days=1)  # e.g., 22:00-01:00
+    return start.astimezone(timezone.utc), end.astimezone(timezone.utc)
+
+
+def render_event(session: Dict) -> List[str]:
+    """VEVENT lines of a finalized session (empty if its time is unknown)."""
+    times = _session_times(session)
+    if times is None:
+        return []
+    start, end = times
+    if session.get("updated_at"):
+        updated = session["updated_at"].replace(tzinfo=_JST).astimezone(timezone.utc)
+    else:
+        updated = datetime.now(timezone.utc)
+
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:session-{session['id']}@schedule-coordinator-bot",
+        # updated_at keeps the document (and its ETag) stable between renders
+        f"DTSTAMP:{_utc_stamp(updated)}",
+        f"DTSTART:{_utc_stamp(start)}",
+        f"DTEND:{_utc_stamp(end)}",
+        f"SUMMARY:{_escape(session.get('topic') or '飲み会')}",
+        f"STATUS:{'CONFIRMED' if session.get('reservation_confirmed') else 'TENTATIVE'}",
+    ]
+    location = session.get("restaurant_name") or session.get("finalized_location")
+    if location:
+        lines.append(f"LOCATION:{_escape(location)}")
+    if session.get("restaurant_url"):
+        lines.append(f"URL:{session['restaurant_url']}")
+    lines.append(f"DESCRIPTION:session_id:{session['id']}")
+    lines.append("END:VEVENT")
+    return lines
+
+
+def render_calendar(name: str, sessions: List[Dict]) -> str:
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:{PRODID}",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{_escape(name)}",
+        "X-WR-TIMEZONE:Asia/Tokyo",
+    ]
+    for session in sessions:
+        lines.extend(render_event(session))
+    lines.append("END:VCALENDAR")
+    return "".join(_fold(line) + "\r\n" for line in lines)
+
+
+def _feed_row(feed_key: str, body: str) -> Tuple[str, str, str, datetime]:
+    etag = hashlib.sha256(body.encode("utf-8")).hexdigest()
+    now = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+    return feed_key, body, etag, now
+
+
+def _store(rows: List[Tuple[str, str, str, datetime]]) -> None:
+    save_feeds(rows)
+    # Reload from the database, which keeps Last-Modified of unchanged feeds
+    for feed_key, *_ in rows:
+        _feeds.delete(feed_key)
+
+
+def publish_session_feeds(session_id: int) -> None:
+    """
+    Render and store the session's feed and its participants' feeds.
+
+    Called when a session is finalized or its restaurant is confirmed.
+    """
+    session = get_finalized_session(session_id)
+    if session is None:
+        return
+    rows = [_feed_row(session_feed_key(session_id), render_calendar(session.get("topic") or "飲み会", [session]))]
+    for line_user_id, sessions in get_finalized_sessions_by_user(get_session_participant_ids(session_id)).items():
+        rows.append(_feed_row(user_feed_key(line_user_id), render_calendar("飲み会の予定", sessions)))
+    _store(rows)
+
+
+def get_feed(feed_key: str) -> Optional[Tuple[str, str, datetime]]:
+    """
+    Get (body, etag, last_modified) of a feed from memory, the database, or
+    by rendering it (feeds of sessions finalized before feeds existed).
+    """
+    cached = _feeds.get(feed_key)
+    if cached is not None:
+        return cached
+
+    stored = load_feed(feed_key)
+    if stored is None:
+        kind, _, ident = feed_key.partition(":")
+        if kind == "session":
+            session = get_finalized_session(int(ident))
+            if session is None:
+                return None
+            row = _feed_row(feed_key, render_calendar(session.get("topic") or "飲み会", [session]))
+        else:
+            sessions = get_finalized_sessions_by_user([ident])[ident]
+            row = _feed_row(feed_key, render_calendar("飲み会の予定", sessions))
+        save_feeds([row])
+        stored = row[1:]
+
+    _feeds.set(feed_key, stored)
+    return stored
@@ -1,7 +1,25 @@
+import asyncio
 import os
 from typing import Optional
 
-import aiohttp
+from utils.cache import TTLCache
+from utils.http import get_http_session
+
+# Profile cache: fresh for PROFILE_TTL, then served stale while a background
+# refresh revalidates it. Failed lookups are remembered for NEGATIVE_TTL.
+PROFILE_CACHE_SIZE = int(os.getenv("LINE_PROFILE_CACHE_SIZE", "2048"))
+PROFILE_TTL = float(os.getenv("LINE_PROFILE_CACHE_TTL", "3600"))
+PROFILE_STALE_TTL = float(os.getenv("LINE_PROFILE_CACHE_STALE_TTL", "86400"))
+NEGATIVE_TTL = float(os.getenv("LINE_PROFILE_NEGATIVE_TTL", "300"))
+KNOWN_USER_TTL = float(os.getenv("LINE_KNOWN_USER_TTL", "86400"))
+PROFILE_REFRESH_CONCURRENCY = int(os.getenv("LINE_PROFILE_REFRESH_CONCURRENCY", "4"))
+
+_NOT_FOUND = object()
+
+_profile_cache = TTLCache(maxsize=PROFILE_CACHE_SIZE, ttl=PROFILE_TTL, stale_ttl=PROFILE_STALE_TTL)
+_known_users = TTLCache(maxsize=PROFILE_CACHE_SIZE * 4, ttl=KNOWN_USER_TTL)
+_refresh_semaphore: Optional[asyncio.Semaphore] = None
+_refresh_tasks: dict[str, asyncio.Task] = {}
 
 
 class LineProfileClient:
@@ -34,36 +52,104 @@ class LineProfileClient:
         }
 
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=headers) as resp:
-                    if resp.status != 200:
-                        error_text = await resp.text()
-                        raise Exception(f"Failed to get user profile: {resp.status} {error_text}")
-
-                    user_info = await resp.json()
-                    return {
-                        "display_name": user_info.get("displayName"),
-                        "picture_url": user_info.get("pictureUrl"),
-                        "status_message": user_info.get("statusMessage"),
-                    }
+            session = get_http_session()
+            async with session.get(url, headers=headers) as resp:
+                if resp.status != 200:
+                    error_text = await resp.text()
+                    raise Exception(f"Failed to get user profile: {resp.status} {error_text}")
+
+                user_info = await resp.json()
+                return {
+                    "display_name": user_info.get("displayName"),
+                    "picture_url": user_info.get("pictureUrl"),
+                    "status_message": user_info.get("statusMessage"),
+                }
         except Exception as e:
             print(f"Error fetching LINE user profile: {e}")
             raise
 
 
+# Global instance
+_line_client: Optional[LineProfileClient] = None
+
+
+def get_line_client() -> LineProfileClient:
+    """Get or create LINE profile client instance"""
+    global _line_client
+    if _line_client is None:
+        _line_client = LineProfileClient()
+    return _line_client
+
+
+async def _fetch_and_cache_profile(user_id: str) -> Optional[dict]:
+    try:
+        profile = await get_line_client().get_user_profile(user_id)
+    except Exception as e:
+        print(f"Error getting LINE profile: {e}")
+        _profile_cache.set(user_id, _NOT_FOUND, ttl=NEGATIVE_TTL)
+        return None
+    _profile_cache.set(user_id, profile)
+    return profile
+
+
+async def _refresh_profile(user_id: str) -> None:
+    global _refresh_semaphore
+    if _refresh_semaphore is None:
+        _refresh_semaphore = asyncio.Semaphore(PROFILE_REFRESH_CONCURRENCY)
+    try:
+        async with _refresh_semaphore:
+            profile = await get_line_client().get_user_profile(user_id)
+            _profile_cache.set(user_id, profile)
+    except Exception as e:
+        # Keep serving the stale profile; the next stale read retries.
+        print(f"[LINE] background profile refresh failed for {user_id}: {e}")
+    finally:
+        _refresh_tasks.pop(user_id, None)
+
+
+def _schedule_refresh(user_id: str) -> None:
+    if user_id in _refresh_tasks:
+        return
+    _refresh_tasks[user_id] = asyncio.create_task(_refresh_profile(user_id))
+
+
 async def get_line_profile(user_id: str) -> Optional[dict]:
     """
     Fetch LINE user profile.
 
+    Fresh cached profiles are returned without an API call, stale ones are
+    returned immediately and revalidated in the background, and failed
+    lookups are negatively cached for a short time.
+
     Args:
         user_id: LINE user ID
 
     Returns:
         Dict with display_name, picture_url, status_message or None if fetch fails
     """
-    try:
-        client = LineProfileClient()
-        return await client.get_user_profile(user_id)
-    except Exception as e:
-        print(f"Error getting LINE profile: {e}")
-        return None
+    entry = _profile_cache.get_entry(user_id)
+    if entry is not None:
+        if entry.value is _NOT_FOUND:
+            if entry.is_fresh():
+                return None
+        else:
+            if not entry.is_fresh():
+                _schedule_refresh(user_id)
+            return entry.value
+    return await _fetch_and_cache_profile(user_id)
+
+
+def is_known_user(line_user_id: str) -> bool:
+    """Return True when the user was recently confirmed to exist in the users table."""
+    return line_user_id in _known_users
+
+
+def mark_known_user(line_user_id: str) -> None:
+    """Remember that the user exists so message events can skip the users lookup."""
+    _known_users.set(line_user_id, True)
+
+
+def forget_user(line_user_id: str) -> None:
+    """Drop cached state for a user (e.g. after deletion)."""
+    _known_users.delete(line_user_id)
+    _profile_cache.delete(line_user_id)
@@ -0,0 +1,128 @@
+"""
+OAuth state store for the Google login flow.
+
+A state is issued by /login and consumed exactly once by /callback. By default
+states live in a bounded in-process TTL cache, which only works with a single
+worker. With OAUTH_STATE_BACKEND=database they are kept in the oauth_states
+table so the callback can land on any worker, and a periodic sweeper deletes
+rows that expired without being used (abandoned logins).
+"""
+
+import asyncio
+import os
+from typing import Any, Dict, Optional
+
+from db import get_connection
+from utils.cache import TTLCache
+
+OAUTH_STATE_BACKEND = os.getenv("OAUTH_STATE_BACKEND", "memory").lower()
+OAUTH_STATE_TTL = float(os.getenv("OAUTH_STATE_TTL", "600"))
+OAUTH_STATE_CACHE_SIZE = int(os.getenv("OAUTH_STATE_CACHE_SIZE", "10000"))
+OAUTH_STATE_SWEEP_INTERVAL = float(os.getenv("OAUTH_STATE_SWEEP_INTERVAL", "600"))
+
+
+class MemoryStateStore:
+    """States in a size-bounded TTL cache of this process."""
+
+    def __init__(self, ttl: float = OAUTH_STATE_TTL, maxsize: int = OAUTH_STATE_CACHE_SIZE):
+        self._states = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def save(self, state: str, payload: Dict[str, Any]) -> None:
+        self._states.set(state, payload)
+
+    def pop(self, state: str) -> Optional[Dict[str, Any]]:
+        """Consume a state, returning its payload or None if unknown or expired."""
+        payload = self._states.get(state)
+        self._states.delete(state)
+        return payload
+
+    def sweep(self) -> int:
+        # Expired entries are evicted on access and by the size bound
+        return 0
+
+
+class DatabaseStateStore:
+    """States in the oauth_states table, shared by all workers."""
+
+    def __init__(self, ttl: float = OAUTH_STATE_TTL):
+        self.ttl = ttl
+
+    def save(self, state: str, payload: Dict[str, Any]) -> None:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                INSERT INTO oauth_states (state, user_session_id, redirect_url, expires_at)
+                VALUES (%s, %s, %s, DATE_ADD(UTC_TIMESTAMP(), INTERVAL %s SECOND))
+                """,
+                (state, payload["line_user_id"], payload.get("redirect_url"), int(self.ttl))
+            )
+            conn.commit()
+
+    def pop(self, state: str) -> Optional[Dict[str, Any]]:
+        """Consume a state, returning its payload or None if unknown or expired."""
+        with get_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(
+                """
+                SELECT user_session_id, redirect_url
+                FROM oauth_states
+                WHERE state = %s AND expires_at > UTC_TIMESTAMP()
+                """,
+                (state,)
+            )
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            cursor.execute("DELETE FROM oauth_states WHERE state = %s", (state,))
+            conn.commit()
+            # Another worker consumed the same state first
+            if cursor.rowcount == 0:
+                return None
+        return {"line_user_id": row["user_session_id"], "redirect_url": row["redirect_url"]}
+
+    def sweep(self) -> int:
+        """Delete expired states. Returns the number of rows removed."""
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM oauth_states WHERE expires_at <= UTC_TIMESTAMP()")
+            conn.commit()
+            return cursor.rowcount
+
+
+class OAuthStateSweeper:
+    """Deletes expired states of the table-backed store periodically."""
+
+    def __init__(self, store, interval: float = OAUTH_STATE_SWEEP_INTERVAL):
+        self.store = store
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                removed = await asyncio.to_thread(self.store.sweep)
+                if removed:
+                    print(f"[OAuthState] removed {removed} expired states")
+            except Exception as e:
+                print(f"[OAuthState] sweep failed: {e}")
+            await asyncio.sleep(self.interval)
+
+
+OAUTH_STATE_IN_DATABASE = OAUTH_STATE_BACKEND in {"database", "db", "mysql"}
+
+state_store = DatabaseStateStore() if OAUTH_STATE_IN_DATABASE else MemoryStateStore()
+state_sweeper = OAuthStateSweeper(state_store)
@@ -0,0 +1,203 @@
+"""
+Rank candidate shops against every participant's restaurant conditions.
+
+Participants and shops are encoded as numeric arrays so that all
+participant x shop scores are computed in a single NumPy pass instead of
+collapsing everyone's preferences into one most-common area/genre/budget.
+"""
+
+import asyncio
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from api.hotpepper import ShopRecord
+from db.restaurant_conditions import get_restaurant_conditions
+from services.hp_services import get_location
+from utils.hotpepper_codes import BUDGET_CODES, GENRE_CODES
+
+GENRE_INDEX = {code: index for index, code in enumerate(GENRE_CODES)}
+BUDGET_INDEX = {code: index for index, code in enumerate(BUDGET_CODES)}
+
+# Per-participant score weights (normalized when combined)
+GENRE_WEIGHT = 0.5
+BUDGET_WEIGHT = 0.3
+DISTANCE_WEIGHT = 0.2
+
+# Budget bands away from the preferred band before the budget score hits 0
+BUDGET_TOLERANCE = 3.0
+# Distance (km) at which the distance score decays to 1/e
+DISTANCE_SCALE_KM = 2.0
+# Score used when a shop is missing the attribute being compared
+UNKNOWN_SCORE = 0.5
+
+# Group-level bonus for amenities that make group dinners easier
+AMENITY_WEIGHTS = {"private_room": 0.05, "non_smoking": 0.05}
+# Weight of the least-satisfied participant in the final score, so a shop
+# that is great for most but unacceptable for one person ranks lower
+FAIRNESS_WEIGHT = 0.25
+
+EARTH_RADIUS_KM = 6371.0
+
+# Number of shops to fetch per genre when ranking, before trimming to the
+# requested count (Hotpepper returns at most 100 per request)
+RANK_CANDIDATE_COUNT = 50
+
+
+def _encode_participants(
+    conditions: Sequence[Dict],
+    coords: Sequence[Optional[Tuple[float, float]]],
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Returns:
+        genres: (P, G) float, 1.0 where the participant picked the genre
+        has_genre: (P,) bool, participant picked at least one known genre
+        budget: (P,) float budget band index (NaN if none)
+        latlng: (P, 2) float radians (NaN if unknown)
+    """
+    count = len(conditions)
+    genres = np.zeros((count, len(GENRE_INDEX)), dtype=np.float32)
+    budget = np.full(count, np.nan, dtype=np.float32)
+    latlng = np.full((count, 2), np.nan, dtype=np.float64)
+    for row, cond in enumerate(conditions):
+        for code in cond.get("genre_codes") or []:
+            index = GENRE_INDEX.get(code)
+            if index is not None:
+                genres[row, index] = 1.0
+        band = BUDGET_INDEX.get(cond.get("budget_code"))
+        if band is not None:
+            budget[row] = band
+        if coords[row] is not None:
+            latlng[row] = coords[row]
+    return genres, genres.any(axis=1), budget, np.radians(latlng)
+
+
+def _encode_shops(shops: Sequence[ShopRecord]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Returns:
+        genres: (G, N) float, 1.0 for the shop's genre and sub genre
+        budget: (N,) float budget band index (NaN if unknown)
+        latlng: (N, 2) float radians (NaN if unknown)
+        amenity: (N,) float group-level amenity bonus
+    """
+    count = len(shops)
+    genres = np.zeros((len(GENRE_INDEX), count), dtype=np.float32)
+    budget = np.full(count, np.nan, dtype=np.float32)
+    latlng = np.full((count, 2), np.nan, dtype=np.float64)
+    amenity = np.zeros(count, dtype=np.float32)
+    for col, shop in enumerate(shops):
+        for code in (shop.genre_code, shop.sub_genre_code):
+            index = GENRE_INDEX.get(code)
+            if index is not None:
+                genres[index, col] = 1.0
+        band = BUDGET_INDEX.get(shop.budget_code)
+        if band is not None:
+            budget[col] = band
+        try:
+            latlng[col] = (float(shop.lat), float(shop.lng))
+        except (TypeError, ValueError):
+            pass
+        if shop.private_room and shop.private_room.startswith("あり"):
+            amenity[col] += AMENITY_WEIGHTS["private_room"]
+        if shop.non_smoking and shop.non_smoking.startswith("全面禁煙"):
+            amenity[col] += AMENITY_WEIGHTS["non_smoking"]
+    return genres, budget, np.radians(latlng), amenity
+
+
+def score_matrix(
+    conditions: Sequence[Dict],
+    shops: Sequence[ShopRecord],
+    coords: Optional[Sequence[Optional[Tuple[float, float]]]] = None,
+) -> np.ndarray:
+    """
+    Score every shop for every participant.
+
+    Args:
+        conditions: restaurant_conditions rows (genre_codes as list, budget_code)
+        shops: Candidate shops
+        coords: Optional (lat, lng) per participant for their preferred area
+
+    Returns:
+        (P, N) array of satisfaction scores in [0, 1]
+    """
+    if coords is None:
+        coords = [None] * len(conditions)
+    return _score(_encode_participants(conditions, coords), _encode_shops(shops))
+
+
+def _score(participants: Tuple[np.ndarray, ...], shops: Tuple[np.ndarray, ...]) -> np.ndarray:
+    p_genres, p_has_genre, p_budget, p_latlng = participants
+    s_genres, s_budget, s_latlng, _ = shops
+
+    # Genre: 1 if the shop matches any picked genre; indifferent participants score 1
+    genre = np.minimum(p_genres @ s_genres, 1.0)
+    genre[~p_has_genre] = 1.0
+
+    # Budget: linear falloff by band distance
+    budget = np.clip(1.0 - np.abs(p_budget[:, None] - s_budget[None, :]) / BUDGET_TOLERANCE, 0.0, 1.0)
+    budget = np.where(np.isnan(s_budget)[None, :], UNKNOWN_SCORE, budget)
+    budget = np.where(np.isnan(p_budget)[:, None], 1.0, budget)
+
+    # Distance: haversine between participant area and shop, exponential decay
+    dlat = s_latlng[None, :, 0] - p_latlng[:, None, 0]
+    dlng = s_latlng[None, :, 1] - p_latlng[:, None, 1]
+    hav = np.sin(dlat / 2) ** 2 + np.cos(p_latlng[:, None, 0]) * np.cos(s_latlng[None, :, 0]) * np.sin(dlng / 2) ** 2
+    distance_km = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(hav, 0.0, 1.0)))
+    distance = np.exp(-distance_km / DISTANCE_SCALE_KM)
+    distance = np.where(np.isnan(s_latlng[:, 0])[None, :], UNKNOWN_SCORE, distance)
+    distance = np.where(np.isnan(p_latlng[:, 0])[:, None], 1.0, distance)
+
+    total = GENRE_WEIGHT + BUDGET_WEIGHT + DISTANCE_WEIGHT
+    return (GENRE_WEIGHT * genre + BUDGET_WEIGHT * budget + DISTANCE_WEIGHT * distance) / total
+
+
+def rank_shops(
+    conditions: Sequence[Dict],
+    shops: Sequence[ShopRecord],
+    coords: Optional[Sequence[Optional[Tuple[float, float]]]] = None,
+) -> List[Tuple[ShopRecord, float]]:
+    """
+    Order shops to maximize overall participant satisfaction.
+
+    The group score of a shop is the mean participant score plus a fairness
+    term for the least-satisfied participant and a small amenity bonus.
+    Ties keep the original (API) order.
+
+    Returns:
+        List of (shop, group score), best first
+    """
+    if not shops:
+        return []
+    if not conditions:
+        return [(shop, 0.0) for shop in shops]
+
+    if coords is None:
+        coords = [None] * len(conditions)
+    encoded_shops = _encode_shops(shops)
+    scores = _score(_encode_participants(conditions, coords), encoded_shops)
+    amenity = encoded_shops[3]
+    group = scores.mean(axis=0) + FAIRNESS_WEIGHT * scores.min(axis=0) + amenity
+    order = np.argsort(-group, kind="stable")
+    return [(shops[index], round(float(group[index]), 4)) for index in order]
+
+
+async def rank_shops_for_session(session_id: int, shops: List[ShopRecord]) -> List[ShopRecord]:
+    """
+    Rank shops against the conditions of every participant in a session.
+    Participant areas are geocoded (cached) for the distance term.
+    """
+    if len(shops) <= 1:
+        return shops
+    conditions = get_restaurant_conditions(session_id=session_id)
+    if not conditions:
+        return shops
+
+    areas = list({cond["area"] for cond in conditions if cond.get("area")})
+    locations = await asyncio.gather(*(get_location(area) for area in areas))
+    area_coords = {
+        area: (location["lat"], location["lng"])
+        for area, location in zip(areas, locations)
+        if location
+    }
+    coords = [area_coords.get(cond.get("area")) for cond in conditions]
+    return [shop for shop, _ in rank_shops(conditions, shops, coords)]
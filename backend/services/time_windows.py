@@ -0,0 +1,176 @@
+"""
+Find the best event windows from overlapping availability intervals.
+
+Poll responses are grouped by their exact (date, start, end) triple elsewhere,
+so two people answering 18:00-21:00 and 19:00-22:00 never count toward the
+same slot. Here every response is treated as an interval and a sweep over
+start/end events finds the windows of a given duration that the most people
+can fully attend.
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Weight of a participant who answered that they might be late
+DEFAULT_LATE_WEIGHT = 0.5
+
+# Event ordering at the same instant: an interval that opens at t and one
+# that closes at t both cover a window starting at t
+_OPEN = 0
+_CLOSE = 1
+
+
+def merge_user_intervals(
+    responses: Iterable[Dict],
+) -> Dict[str, List[Tuple[datetime, datetime, bool]]]:
+    """
+    Merge each user's overlapping or touching intervals.
+
+    Args:
+        responses: Rows with line_user_id, start_time, end_time, is_late
+            (rows without both datetimes are ignored)
+
+    Returns:
+        Mapping of user ID to sorted (start, end, is_late) intervals. A merged
+        interval is late if any response it was built from is late.
+    """
+    by_user: Dict[str, List[Tuple[datetime, datetime, bool]]] = {}
+    for row in responses:
+        start, end = row.get("start_time"), row.get("end_time")
+        if not isinstance(start, datetime) or not isinstance(end, datetime) or end <= start:
+            continue
+        by_user.setdefault(row["line_user_id"], []).append((start, end, bool(row.get("is_late"))))
+
+    merged: Dict[str, List[Tuple[datetime, datetime, bool]]] = {}
+    for user_id, intervals in by_user.items():
+        intervals.sort()
+        result = [intervals[0]]
+        for start, end, is_late in intervals[1:]:
+            last_start, last_end, last_late = result[-1]
+            if start <= last_end:
+                result[-1] = (last_start, max(last_end, end), last_late or is_late)
+            else:
+                result.append((start, end, is_late))
+        merged[user_id] = result
+    return merged
+
+
+def find_best_windows(
+    responses: Iterable[Dict],
+    duration: timedelta,
+    late_weight: float = DEFAULT_LATE_WEIGHT,
+    limit: int = 5,
+) -> List[Dict]:
+    """
+    Find the windows of the given duration with the highest attendance.
+
+    A merged interval [s, e] lets its owner attend any window starting in
+    [s, e - duration]. Sorting those ranges' open/close events and sweeping
+    them once gives, for every stretch of possible start times, the weighted
+    number of attendees in O(n log n). Each window is reported by its
+    earliest start, with the latest start that keeps the same attendees.
+
+    Args:
+        responses: Poll response rows (see merge_user_intervals)
+        duration: Required window length
+        late_weight: Weight of participants marked is_late (1.0 to ignore)
+        limit: Maximum number of windows to return
+
+    Returns:
+        Windows sorted by score (then attendee count, then start time), each
+        with start_time, end_time, score, attendee_count, late_count,
+        latest_start and attendees (user IDs)
+    """
+    merged = merge_user_intervals(responses)
+
+    events: List[Tuple[datetime, int, float]] = []
+    for intervals in merged.values():
+        for start, end, is_late in intervals:
+            last_start = end - duration
+            if last_start < start:
+                continue
+            weight = late_weight if is_late else 1.0
+            events.append((start, _OPEN, weight))
+            events.append((last_start, _CLOSE, weight))
+    if not events:
+        return []
+    events.sort(key=lambda event: event[:2])
+
+    # Attendance only grows at an open, so every stretch with a new attendee
+    # set starts at an open instant: record (instant, score, count) there.
+    # Close-only instants just shrink the previous set and are never better.
+    candidates: List[Tuple[datetime, float, int]] = []
+    score = 0.0
+    count = 0
+    index = 0
+    while index < len(events):
+        instant = events[index][0]
+        opened = False
+        while index < len(events) and events[index][0] == instant and events[index][1] == _OPEN:
+            score += events[index][2]
+            count += 1
+            index += 1
+            opened = True
+        if opened:
+            candidates.append((instant, score, count))
+        while index < len(events) and events[index][0] == instant and events[index][1] == _CLOSE:
+            score -= events[index][2]
+            count -= 1
+            index += 1
+
+    candidates.sort(key=lambda item: (-round(item[1], 6), -item[2], item[0]))
+    windows = []
+    seen = set()
+    for start, window_score, window_count in candidates:
+        if len(windows) >= limit:
+            break
+        attendees, late, latest_start = _attendees_at(merged, start, duration)
+        # A user with several intervals can reopen the same stretch
+        key = (frozenset(attendees), latest_start)
+        if key in seen:
+            continue
+        seen.add(key)
+        windows.append({
+            "start_time": start,
+            "end_time": start + duration,
+            "latest_start": latest_start,
+            "score": round(window_score, 3),
+            "attendee_count": window_count,
+            "late_count": len(late),
+            "attendees": attendees,
+        })
+    return windows
+
+
+def _attendees_at(
+    merged: Dict[str, List[Tuple[datetime, datetime, bool]]],
+    start: datetime,
+    duration: timedelta,
+) -> Tuple[List[str], List[str], datetime]:
+    """
+    Users whose merged intervals fully cover [start, start + duration], the
+    late ones among them, and the latest start that keeps all of them.
+    """
+    end = start + duration
+    attendees = []
+    late = []
+    latest_end = None
+    for user_id, intervals in merged.items():
+        for interval_start, interval_end, is_late in intervals:
+            if interval_start <= start and end <= interval_end:
+                attendees.append(user_id)
+                if is_late:
+                    late.append(user_id)
+                latest_end = interval_end if latest_end is None else min(latest_end, interval_end)
+                break
+    return attendees, late, (latest_end or end) - duration
+
+
+def best_window(
+    responses: Iterable[Dict],
+    duration: timedelta,
+    late_weight: float = DEFAULT_LATE_WEIGHT,
+) -> Optional[Dict]:
+    """Return the single best window, or None if nobody can attend one."""
+    windows = find_best_windows(responses, duration, late_weight=late_weight, limit=1)
+    return windows[0] if windows else None
@@ -0,0 +1,241 @@
+"""
+Google access token manager.
+
+Valid access tokens are cached in memory per LINE user. A token that is close
+to expiry is still handed out while a background refresh replaces it, and
+concurrent refreshes of the same user are coalesced into one token request.
+A periodic task refreshes, ahead of time, the tokens of users in sessions
+that have not registered their calendar events yet, so event creation does
+not have to wait for a refresh.
+
+Token expiry times are naive UTC datetimes (see calculate_expiry_time).
+"""
+
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from db import get_connection
+from utils.cache import SingleFlight, TTLCache
+
+TOKEN_CACHE_SIZE = int(os.getenv("GOOGLE_TOKEN_CACHE_SIZE", "4096"))
+# Tokens closer than this to expiry are treated as expired
+TOKEN_EXPIRY_MARGIN = float(os.getenv("GOOGLE_TOKEN_EXPIRY_MARGIN", "60"))
+# Tokens closer than this to expiry are refreshed in the background
+TOKEN_REFRESH_AHEAD = float(os.getenv("GOOGLE_TOKEN_REFRESH_AHEAD", "600"))
+TOKEN_REFRESH_INTERVAL = float(os.getenv("GOOGLE_TOKEN_REFRESH_INTERVAL", "60"))
+TOKEN_REFRESH_CONCURRENCY = int(os.getenv("GOOGLE_TOKEN_REFRESH_CONCURRENCY", "4"))
+TOKEN_REFRESH_ENABLED = os.getenv("GOOGLE_TOKEN_REFRESH_ENABLED", "true").lower() in {"1", "true", "yes"}
+
+
+def utc_now() -> datetime:
+    """Current time as a naive UTC datetime (the format stored in users.token_expiry)."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _as_utc(token_expiry) -> Optional[datetime]:
+    if not token_expiry:
+        return None
+    if isinstance(token_expiry, str):
+        token_expiry = datetime.fromisoformat(token_expiry)
+    if token_expiry.tzinfo is not None:
+        token_expiry = token_expiry.astimezone(timezone.utc).replace(tzinfo=None)
+    return token_expiry
+
+
+def seconds_left(token_expiry) -> float:
+    """Seconds until token_expiry (negative once expired, -inf if unknown)."""
+    expiry = _as_utc(token_expiry)
+    if expiry is None:
+        return float("-inf")
+    return (expiry - utc_now()).total_seconds()
+
+
+class TokenManager:
+    """
+    In-memory access token cache with coalesced and proactive refreshes.
+    """
+
+    def __init__(
+        self,
+        refresh_ahead: float = TOKEN_REFRESH_AHEAD,
+        expiry_margin: float = TOKEN_EXPIRY_MARGIN,
+        interval: float = TOKEN_REFRESH_INTERVAL,
+        concurrency: int = TOKEN_REFRESH_CONCURRENCY,
+    ):
+        self.refresh_ahead = refresh_ahead
+        self.expiry_margin = expiry_margin
+        self.interval = interval
+        self.concurrency = concurrency
+        # line_user_id -> (access_token, expiry, refresh_token)
+        self._tokens = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=3600)
+        self._flight = SingleFlight()
+        self._task: Optional[asyncio.Task] = None
+        self.refreshes = 0
+        self.failed_refreshes = 0
+
+    def remember(self, line_user_id: str, access_token: str, token_expiry, refresh_token: Optional[str] = None) -> None:
+        """Cache a token that is known to be valid until token_expiry."""
+        left = seconds_left(token_expiry) - self.expiry_margin
+        if not access_token or left <= 0:
+            self._tokens.delete(line_user_id)
+            return
+        self._tokens.set(line_user_id, (access_token, _as_utc(token_expiry), refresh_token), ttl=left)
+
+    def forget(self, line_user_id: str) -> None:
+        """Drop a cached token (e.g., after the user disconnected Google)."""
+        self._tokens.delete(line_user_id)
+
+    async def get_access_token(self, user: Dict[str, Any]) -> str:
+        """
+        Get a valid access token for a user row.
+
+        Args:
+            user: Row with line_user_id, access_token, refresh_token, token_expiry
+
+        Returns:
+            An access token that is valid for at least the expiry margin
+
+        Raises:
+            Exception: If the token has expired and could not be refreshed
+        """
+        line_user_id = user["line_user_id"]
+        cached = self._tokens.get(line_user_id)
+        if cached is None and user.get("access_token"):
+            self.remember(line_user_id, user["access_token"], user.get("token_expiry"), user.get("refresh_token"))
+            cached = self._tokens.get(line_user_id)
+
+        refresh_token = user.get("refresh_token") or (cached[2] if cached else None)
+        if cached is not None:
+            access_token, expiry, _ = cached
+            if seconds_left(expiry) < self.refresh_ahead and refresh_token:
+                self.refresh_in_background(line_user_id, refresh_token)
+            return access_token
+
+        if not refresh_token:
+            raise Exception("Access token expired and no refresh token available")
+        access_token = await self.refresh(line_user_id, refresh_token)
+        if not access_token:
+            raise Exception("Failed to refresh token")
+        return access_token
+
+    async def refresh(self, line_user_id: str, refresh_token: str) -> Optional[str]:
+        """Refresh a user's token, joining a refresh already in flight."""
+        token = await self.refresh_with_expiry(line_user_id, refresh_token)
+        return token[0] if token else None
+
+    async def refresh_with_expiry(self, line_user_id: str, refresh_token: str) -> Optional[Tuple[str, datetime]]:
+        """Like refresh, but returns (access_token, expiry) or None on failure."""
+        return await self._flight.do(line_user_id, lambda: self._refresh(line_user_id, refresh_token))
+
+    def refresh_in_background(self, line_user_id: str, refresh_token: str) -> None:
+        """Start a refresh unless one is already running for the user."""
+        self._flight.spawn(line_user_id, lambda: self._refresh(line_user_id, refresh_token))
+
+    async def _refresh(self, line_user_id: str, refresh_token: str) -> Optional[Tuple[str, datetime]]:
+        from services.google_service import get_google_client
+
+        self.refreshes += 1
+        try:
+            client = get_google_client()
+            token_response = await client.refresh_access_token(refresh_token)
+            access_token = token_response.get("access_token")
+            if not access_token:
+                raise ValueError("No access_token in refresh response")
+            expiry = client.calculate_expiry_time(token_response.get("expires_in", 3600))
+            # Google may rotate the refresh token
+            new_refresh_token = token_response.get("refresh_token") or refresh_token
+
+            with get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    """
+                    UPDATE users
+                    SET access_token = %s, refresh_token = %s, token_expiry = %s
+                    WHERE line_user_id = %s
+                    """,
+                    (access_token, new_refresh_token, expiry, line_user_id)
+                )
+                conn.commit()
+
+            self.remember(line_user_id, access_token, expiry, new_refresh_token)
+            return access_token, expiry
+        except Exception as e:
+            self.failed_refreshes += 1
+            print(f"Token refresh failed for {line_user_id}: {str(e)}")
+            return None
+
+    def _expiring_users(self) -> List[Dict[str, Any]]:
+        """Connected users of unregistered sessions whose tokens expire soon."""
+        query = """
+            SELECT u.line_user_id, u.refresh_token, u.token_expiry
+            FROM users u
+            JOIN (
+                SELECT pr.line_user_id
+                FROM poll_sessions s
+                JOIN poll_responses pr ON pr.session_id = s.id
+                WHERE s.state != 'closed' AND s.event_registered = FALSE
+                UNION
+                SELECT pb.line_user_id
+                FROM poll_sessions s
+                JOIN poll_response_bitmaps pb ON pb.session_id = s.id
+                WHERE s.state != 'closed' AND s.event_registered = FALSE
+                UNION
+                SELECT s.created_by_line_user_id
+                FROM poll_sessions s
+                WHERE s.state != 'closed' AND s.event_registered = FALSE
+            ) active ON active.line_user_id = u.line_user_id
+            WHERE u.calendar_connected = TRUE
+              AND u.refresh_token IS NOT NULL
+              AND (u.token_expiry IS NULL OR u.token_expiry < %s)
+        """
+        with get_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(query, (utc_now() + timedelta(seconds=self.refresh_ahead),))
+            return cursor.fetchall()
+
+    async def refresh_expiring(self) -> int:
+        """Refresh every soon-to-expire token of active sessions' users."""
+        users = self._expiring_users()
+        semaphore = asyncio.Semaphore(max(self.concurrency, 1))
+
+        async def refresh_one(user: Dict[str, Any]) -> bool:
+            async with semaphore:
+                return await self.refresh(user["line_user_id"], user["refresh_token"]) is not None
+
+        refreshed = await asyncio.gather(*(refresh_one(user) for user in users))
+        return sum(refreshed)
+
+    def start(self) -> None:
+        """Start the periodic proactive refresh loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh_expiring()
+            except Exception as e:
+                print(f"[TokenManager] proactive refresh failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "cached_tokens": len(self._tokens),
+            "refreshes": self.refreshes,
+            "failed_refreshes": self.failed_refreshes,
+            "coalesced_refreshes": self._flight.coalesced,
+        }
+
+
+token_manager = TokenManager()
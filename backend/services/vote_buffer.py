@@ -0,0 +1,161 @@
+"""
+Write-behind buffer for poll votes.
+
+When a deadline is close, a whole group votes within seconds. With
+VOTE_WRITE_BEHIND enabled, submit_vote only validates and stores the ballot
+here; repeated submissions by the same user are coalesced (last one wins)
+and each session's ballots are written with save_poll_responses_batch on a
+short interval, when the buffer grows past a threshold, before results are
+read (e.g., at the deadline) and on shutdown.
+"""
+
+import asyncio
+import os
+from typing import Dict, List, Optional
+
+from db.poll_responses import save_poll_responses, save_poll_responses_batch
+
+VOTE_WRITE_BEHIND = os.getenv("VOTE_WRITE_BEHIND", "false").lower() in {"1", "true", "yes"}
+VOTE_BUFFER_FLUSH_INTERVAL = float(os.getenv("VOTE_BUFFER_FLUSH_INTERVAL", "1.0"))
+VOTE_BUFFER_MAX_BALLOTS = int(os.getenv("VOTE_BUFFER_MAX_BALLOTS", "200"))
+
+
+class VoteBuffer:
+    """
+    Per-session buffer of pending ballots keyed by LINE user ID.
+    """
+
+    def __init__(self, flush_interval: float = VOTE_BUFFER_FLUSH_INTERVAL, max_ballots: int = VOTE_BUFFER_MAX_BALLOTS):
+        self.flush_interval = flush_interval
+        self.max_ballots = max_ballots
+        # session_id -> {line_user_id: votes}
+        self._pending: Dict[Optional[int], Dict[str, List[Dict]]] = {}
+        self._size = 0
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._size_flush: Optional[asyncio.Task] = None
+        self.flushed_ballots = 0
+        self.coalesced_ballots = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, line_user_id: str, votes: List[Dict], session_id: Optional[int]) -> None:
+        """Buffer a user's ballot, replacing any pending one for the same session."""
+        ballots = self._pending.setdefault(session_id, {})
+        if line_user_id in ballots:
+            self.coalesced_ballots += 1
+        else:
+            self._size += 1
+        ballots[line_user_id] = votes
+
+        if self._size >= self.max_ballots and (self._size_flush is None or self._size_flush.done()):
+            self._size_flush = asyncio.create_task(self.flush())
+
+    def discard(self, line_user_id: str, session_id: Optional[int] = None) -> None:
+        """Drop pending ballots of a user (e.g., when their votes are deleted)."""
+        sessions = [session_id] if session_id is not None else list(self._pending)
+        for key in sessions:
+            ballots = self._pending.get(key)
+            if ballots and ballots.pop(line_user_id, None) is not None:
+                self._size -= 1
+
+    async def flush(self, session_id: Optional[int] = None, all_sessions: bool = True) -> int:
+        """
+        Write pending ballots to the database.
+
+        Args:
+            session_id: Flush only this session (when all_sessions is False)
+            all_sessions: Flush every session
+
+        Returns:
+            Number of ballots written
+        """
+        async with self._flush_lock:
+            if all_sessions:
+                batches = list(self._pending.items())
+                self._pending = {}
+            elif session_id in self._pending:
+                batches = [(session_id, self._pending.pop(session_id))]
+            else:
+                return 0
+            self._size -= sum(len(ballots) for _, ballots in batches)
+
+            written = 0
+            for key, ballots in batches:
+                try:
+                    # Blocking MySQL transaction: keep it off the event loop so
+                    # votes keep being accepted while a burst is written
+                    await asyncio.to_thread(_write_ballots, key, ballots)
+                    written += len(ballots)
+                except Exception as e:
+                    print(f"[VoteBuffer] flush failed session_id={key} ballots={len(ballots)}: {e}")
+                    self._requeue(key, ballots)
+            self.flushed_ballots += written
+            return written
+
+    async def flush_session(self, session_id: int) -> int:
+        """Write a single session's pending ballots (before reading its results)."""
+        return await self.flush(session_id, all_sessions=False)
+
+    def _requeue(self, session_id: Optional[int], ballots: Dict[str, List[Dict]]) -> None:
+        """Put back ballots that failed to flush unless newer ones arrived."""
+        current = self._pending.setdefault(session_id, {})
+        for line_user_id, votes in ballots.items():
+            if line_user_id not in current:
+                current[line_user_id] = votes
+                self._size += 1
+
+    def start(self) -> None:
+        """Start the periodic flush loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flush loop and write everything still pending."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if self._size:
+                await self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending_ballots": self._size,
+            "flushed_ballots": self.flushed_ballots,
+            "coalesced_ballots": self.coalesced_ballots,
+        }
+
+
+def _write_ballots(session_id: Optional[int], ballots: Dict[str, List[Dict]]) -> None:
+    if session_id is None:
+        # Ballots without a session cannot be batched by session
+        for line_user_id, votes in ballots.items():
+            save_poll_responses(line_user_id=line_user_id, votes=votes, session_id=None)
+    else:
+        save_poll_responses_batch(session_id, ballots)
+
+
+vote_buffer = VoteBuffer()
+
+
+async def flush_pending_votes(session_id: Optional[int]) -> None:
+    """
+    Make buffered ballots visible before results are read: those of a
+    session, or of every session when session_id is None.
+    """
+    if not VOTE_WRITE_BEHIND:
+        return
+    if session_id is None:
+        await vote_buffer.flush()
+    else:
+        await vote_buffer.flush_session(session_id)
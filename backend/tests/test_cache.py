@@ -0,0 +1,91 @@
+import asyncio
+import time
+
+import pytest
+
+from utils.cache import SingleFlight, TTLCache
+
+
+def test_ttl_cache_expires_entries():
+    cache = TTLCache(maxsize=10, ttl=0.01)
+    cache.set("key", "value")
+    assert cache.get("key") == "value"
+    time.sleep(0.02)
+    assert cache.get("key") is None
+    assert len(cache) == 0
+
+
+def test_ttl_cache_serves_stale_entries_within_stale_ttl():
+    cache = TTLCache(maxsize=10, ttl=0.01, stale_ttl=60)
+    cache.set("key", "value")
+    time.sleep(0.02)
+    assert cache.get("key") is None
+    entry = cache.get_entry("key")
+    assert entry.value == "value"
+    assert not entry.is_fresh()
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    flight = SingleFlight()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    async def run():
+        return await asyncio.gather(*(flight.do("key", fetch) for _ in range(5)))
+
+    assert asyncio.run(run()) == [1] * 5
+    assert calls == 1
+    assert flight.coalesced == 4
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_single_flight_shares_errors_and_retries_afterwards():
+    flight = SingleFlight()
+    attempts = 0
+
+    async def fail():
+        nonlocal attempts
+        attempts += 1
+        await asyncio.sleep(0)
+        raise RuntimeError("boom")
+
+    async def run():
+        results = await asyncio.gather(flight.do("key", fail), flight.do("key", fail), return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+        with pytest.raises(RuntimeError):
+            await flight.do("key", fail)
+
+    asyncio.run(run())
+    assert attempts == 2
+
+
+def test_ttl_cache_reports_evicted_values():
+    evicted = []
+    cache = TTLCache(maxsize=2, ttl=60, on_evict=lambda key, value: evicted.append((key, value)))
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.set("a", 10)
+    cache.set("c", 3)
+    cache.delete("c")
+    assert evicted == [("a", 1), ("b", 2)]
+
+    cache.set("d", 4, ttl=0)
+    assert cache.purge_expired() == 1
+    assert evicted[-1] == ("d", 4)
+    assert cache.get("a") == 10
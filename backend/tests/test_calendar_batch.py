@@ -0,0 +1,53 @@
+import pytest
+
+from services.google_calendar_service import GoogleCalendarService
+
+
+def _part(index: int, status_line: str, body: str = "", content_type: str = "application/json") -> str:
+    part = (
+        "--batch_abc\r\n"
+        "Content-Type: application/http\r\n"
+        f"Content-ID: <response-item-{index}>\r\n"
+        "\r\n"
+        f"HTTP/1.1 {status_line}\r\n"
+    )
+    if body:
+        part += f"Content-Type: {content_type}\r\n\r\n{body}\r\n"
+    else:
+        part += "\r\n"
+    return part
+
+
+def test_parse_batch_response_maps_parts_by_content_id():
+    payload = (
+        _part(1, "409 Conflict", '{"error": {"code": 409}}')
+        + _part(0, "200 OK", '{"id": "abc", "summary": "飲み会"}')
+        + _part(2, "204 No Content")
+        + _part(3, "502 Bad Gateway", "upstream error", content_type="text/plain")
+        + "--batch_abc--\r\n"
+    ).encode("utf-8")
+
+    responses = GoogleCalendarService._parse_batch_response('multipart/mixed; boundary="batch_abc"', payload)
+
+    assert responses == {
+        0: (200, {"id": "abc", "summary": "飲み会"}),
+        1: (409, {"error": {"code": 409}}),
+        2: (204, {}),
+        3: (502, "upstream error"),
+    }
+
+
+def test_parse_batch_response_skips_parts_without_content_id():
+    payload = (
+        "--batch_abc\r\nContent-Type: application/http\r\n\r\nHTTP/1.1 200 OK\r\n\r\n"
+        + _part(0, "200 OK", "{}")
+        + "--batch_abc--\r\n"
+    ).encode("utf-8")
+    responses = GoogleCalendarService._parse_batch_response("multipart/mixed; boundary=batch_abc", payload)
+    assert responses == {0: (200, {})}
+
+
+def test_parse_batch_response_requires_boundary():
+    with pytest.raises(ValueError):
+        GoogleCalendarService._parse_batch_response("multipart/mixed", b"")
+
@@ -0,0 +1,70 @@
+import asyncio
+import re
+
+from services.google_calendar_service import GoogleCalendarService, event_id_for
+
+BODY = GoogleCalendarService._event_body("飲み会", "2026-01-09T19:00:00+09:00", "2026-01-09T21:00:00+09:00")
+
+
+def test_event_ids_are_deterministic_and_valid_for_google():
+    event_id = event_id_for(1, "U123")
+    assert event_id == event_id_for(1, "U123")
+    assert re.fullmatch(r"[a-v0-9]{5,1024}", event_id)
+
+
+def test_event_ids_differ_by_session_user_and_mode():
+    ids = {
+        event_id_for(1, "U123"),
+        event_id_for(2, "U123"),
+        event_id_for(1, "U456"),
+        event_id_for(1, "U123", mode="organizer"),
+    }
+    assert len(ids) == 4
+
+
+def _fake_send_batch(monkeypatch, *handlers):
+    calls = iter(handlers)
+    monkeypatch.setattr(GoogleCalendarService, "send_batch", staticmethod(lambda requests: next(calls)(requests)))
+
+
+def test_create_events_batch_reuses_existing_events(monkeypatch):
+    async def insert(requests):
+        assert [method for method, *_ in requests] == ["POST", "POST", "POST"]
+        return [(200, {"id": "new"}), (409, {}), (0, None)]
+
+    async def lookup(requests):
+        assert [(method, path.rsplit("/", 1)[-1]) for method, path, *_ in requests] == [("GET", "existing")]
+        return [(200, {"id": "existing", "status": "confirmed", "htmlLink": "link"})]
+
+    _fake_send_batch(monkeypatch, insert, lookup)
+    results = asyncio.run(GoogleCalendarService.create_events_batch([
+        ("token-a", {**BODY, "id": "new"}),
+        ("token-b", {**BODY, "id": "existing"}),
+        ("token-c", BODY),
+    ]))
+
+    assert results[0] == {"status": 200, "event": {"id": "new"}}
+    assert results[1]["event"]["duplicate"] is True
+    assert results[1]["event"]["htmlLink"] == "link"
+    assert "error" in results[2]
+
+
+def test_create_events_batch_restores_events_deleted_by_the_user(monkeypatch):
+    async def insert(requests):
+        return [(409, {})]
+
+    async def lookup(requests):
+        return [(200, {"id": "deleted", "status": "cancelled"})]
+
+    async def restore(requests):
+        [(method, path, token, body)] = requests
+        assert (method, path.rsplit("/", 1)[-1], token) == ("PUT", "deleted", "token-a")
+        assert body["status"] == "confirmed"
+        return [(200, {**body, "htmlLink": "link"})]
+
+    _fake_send_batch(monkeypatch, insert, lookup, restore)
+    [result] = asyncio.run(GoogleCalendarService.create_events_batch([("token-a", {**BODY, "id": "deleted"})]))
+
+    assert result["status"] == 200
+    assert result["event"]["id"] == "deleted"
+    assert not result["event"].get("duplicate")
@@ -0,0 +1,41 @@
+from datetime import datetime
+
+from services.freebusy import filter_windows, is_free, merge_intervals
+
+
+def _at(hour: int) -> datetime:
+    return datetime(2026, 1, 9, hour)
+
+
+def test_merge_intervals():
+    assert merge_intervals([(_at(12), _at(13)), (_at(9), _at(11)), (_at(10), _at(12)), (_at(15), _at(16))]) == [
+        (_at(9), _at(13)),
+        (_at(15), _at(16)),
+    ]
+
+
+def test_is_free():
+    busy = merge_intervals([(_at(9), _at(11)), (_at(15), _at(16))])
+    assert is_free(busy, _at(11), _at(15))
+    assert not is_free(busy, _at(10), _at(12))
+    assert not is_free(busy, _at(14), _at(16))
+    assert not is_free(busy, _at(8), _at(17))
+    assert is_free(busy, _at(17), _at(19))
+    assert is_free([], _at(9), _at(10))
+
+
+def test_filter_windows_by_free_ratio():
+    windows = [(_at(18), _at(20)), (_at(20), _at(22))]
+    busy = {
+        "a": [(_at(18), _at(19))],
+        "b": [(_at(18), _at(20))],
+        "c": [],
+    }
+    assert filter_windows(windows, busy, 0.5) == windows[1:]
+    assert filter_windows(windows, busy, 0.3) == windows
+
+
+def test_filter_windows_never_returns_an_empty_poll():
+    windows = [(_at(18), _at(20))]
+    assert filter_windows(windows, {"a": [(_at(17), _at(21))]}, 1.0) == windows
+    assert filter_windows(windows, {}, 1.0) == windows
@@ -0,0 +1,83 @@
+import asyncio
+
+from api import hotpepper
+from api.hotpepper import ShopRecord, iter_multi_genre_pages, iter_shop_pages
+
+GENRE_SIZES = {"G001": 25, "G002": 12, "G003": 7}
+
+
+def _fake_search(calls):
+    async def search_restaurants(area=None, genre_codes=None, budget_code=None, keyword=None, count=10, start=1):
+        code = genre_codes[0]
+        calls.append((code, start))
+        total = GENRE_SIZES[code]
+        shops = [
+            ShopRecord(id=f"{code}-{index}", genre_code=code)
+            for index in range(start, min(start + count, total + 1))
+        ]
+        # One shop listed under two genres
+        if code == "G002" and start == 1:
+            shops.append(ShopRecord(id="G001-1", genre_code="G001", sub_genre_code="G002"))
+        return {"results_available": total, "results_returned": len(shops), "shops": shops}
+
+    return search_restaurants
+
+
+async def _collect(pages):
+    return [page async for page in pages]
+
+
+def test_multi_genre_pages_show_every_fetched_shop_once(monkeypatch):
+    calls = []
+    monkeypatch.setattr(hotpepper, "search_restaurants", _fake_search(calls))
+
+    pages = asyncio.run(_collect(iter_multi_genre_pages(["G001", "G002", "G003"], page_size=10)))
+
+    shown = [shop.id for page in pages for shop in page["shops"]]
+    assert len(shown) == len(set(shown)) == sum(GENRE_SIZES.values())
+    assert [len(page["shops"]) for page in pages] == [10, 10, 10, 10, 4]
+    assert [page["has_more"] for page in pages] == [True] * 4 + [False]
+    # The shop matching two genres ranks first
+    assert shown[0] == "G001-1"
+    # Genres are only fetched again once the pool runs short
+    assert sorted(calls) == [
+        ("G001", 1), ("G001", 11), ("G001", 21),
+        ("G002", 1), ("G002", 11),
+        ("G003", 1),
+    ]
+
+
+def test_multi_genre_pages_stop_when_nothing_is_found(monkeypatch):
+    async def search_restaurants(**kwargs):
+        return {"error": "Network error", "results_available": 0, "results_returned": 0, "shops": []}
+
+    monkeypatch.setattr(hotpepper, "search_restaurants", search_restaurants)
+    assert asyncio.run(_collect(iter_multi_genre_pages(["G001", "G002"]))) == []
+
+
+def test_closing_a_cursor_cancels_its_prefetch():
+    started = []
+    cancelled = []
+
+    async def fetch_page(start, count):
+        started.append(start)
+        if start > 1:
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                cancelled.append(start)
+                raise
+        return {"results_available": 100, "shops": [ShopRecord(id=str(start))]}
+
+    async def run():
+        pages = iter_shop_pages(fetch_page, page_size=10)
+        first = await anext(pages)
+        await asyncio.sleep(0)
+        await pages.aclose()
+        await asyncio.sleep(0)
+        return first
+
+    first = asyncio.run(run())
+    assert first["has_more"] is True
+    assert started == [1, 11]
+    assert cancelled == [11]
@@ -0,0 +1,79 @@
+from datetime import datetime
+
+from services import ics_feed
+from services.ics_feed import _escape, _fold, render_calendar
+
+
+def _unfold(text: str) -> str:
+    return text.replace("\r\n ", "")
+
+
+def test_escape_special_characters():
+    assert _escape("a,b;c\\d\ne") == "a\\,b\\;c\\\\d\\ne"
+    assert _escape("line1\r\nline2") == "line1\\nline2"
+
+
+def test_fold_keeps_lines_within_75_octets():
+    assert _fold("SUMMARY:short") == "SUMMARY:short"
+
+    line = "SUMMARY:" + "飲み会" * 40
+    folded = _fold(line)
+    for part in folded.split("\r\n"):
+        assert len(part.encode("utf-8")) <= 75
+    assert _unfold(folded) == line
+
+
+def test_fold_ascii_boundary():
+    line = "X" * 75
+    assert _fold(line) == line
+    assert _fold(line + "Y") == line + "\r\n Y"
+
+
+def test_render_calendar():
+    session = {
+        "id": 7,
+        "topic": "新年会, 二次会",
+        "finalized_date": "2026-01-09",
+        "finalized_start_time": "22:00",
+        "finalized_end_time": "01:00",
+        "restaurant_name": "居酒屋;本店",
+        "restaurant_url": None,
+        "reservation_confirmed": True,
+        "updated_at": datetime(2026, 1, 5, 12, 0),
+    }
+    text = render_calendar("飲み会の予定", [session])
+
+    assert text.startswith("BEGIN:VCALENDAR\r\n")
+    assert text.endswith("END:VCALENDAR\r\n")
+    lines = _unfold(text).split("\r\n")
+    assert "UID:session-7@schedule-coordinator-bot" in lines
+    # Japan time converted to UTC; an end before the start rolls over midnight
+    assert "DTSTART:20260109T130000Z" in lines
+    assert "DTEND:20260109T160000Z" in lines
+    assert "DTSTAMP:20260105T030000Z" in lines
+    assert "SUMMARY:新年会\\, 二次会" in lines
+    assert "LOCATION:居酒屋\\;本店" in lines
+    assert "STATUS:CONFIRMED" in lines
+
+
+def test_sessions_without_a_time_are_skipped():
+    text = render_calendar("empty", [{"id": 1, "finalized_date": "2026-01-09", "finalized_start_time": None}])
+    assert "BEGIN:VEVENT" not in text
+
+
+def test_feed_tokens(monkeypatch):
+    monkeypatch.setattr(ics_feed, "ICS_FEED_SECRET", "secret")
+    monkeypatch.setattr(ics_feed, "ICS_FEEDS_ENABLED", True)
+    token = ics_feed.feed_token("session:1")
+    assert ics_feed.verify_feed_token("session:1", token)
+    assert not ics_feed.verify_feed_token("session:2", token)
+    assert not ics_feed.verify_feed_token("session:1", None)
+    assert ics_feed.session_feed_path(1).endswith(f"?token={token}")
+
+
+def test_feeds_are_refused_without_a_secret(monkeypatch):
+    monkeypatch.setattr(ics_feed, "ICS_FEED_SECRET", "")
+    monkeypatch.setattr(ics_feed, "ICS_FEEDS_ENABLED", False)
+    assert not ics_feed.verify_feed_token("session:1", ics_feed.feed_token("session:1"))
+    assert ics_feed.session_feed_path(1) is None
+    assert ics_feed.user_feed_path("U1") is None
@@ -0,0 +1,86 @@
+import time
+
+from services import oauth_state
+from services.oauth_state import DatabaseStateStore, MemoryStateStore
+
+
+def test_memory_state_is_consumed_once():
+    store = MemoryStateStore(ttl=60)
+    store.save("state", {"line_user_id": "U1", "redirect_url": "/done"})
+    assert store.pop("state") == {"line_user_id": "U1", "redirect_url": "/done"}
+    assert store.pop("state") is None
+    assert store.pop("unknown") is None
+
+
+def test_memory_state_expires():
+    store = MemoryStateStore(ttl=0.01)
+    store.save("state", {"line_user_id": "U1"})
+    time.sleep(0.02)
+    assert store.pop("state") is None
+
+
+def test_memory_store_is_bounded():
+    store = MemoryStateStore(ttl=60, maxsize=2)
+    for state in ("a", "b", "c"):
+        store.save(state, {"line_user_id": state})
+    assert store.pop("a") is None
+    assert store.pop("c") == {"line_user_id": "c"}
+
+
+class _FakeCursor:
+    def __init__(self, row, deleted):
+        self.row = row
+        self.deleted = deleted
+        self.rowcount = 0
+        self.queries = []
+
+    def execute(self, query, params=None):
+        self.queries.append(" ".join(query.split()))
+        if query.lstrip().startswith("DELETE"):
+            self.rowcount = self.deleted
+
+    def fetchone(self):
+        return self.row
+
+
+class _FakeConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def cursor(self, dictionary=False):
+        return self._cursor
+
+    def commit(self):
+        pass
+
+
+def _database_store(monkeypatch, row, deleted=1):
+    cursor = _FakeCursor(row, deleted)
+    monkeypatch.setattr(oauth_state, "get_connection", lambda: _FakeConnection(cursor))
+    return DatabaseStateStore(), cursor
+
+
+def test_database_state_only_matches_unexpired_rows(monkeypatch):
+    store, cursor = _database_store(monkeypatch, {"user_session_id": "U1", "redirect_url": "/done"})
+    assert store.pop("state") == {"line_user_id": "U1", "redirect_url": "/done"}
+    assert "expires_at > UTC_TIMESTAMP()" in cursor.queries[0]
+
+    store, _ = _database_store(monkeypatch, None)
+    assert store.pop("expired") is None
+
+
+def test_database_state_consumed_by_another_worker(monkeypatch):
+    store, _ = _database_store(monkeypatch, {"user_session_id": "U1", "redirect_url": None}, deleted=0)
+    assert store.pop("state") is None
+
+
+def test_database_sweep_deletes_expired_rows(monkeypatch):
+    store, cursor = _database_store(monkeypatch, None, deleted=3)
+    assert store.sweep() == 3
+    assert cursor.queries == ["DELETE FROM oauth_states WHERE expires_at <= UTC_TIMESTAMP()"]
@@ -0,0 +1,58 @@
+import pytest
+
+from db.poll_response_bitmaps import clear_slot_bit, decode_bits, encode_bits, match_votes_to_slots
+
+
+@pytest.mark.parametrize("bits", [[], [0], [7], [8], [0, 3, 9, 15, 16], list(range(0, 200, 3))])
+def test_encode_decode_round_trip(bits):
+    assert decode_bits(encode_bits(bits)) == bits
+
+
+def test_encode_packs_little_endian():
+    assert encode_bits([]) == b""
+    assert encode_bits([0, 9]) == bytes([0b00000001, 0b00000010])
+
+
+def test_decode_sorts_and_dedupes():
+    assert decode_bits(encode_bits([5, 1, 5, 3])) == [1, 3, 5]
+    assert decode_bits(None) == []
+
+
+def test_match_votes_to_slots():
+    slots = [{"id": 10, "slot_bit": 0}, {"id": 11, "slot_bit": 4}]
+    votes = [
+        {"option_id": 11, "is_late": True},
+        {"option_id": 10, "is_late": False},
+        {"option_id": None, "is_late": False, "date": "8/5"},
+    ]
+    selected, late, unmatched = match_votes_to_slots(votes, slots)
+    assert selected == [4, 0]
+    assert late == [4]
+    assert unmatched == [votes[2]]
+
+
+class _RecordingCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.writes = []
+
+    def execute(self, query, params=None):
+        if not query.lstrip().startswith("SELECT"):
+            self.writes.append((query.split()[0], params))
+
+    def fetchall(self):
+        return self.rows
+
+
+def test_clear_slot_bit_rewrites_only_affected_ballots():
+    cursor = _RecordingCursor([
+        ("a", encode_bits([0, 3]), encode_bits([3])),
+        ("b", encode_bits([3]), encode_bits([])),
+        ("c", encode_bits([0, 1]), encode_bits([1])),
+    ])
+    assert clear_slot_bit(cursor, 1, 3) == 2
+    assert cursor.writes == [
+        ("INSERT", (1, "a", encode_bits([0]), encode_bits([]))),
+        # A ballot left without any selection is removed
+        ("DELETE", (1, "b")),
+    ]
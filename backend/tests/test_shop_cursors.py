@@ -0,0 +1,30 @@
+import asyncio
+
+from line import handlers
+
+
+def test_evicted_shop_cursor_is_closed(monkeypatch):
+    closed = []
+
+    async def pages():
+        try:
+            yield {"shops": [], "has_more": True}
+            yield {"shops": [], "has_more": False}
+        finally:
+            closed.append(True)
+
+    async def run():
+        cursors = handlers.TTLCache(maxsize=1, ttl=60, on_evict=handlers._close_shop_cursor)
+        monkeypatch.setattr(handlers, "_shop_cursors", cursors)
+        generator = pages()
+        cursors.set(1, {"pages": generator, "lock": asyncio.Lock()})
+        assert (await handlers._next_shop_page(1))["has_more"] is True
+
+        # A second session's cursor pushes the first one out
+        cursors.set(2, {"pages": pages(), "lock": asyncio.Lock()})
+        await asyncio.gather(*handlers._closing_cursors)
+        return generator
+
+    generator = asyncio.run(run())
+    assert closed == [True]
+    assert generator.ag_frame is None
@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+
+from services.time_windows import best_window, find_best_windows, merge_user_intervals
+
+
+def _at(hour: int, minute: int = 0) -> datetime:
+    return datetime(2026, 1, 9, hour, minute)
+
+
+def _response(user: str, start: int, end: int, is_late: bool = False) -> dict:
+    return {"line_user_id": user, "start_time": _at(start), "end_time": _at(end), "is_late": is_late}
+
+
+def test_merge_user_intervals_merges_touching_and_keeps_late_flag():
+    merged = merge_user_intervals([
+        _response("a", 18, 20),
+        _response("a", 20, 22, is_late=True),
+        _response("b", 19, 21),
+        {"line_user_id": "c", "start_time": None, "end_time": _at(20)},
+    ])
+    assert merged == {
+        "a": [(_at(18), _at(22), True)],
+        "b": [(_at(19), _at(21), False)],
+    }
+
+
+def test_same_stretch_is_reported_once():
+    responses = [_response("a", 18, 22), _response("b", 18, 22)]
+    windows = find_best_windows(responses, timedelta(hours=2), limit=5)
+    assert len(windows) == 1
+    assert windows[0]["start_time"] == _at(18)
+    assert windows[0]["latest_start"] == _at(20)
+    assert sorted(windows[0]["attendees"]) == ["a", "b"]
+
+
+def test_overlap_of_different_answers_wins():
+    responses = [_response("a", 18, 21), _response("b", 19, 22), _response("c", 21, 23)]
+    windows = find_best_windows(responses, timedelta(hours=2), limit=5)
+    assert windows[0]["start_time"] == _at(19)
+    assert windows[0]["attendee_count"] == 2
+    assert sorted(windows[0]["attendees"]) == ["a", "b"]
+    starts = [window["start_time"] for window in windows]
+    assert len(starts) == len(set(starts))
+
+
+def test_late_participants_are_weighted():
+    responses = [
+        _response("a", 12, 14, is_late=True),
+        _response("b", 12, 14, is_late=True),
+        _response("c", 18, 20),
+    ]
+    window = best_window(responses, timedelta(hours=2), late_weight=0.4)
+    assert window["start_time"] == _at(18)
+    assert window["score"] == 1.0
+
+    window = best_window(responses, timedelta(hours=2), late_weight=1.0)
+    assert window["start_time"] == _at(12)
+    assert window["late_count"] == 2
+
+
+def test_intervals_shorter_than_duration_are_ignored():
+    assert find_best_windows([_response("a", 18, 19)], timedelta(hours=2)) == []
+    assert best_window([], timedelta(hours=1)) is None
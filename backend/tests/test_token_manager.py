@@ -0,0 +1,63 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+
+from services.token_manager import TokenManager, seconds_left, utc_now
+
+
+def _user(access_token="cached", expires_in=3600, refresh_token="refresh"):
+    return {
+        "line_user_id": "U1",
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "token_expiry": utc_now() + timedelta(seconds=expires_in),
+    }
+
+
+def test_seconds_left():
+    assert 3590 < seconds_left(utc_now() + timedelta(hours=1)) <= 3600
+    assert seconds_left(utc_now() - timedelta(minutes=1)) < 0
+    assert seconds_left(None) == float("-inf")
+
+
+def test_valid_token_is_served_without_refreshing(monkeypatch):
+    manager = TokenManager()
+    monkeypatch.setattr(manager, "_refresh", pytest.fail)
+    assert asyncio.run(manager.get_access_token(_user())) == "cached"
+
+
+def test_expiring_token_is_refreshed_in_background(monkeypatch):
+    manager = TokenManager(refresh_ahead=600)
+    refreshed = []
+    monkeypatch.setattr(manager, "refresh_in_background", lambda line_user_id, token: refreshed.append(line_user_id))
+    assert asyncio.run(manager.get_access_token(_user(expires_in=300))) == "cached"
+    assert refreshed == ["U1"]
+
+
+def test_concurrent_refreshes_are_coalesced(monkeypatch):
+    manager = TokenManager()
+    calls = 0
+
+    async def refresh(line_user_id, refresh_token):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        expiry = utc_now() + timedelta(hours=1)
+        manager.remember(line_user_id, "fresh", expiry, refresh_token)
+        return "fresh", expiry
+
+    monkeypatch.setattr(manager, "_refresh", refresh)
+    expired = _user(expires_in=-60)
+
+    async def run():
+        return await asyncio.gather(*(manager.get_access_token(expired) for _ in range(5)))
+
+    assert asyncio.run(run()) == ["fresh"] * 5
+    assert calls == 1
+
+
+def test_expired_token_without_refresh_token_fails():
+    manager = TokenManager()
+    with pytest.raises(Exception):
+        asyncio.run(manager.get_access_token(_user(expires_in=-60, refresh_token=None)))
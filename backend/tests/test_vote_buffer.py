@@ -0,0 +1,112 @@
+import asyncio
+import threading
+
+import pytest
+
+from services import vote_buffer as vote_buffer_module
+from services.vote_buffer import VoteBuffer
+
+
+@pytest.fixture
+def saved(monkeypatch):
+    """Capture database writes instead of performing them."""
+    calls = {"batch": [], "single": []}
+    monkeypatch.setattr(
+        vote_buffer_module,
+        "save_poll_responses_batch",
+        lambda session_id, ballots: calls["batch"].append((session_id, dict(ballots))),
+    )
+    monkeypatch.setattr(
+        vote_buffer_module,
+        "save_poll_responses",
+        lambda line_user_id, votes, session_id: calls["single"].append((line_user_id, votes)),
+    )
+    return calls
+
+
+def test_repeated_ballots_are_coalesced(saved):
+    buffer = VoteBuffer()
+    buffer.add("a", [{"option_id": 1}], session_id=1)
+    buffer.add("a", [{"option_id": 2}], session_id=1)
+    buffer.add("b", [{"option_id": 1}], session_id=1)
+    assert len(buffer) == 2
+    assert buffer.coalesced_ballots == 1
+
+    assert asyncio.run(buffer.flush()) == 2
+    assert saved["batch"] == [(1, {"a": [{"option_id": 2}], "b": [{"option_id": 1}]})]
+    assert len(buffer) == 0
+
+
+def test_flush_session_leaves_other_sessions_pending(saved):
+    buffer = VoteBuffer()
+    buffer.add("a", [], session_id=1)
+    buffer.add("b", [], session_id=2)
+    buffer.add("c", [], session_id=None)
+
+    assert asyncio.run(buffer.flush_session(1)) == 1
+    assert [session_id for session_id, _ in saved["batch"]] == [1]
+    assert len(buffer) == 2
+    assert asyncio.run(buffer.flush_session(3)) == 0
+
+    assert asyncio.run(buffer.flush()) == 2
+    assert [session_id for session_id, _ in saved["batch"]] == [1, 2]
+    assert saved["single"] == [("c", [])]
+
+
+def test_discard_drops_pending_ballots(saved):
+    buffer = VoteBuffer()
+    buffer.add("a", [], session_id=1)
+    buffer.add("a", [], session_id=2)
+    buffer.add("b", [], session_id=2)
+
+    buffer.discard("a", session_id=1)
+    assert len(buffer) == 2
+    buffer.discard("a")
+    assert len(buffer) == 1
+    buffer.discard("missing")
+    assert len(buffer) == 1
+
+    asyncio.run(buffer.flush())
+    assert [(session_id, ballots) for session_id, ballots in saved["batch"] if ballots] == [(2, {"b": []})]
+
+
+def test_failed_flush_is_requeued_without_overwriting_newer_ballots(monkeypatch):
+    buffer = VoteBuffer()
+
+    def fail(session_id, ballots):
+        # A newer ballot arrives while the write is in flight
+        buffer.add("a", [{"option_id": 9}], session_id=1)
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(vote_buffer_module, "save_poll_responses_batch", fail)
+    buffer.add("a", [{"option_id": 1}], session_id=1)
+    buffer.add("b", [{"option_id": 1}], session_id=1)
+
+    assert asyncio.run(buffer.flush()) == 0
+    assert len(buffer) == 2
+    assert buffer._pending[1] == {"a": [{"option_id": 9}], "b": [{"option_id": 1}]}
+
+
+def test_writes_run_off_the_event_loop(saved, monkeypatch):
+    threads = []
+    monkeypatch.setattr(
+        vote_buffer_module,
+        "save_poll_responses_batch",
+        lambda session_id, ballots: threads.append(threading.current_thread()),
+    )
+    buffer = VoteBuffer()
+    buffer.add("a", [], session_id=1)
+    asyncio.run(buffer.flush())
+    assert threads and threads[0] is not threading.main_thread()
+
+
+def test_flush_pending_votes_without_a_session_flushes_everything(saved, monkeypatch):
+    buffer = VoteBuffer()
+    monkeypatch.setattr(vote_buffer_module, "vote_buffer", buffer)
+    monkeypatch.setattr(vote_buffer_module, "VOTE_WRITE_BEHIND", True)
+    buffer.add("a", [], session_id=1)
+    buffer.add("b", [], session_id=2)
+
+    asyncio.run(vote_buffer_module.flush_pending_votes(None))
+    assert [session_id for session_id, _ in saved["batch"]] == [1, 2]
+    assert len(buffer) == 0
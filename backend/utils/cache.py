@@ -0,0 +1,168 @@
+"""
+Small in-process caches shared by the API clients.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+_MISSING = object()
+
+
+class CacheEntry:
+    """A cached value with its freshness deadlines (monotonic seconds)."""
+
+    __slots__ = ("value", "fresh_until", "stale_until")
+
+    def __init__(self, value: Any, fresh_until: float, stale_until: float):
+        self.value = value
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        return (now if now is not None else time.monotonic()) < self.fresh_until
+
+
+class TTLCache:
+    """
+    Size-bounded LRU cache whose entries expire after a TTL.
+
+    Entries stay readable through ``get_entry`` for ``stale_ttl`` seconds after
+    they expire so callers can serve a stale value while revalidating it.
+
+    ``on_evict(key, value)`` is called for values the cache drops by itself
+    (expiry, LRU, or replacement by ``set``), e.g. to release resources they
+    hold. Values removed with ``delete`` or ``clear`` are not passed to it.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: float = 300.0,
+        stale_ttl: float = 0.0,
+        on_evict: Optional[Callable[[Hashable, Any], None]] = None,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.on_evict = on_evict
+        self._data: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    def get_entry(self, key: Hashable) -> Optional[CacheEntry]:
+        """Return the entry (fresh or stale) for key, or None when absent/expired."""
+        entry = self._data.get(key)
+        now = time.monotonic()
+        if entry is None or now >= entry.stale_until:
+            if entry is not None:
+                del self._data[key]
+                self._evicted(key, entry)
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        if entry.is_fresh(now):
+            self.hits += 1
+        else:
+            self.stale_hits += 1
+        return entry
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the fresh value for key, or default."""
+        entry = self.get_entry(key)
+        if entry is None or not entry.is_fresh():
+            return default
+        return entry.value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        now = time.monotonic()
+        fresh_until = now + (self.ttl if ttl is None else ttl)
+        previous = self._data.get(key)
+        self._data[key] = CacheEntry(value, fresh_until, fresh_until + self.stale_ttl)
+        self._data.move_to_end(key)
+        if previous is not None and previous.value is not value:
+            self._evicted(key, previous)
+        while len(self._data) > self.maxsize:
+            self._evicted(*self._data.popitem(last=False))
+
+    def delete(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def purge_expired(self) -> int:
+        """Drop every entry past its stale deadline. Returns how many were dropped."""
+        now = time.monotonic()
+        expired = [key for key, entry in self._data.items() if now >= entry.stale_until]
+        for key in expired:
+            self._evicted(key, self._data.pop(key))
+        return len(expired)
+
+    def _evicted(self, key: Hashable, entry: CacheEntry) -> None:
+        if self.on_evict is not None:
+            self.on_evict(key, entry.value)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key into one in-flight task.
+
+    Callers awaiting ``do`` for a key that is already being computed share the
+    result of the first call instead of starting another one.
+    """
+
+    def __init__(self):
+        self._inflight: dict = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    def _start(self, key: Hashable, factory) -> "asyncio.Future":
+        task = asyncio.ensure_future(factory())
+        self._inflight[key] = task
+        self.calls += 1
+
+        def _done(finished: "asyncio.Future") -> None:
+            if self._inflight.get(key) is finished:
+                del self._inflight[key]
+            if not finished.cancelled():
+                finished.exception()  # mark retrieved for fire-and-forget refreshes
+
+        task.add_done_callback(_done)
+        return task
+
+    async def do(self, key: Hashable, factory) -> Any:
+        """Await factory() for key, joining an in-flight call when one exists."""
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._start(key, factory)
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def spawn(self, key: Hashable, factory) -> None:
+        """Start factory() in the background unless key is already in flight."""
+        if key not in self._inflight:
+            self._start(key, factory)
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "coalesced": self.coalesced, "in_flight": len(self._inflight)}
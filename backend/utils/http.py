@@ -0,0 +1,28 @@
+"""
+Shared aiohttp client session.
+
+Creating a ClientSession per request throws away the connection pool (and the
+TLS handshake) every time, so outbound API clients borrow this one instead.
+"""
+
+from typing import Optional
+
+import aiohttp
+
+_session: Optional[aiohttp.ClientSession] = None
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    """Get or create the process-wide ClientSession (must be called inside the event loop)."""
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=15))
+    return _session
+
+
+async def close_http_session() -> None:
+    """Close the shared session on application shutdown."""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
@@ -38,11 +38,27 @@ CREATE TABLE IF NOT EXISTS calendar_events (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    -- Google event IDs are deterministic per (session, user), so a retried
+    -- creation upserts instead of adding a row
+    UNIQUE KEY uniq_user_google_event (user_id, google_event_id),
     INDEX idx_user_id (user_id),
     INDEX idx_google_event_id (google_event_id),
     INDEX idx_start_time (start_time)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- Invitees of an event created once on the organizer's calendar
+-- (organizer mode); the organizer's own row is in calendar_events
+CREATE TABLE IF NOT EXISTS calendar_event_attendees (
+    event_id INT NOT NULL,
+    line_user_id VARCHAR(64) NOT NULL,
+    email VARCHAR(255),
+    response_status VARCHAR(32) DEFAULT 'needsAction',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (event_id, line_user_id),
+    FOREIGN KEY (event_id) REFERENCES calendar_events(id) ON DELETE CASCADE,
+    INDEX idx_line_user_id (line_user_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 -- Sync logs table
 CREATE TABLE IF NOT EXISTS sync_logs (
     id INT PRIMARY KEY AUTO_INCREMENT,
@@ -56,11 +72,22 @@ CREATE TABLE IF NOT EXISTS sync_logs (
     INDEX idx_created_at (created_at)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- Incremental calendar sync progress (Calendar API nextSyncToken per user)
+CREATE TABLE IF NOT EXISTS calendar_sync_state (
+    user_id INT PRIMARY KEY,
+    sync_token VARCHAR(512),
+    last_full_sync DATETIME,
+    last_sync DATETIME,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 -- OAuth state table (for CSRF protection)
 CREATE TABLE IF NOT EXISTS oauth_states (
     id INT PRIMARY KEY AUTO_INCREMENT,
     state VARCHAR(255) UNIQUE NOT NULL,
     user_session_id VARCHAR(255),
+    redirect_url VARCHAR(2048),
     expires_at DATETIME NOT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     INDEX idx_state (state),
@@ -120,9 +147,11 @@ CREATE TABLE IF NOT EXISTS poll_options (
     label VARCHAR(255),
     start_time DATETIME NOT NULL,
     end_time DATETIME NOT NULL,
+    slot_bit SMALLINT,
     created_by_line_user_id VARCHAR(64),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (session_id) REFERENCES poll_sessions(id) ON DELETE CASCADE,
+    UNIQUE KEY uniq_session_slot_bit (session_id, slot_bit),
     INDEX idx_session_id (session_id),
     INDEX idx_start_time (start_time)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -148,17 +177,35 @@ CREATE TABLE IF NOT EXISTS poll_responses (
     id INT PRIMARY KEY AUTO_INCREMENT,
     line_user_id VARCHAR(64) NOT NULL,
     session_id INT,
+    option_id INT,
     selected_date VARCHAR(255) NOT NULL,
     start_time DATETIME,
     end_time DATETIME,
     is_late BOOLEAN DEFAULT FALSE,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (option_id) REFERENCES poll_options(id) ON DELETE SET NULL,
     INDEX idx_line_user_id (line_user_id),
     INDEX idx_session_id (session_id),
+    INDEX idx_session_option (session_id, option_id),
     INDEX idx_selected_date (selected_date)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- Poll response bitmaps (compact storage: one row per session and user)
+-- Bit i of slot_bitmap is set when the user selected the poll option with
+-- slot_bit = i; late_bitmap marks the selections flagged is_late
+CREATE TABLE IF NOT EXISTS poll_response_bitmaps (
+    session_id INT NOT NULL,
+    line_user_id VARCHAR(64) NOT NULL,
+    slot_bitmap VARBINARY(128) NOT NULL,
+    late_bitmap VARBINARY(128) NOT NULL,
+    revision INT NOT NULL DEFAULT 1,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (session_id, line_user_id),
+    FOREIGN KEY (session_id) REFERENCES poll_sessions(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 -- Restaurant search conditions (user preferences for Hotpepper API)
 CREATE TABLE IF NOT EXISTS restaurant_conditions (
     id INT PRIMARY KEY AUTO_INCREMENT,
@@ -171,7 +218,19 @@ CREATE TABLE IF NOT EXISTS restaurant_conditions (
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     UNIQUE KEY uniq_user_session (line_user_id, session_id),
     INDEX idx_line_user_id (line_user_id),
-    INDEX idx_session_id (session_id)
+    INDEX idx_session_id (session_id),
+    INDEX idx_session_area (session_id, area),
+    INDEX idx_session_budget (session_id, budget_code)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Restaurant condition genres (one row per selected genre)
+CREATE TABLE IF NOT EXISTS restaurant_condition_genres (
+    condition_id INT NOT NULL,
+    session_id INT,
+    genre_code VARCHAR(10) NOT NULL,
+    PRIMARY KEY (condition_id, genre_code),
+    INDEX idx_session_genre (session_id, genre_code),
+    FOREIGN KEY (condition_id) REFERENCES restaurant_conditions(id) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- Restaurant votes (store selected shops per session)
@@ -201,6 +260,24 @@ CREATE TABLE IF NOT EXISTS adjustment_events (
     INDEX idx_deadline (deadline)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- Rendered iCalendar feeds ("session:<id>" / "user:<line_user_id>")
+CREATE TABLE IF NOT EXISTS ics_feeds (
+    feed_key VARCHAR(128) PRIMARY KEY,
+    body MEDIUMTEXT NOT NULL,
+    etag CHAR(64) NOT NULL,
+    last_modified DATETIME NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Geocoding cache (normalized place name -> coordinates)
+CREATE TABLE IF NOT EXISTS geocode_cache (
+    place_key VARCHAR(255) PRIMARY KEY,
+    lat DOUBLE NOT NULL,
+    lng DOUBLE NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 -- Sample data (development only)
 INSERT INTO users (email, calendar_connected) VALUES
 ('test@example.com', FALSE)
@@ -0,0 +1,26 @@
+-- Normalize restaurant_conditions.genre_codes (JSON array) into
+-- restaurant_condition_genres and add indexes for grouped aggregation.
+-- Apply to databases created before the table was added to 01-schema.sql:
+--   mysql -u devuser -p calendar_db < db/migrations/001_restaurant_condition_genres.sql
+
+CREATE TABLE IF NOT EXISTS restaurant_condition_genres (
+    condition_id INT NOT NULL,
+    session_id INT,
+    genre_code VARCHAR(10) NOT NULL,
+    PRIMARY KEY (condition_id, genre_code),
+    INDEX idx_session_genre (session_id, genre_code),
+    FOREIGN KEY (condition_id) REFERENCES restaurant_conditions(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+INSERT IGNORE INTO restaurant_condition_genres (condition_id, session_id, genre_code)
+SELECT rc.id, rc.session_id, jt.genre_code
+FROM restaurant_conditions rc
+JOIN JSON_TABLE(
+    rc.genre_codes, '$[*]' COLUMNS (genre_code VARCHAR(10) PATH '$')
+) AS jt
+WHERE rc.genre_codes IS NOT NULL
+  AND jt.genre_code IS NOT NULL;
+
+ALTER TABLE restaurant_conditions
+    ADD INDEX idx_session_area (session_id, area),
+    ADD INDEX idx_session_budget (session_id, budget_code);
@@ -0,0 +1,30 @@
+-- Compact poll response storage (POLL_RESPONSE_STORAGE=bitmap).
+-- Gives every poll option a stable bit position within its session and
+-- adds the per-(session, user) bitmap table.
+-- Apply to databases created before these were added to 01-schema.sql:
+--   mysql -u devuser -p calendar_db < db/migrations/002_poll_response_bitmaps.sql
+
+ALTER TABLE poll_options
+    ADD COLUMN slot_bit SMALLINT AFTER end_time;
+
+UPDATE poll_options o
+JOIN (
+    SELECT id, ROW_NUMBER() OVER (PARTITION BY session_id ORDER BY id) - 1 AS bit
+    FROM poll_options
+) numbered ON numbered.id = o.id
+SET o.slot_bit = numbered.bit;
+
+ALTER TABLE poll_options
+    ADD UNIQUE KEY uniq_session_slot_bit (session_id, slot_bit);
+
+CREATE TABLE IF NOT EXISTS poll_response_bitmaps (
+    session_id INT NOT NULL,
+    line_user_id VARCHAR(64) NOT NULL,
+    slot_bitmap VARBINARY(128) NOT NULL,
+    late_bitmap VARBINARY(128) NOT NULL,
+    revision INT NOT NULL DEFAULT 1,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (session_id, line_user_id),
+    FOREIGN KEY (session_id) REFERENCES poll_sessions(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -0,0 +1,19 @@
+-- Reference poll options by integer id from poll_responses.
+-- Existing rows are linked to the option of their session with the same
+-- start/end time; rows that match no option keep option_id NULL.
+-- Apply to databases created before the column was added to 01-schema.sql:
+--   mysql -u devuser -p calendar_db < db/migrations/003_poll_response_option_id.sql
+
+ALTER TABLE poll_responses
+    ADD COLUMN option_id INT AFTER session_id,
+    ADD CONSTRAINT fk_poll_responses_option
+        FOREIGN KEY (option_id) REFERENCES poll_options(id) ON DELETE SET NULL,
+    ADD INDEX idx_session_option (session_id, option_id);
+
+UPDATE poll_responses pr
+JOIN poll_options o
+    ON o.session_id = pr.session_id
+   AND o.start_time = pr.start_time
+   AND o.end_time = pr.end_time
+SET pr.option_id = o.id
+WHERE pr.option_id IS NULL;
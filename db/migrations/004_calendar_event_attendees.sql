@@ -0,0 +1,15 @@
+-- Attendees of events created on the organizer's calendar
+-- (GOOGLE_CALENDAR_ORGANIZER_MODE).
+-- Apply to databases created before this was added to 01-schema.sql:
+--   mysql -u devuser -p calendar_db < db/migrations/004_calendar_event_attendees.sql
+
+CREATE TABLE IF NOT EXISTS calendar_event_attendees (
+    event_id INT NOT NULL,
+    line_user_id VARCHAR(64) NOT NULL,
+    email VARCHAR(255),
+    response_status VARCHAR(32) DEFAULT 'needsAction',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (event_id, line_user_id),
+    FOREIGN KEY (event_id) REFERENCES calendar_events(id) ON DELETE CASCADE,
+    INDEX idx_line_user_id (line_user_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
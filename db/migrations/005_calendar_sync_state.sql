@@ -0,0 +1,12 @@
+-- Incremental calendar sync progress (Calendar API nextSyncToken per user).
+-- Apply to databases created before this was added to 01-schema.sql:
+--   mysql -u devuser -p calendar_db < db/migrations/005_calendar_sync_state.sql
+
+CREATE TABLE IF NOT EXISTS calendar_sync_state (
+    user_id INT PRIMARY KEY,
+    sync_token VARCHAR(512),
+    last_full_sync DATETIME,
+    last_sync DATETIME,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -0,0 +1,13 @@
+-- One calendar_events row per (user, Google event) so event creation can
+-- upsert. Duplicates created before this keep their oldest row.
+-- Apply to databases created before this was added to 01-schema.sql:
+--   mysql -u devuser -p calendar_db < db/migrations/006_calendar_events_unique_google_id.sql
+
+DELETE ce FROM calendar_events ce
+JOIN calendar_events older
+  ON older.user_id = ce.user_id
+ AND older.google_event_id = ce.google_event_id
+ AND older.id < ce.id;
+
+ALTER TABLE calendar_events
+    ADD UNIQUE KEY uniq_user_google_event (user_id, google_event_id);
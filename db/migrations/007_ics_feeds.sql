@@ -0,0 +1,11 @@
+-- Rendered iCalendar feeds served by /api/calendar/.../feed.ics.
+-- Apply to databases created before this was added to 01-schema.sql:
+--   mysql -u devuser -p calendar_db < db/migrations/007_ics_feeds.sql
+
+CREATE TABLE IF NOT EXISTS ics_feeds (
+    feed_key VARCHAR(128) PRIMARY KEY,
+    body MEDIUMTEXT NOT NULL,
+    etag CHAR(64) NOT NULL,
+    last_modified DATETIME NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
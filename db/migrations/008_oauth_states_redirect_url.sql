@@ -0,0 +1,7 @@
+-- Keep the post-login redirect URL with the OAuth state so the table-backed
+-- state store (OAUTH_STATE_BACKEND=database) can serve the callback on any worker.
+-- Apply to databases created before this was added to 01-schema.sql:
+--   mysql -u devuser -p calendar_db < db/migrations/008_oauth_states_redirect_url.sql
+
+ALTER TABLE oauth_states
+    ADD COLUMN redirect_url VARCHAR(2048) AFTER user_session_id;
@@ -0,0 +1,11 @@
+-- Persistent cache of geocoded place names used by hp_services.
+-- Apply to databases created before the table was added to 01-schema.sql:
+--   mysql -u devuser -p calendar_db < db/migrations/009_geocode_cache.sql
+
+CREATE TABLE IF NOT EXISTS geocode_cache (
+    place_key VARCHAR(255) PRIMARY KEY,
+    lat DOUBLE NOT NULL,
+    lng DOUBLE NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;